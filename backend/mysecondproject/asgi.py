@@ -5,6 +5,9 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
+
+The live updates stream (api/live/) is only served through this entry
+point, e.g. ``uvicorn mysecondproject.asgi:application --workers 4``.
 """
 
 import os
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import sys
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -149,6 +151,76 @@ REST_FRAMEWORK = {
     ]
 }
 
+# Shared by all server processes on the host (calendar counts, see
+# posts/aggregates.py). Count keys carry the version stamps of their data,
+# so superseded ones pile up until they expire; room for them keeps culling
+# rare, and at the limit a tenth of the entries is dropped.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {'MAX_ENTRIES': 50000, 'CULL_FREQUENCY': 10},
+    },
+    # Precompressed card list snapshots (posts/snapshots.py), kept apart so
+    # culling the many small default entries never drops them.
+    'snapshots': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'snapshots',
+    },
+}
+
+# Card list snapshot: rebuilt in the background after card writes, and the
+# previous one is still served for this long after a write meanwhile.
+CARD_SNAPSHOT_ENABLED = True
+CARD_SNAPSHOT_STALE_SECONDS = 30
+# The snapshot's image URLs are built for this origin (scheme://host[:port]),
+# the one clients use; other origins get the list rendered per request.
+CARD_SNAPSHOT_ORIGIN = 'http://localhost:8000'
+# Held with flock() by the process rebuilding the snapshot.
+CARD_SNAPSHOT_LOCK_FILE = BASE_DIR / 'cache' / 'snapshot-rebuild.lock'
+
+# `manage.py test` runs with in-memory caches and its own snapshot lock, so
+# test runs never touch the server's cache directory.
+TESTING = sys.argv[1:2] == ['test']
+if TESTING:
+    CARD_SNAPSHOT_LOCK_FILE = Path(tempfile.gettempdir()) / 'mysecondproject-test-snapshot.lock'
+    CACHES = {
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': alias}
+        for alias in CACHES
+    }
+
+# EventHistory writes (see posts/events.py): 'atomic' commits each event with
+# the write that caused it, 'buffered' batches them off the request path.
+EVENT_HISTORY_MODE = 'atomic'
+EVENT_HISTORY_BATCH_SIZE = 200
+EVENT_HISTORY_FLUSH_INTERVAL = 1.0  # seconds
+# Most buffered events kept queued while writes fail; older ones are dropped.
+EVENT_HISTORY_MAX_QUEUED = 10000
+# Events older than this are moved to compressed archive segments by
+# `manage.py archive_events`.
+EVENT_HISTORY_HOT_DAYS = 365
+
+# Card delta sync (posts/changelog.py): `manage.py compact_card_changes` drops
+# change log entries older than this, and cursors older than it get 410 Gone.
+CARD_CHANGES_RETENTION_DAYS = 30
+
+# Live updates stream (posts/live.py, needs the ASGI server): how often each
+# process polls for new notifications, and how long notifications are kept
+# for clients resuming with Last-Event-ID.
+LIVE_UPDATES_POLL_INTERVAL = 0.5  # seconds
+LIVE_UPDATES_RETENTION = 3600  # seconds
+
+# Import jobs (posts/jobs.py): a running job whose worker has not reported
+# progress for this long is taken to be dead and queued again, at most
+# IMPORT_JOB_MAX_ATTEMPTS runs in all.
+IMPORT_JOB_LEASE_SECONDS = 600
+IMPORT_JOB_MAX_ATTEMPTS = 3
+
+# Batched API requests (posts/batch.py): most sub-requests per batch, and the
+# time after which the remaining sub-requests are not run.
+BATCH_MAX_REQUESTS = 20
+BATCH_TIME_LIMIT = 10.0  # seconds
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -0,0 +1,90 @@
+"""
+Aggregated maintenance counts for the calendar overviews.
+
+Counts are computed with one GROUP BY over the cronograma date index, plus
+the pending occurrences of the maintenance plans in the window (expanded
+as in posts/recurrence.py), and cached in the default cache. Cache keys
+embed the versions of the 'cards', 'cronograma' and 'plans' scopes (see
+posts/versions.py), which every Card, Cronograma and plan write bumps, so
+every process sharing the cache stops serving stale counts at once.
+Overdue depends on the current date, which is part of the key too.
+"""
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from . import recurrence, versions
+from .models import Card, Cronograma
+
+PERIODS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+# The same buckets for dates counted in Python.
+BUCKETS = {
+    'day': lambda day: day,
+    'week': lambda day: day - timedelta(days=day.weekday()),
+    'month': lambda day: day.replace(day=1),
+}
+GROUPS = {'location': 'card__location', 'risk': 'card__risk'}
+CACHE_TIMEOUT = 24 * 3600
+
+
+def maintenance_counts(start, end, period='day', group_by=None):
+    """
+    [{'period', ['group'], 'pending', 'completed', 'overdue', 'total'}] for
+    activities of live cards dated from `start` to `end` (inclusive), one
+    entry per period bucket (and group) that has activities.
+    """
+    today = timezone.localdate()
+    version = versions.token('cards', 'cronograma', 'plans')
+    key = f'posts:cronograma_counts:{version}:{today}:{start}:{end}:{period}:{group_by}'
+    counts = cache.get(key)
+    if counts is None:
+        counts = compute_counts(start, end, period, group_by, today)
+        cache.set(key, counts, CACHE_TIMEOUT)
+    return counts
+
+
+def compute_counts(start, end, period, group_by, today):
+    fields = ['bucket'] + ([GROUPS[group_by]] if group_by else [])
+    rows = (
+        Cronograma.objects.filter(card__is_deleted=False, date__gte=start, date__lte=end)
+        .annotate(bucket=PERIODS[period]('date'))
+        .values(*fields)
+        .annotate(
+            completed_count=Count('id', filter=Q(completed=True)),
+            overdue_count=Count('id', filter=Q(completed=False, date__lt=today)),
+            pending_count=Count('id', filter=Q(completed=False, date__gte=today)),
+        )
+        .order_by(*fields)
+    )
+    totals = {}
+    for row in rows:
+        key = (row['bucket'].isoformat(), row[GROUPS[group_by]] if group_by else None)
+        totals[key] = {
+            'pending': row['pending_count'], 'completed': row['completed_count'], 'overdue': row['overdue_count'],
+        }
+    occurrences = recurrence.expand_occurrences(start, end)
+    groups = {}
+    if group_by and occurrences:
+        groups = dict(
+            Card.objects.filter(id__in={occurrence['card_id'] for occurrence in occurrences})
+            .values_list('id', group_by)
+        )
+    for occurrence in occurrences:
+        day = date.fromisoformat(occurrence['date'])
+        key = (BUCKETS[period](day).isoformat(), groups.get(occurrence['card_id']))
+        entry = totals.setdefault(key, {'pending': 0, 'completed': 0, 'overdue': 0})
+        entry['pending' if day >= today else 'overdue'] += 1
+
+    counts = []
+    # Buckets in date order, groups in database order (NULL first).
+    for (bucket, group), entry in sorted(totals.items(), key=lambda item: (item[0][0], item[0][1] is not None,
+                                                                           item[0][1] or '')):
+        result = {'period': bucket}
+        if group_by:
+            result['group'] = group
+        result.update(entry, total=entry['pending'] + entry['completed'] + entry['overdue'])
+        counts.append(result)
+    return counts
@@ -0,0 +1,153 @@
+"""
+Cold tier of the event history.
+
+`archive_events` moves the events of each card older than a cutoff into one
+EventArchiveSegment per card and month. A segment holds NDJSON records
+shaped like the EventHistorySerializer values() rows, compressed with zstd
+when the zstandard package is installed and with gzip otherwise.
+
+Events are archived oldest first and new events are always stamped with the
+current time, so every archived event of a card is older than the ones left
+in the hot table. Readers therefore take the hot table first and continue
+into the segments, newest month first.
+"""
+import gzip
+import json
+import logging
+from datetime import date, datetime
+from itertools import groupby
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from .models import EventArchiveSegment, EventHistory
+from .serializers import EventHistorySerializer
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, gzip is always available.
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+RECORD_FIELDS = EventHistorySerializer.values_fields + ('document_id',)
+DELETE_BATCH_SIZE = 500
+
+
+def default_codec():
+    return 'zstd' if zstandard is not None else 'gzip'
+
+
+def compress(data, codec):
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=9)
+
+
+def decompress(data, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('This archive segment is zstd compressed; install the zstandard package to read it.')
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+def encode_rows(rows):
+    lines = []
+    for row in rows:
+        record = dict(row, timestamp=row['timestamp'].isoformat())
+        lines.append(json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+    return '\n'.join(lines).encode()
+
+
+def decode_segment(segment):
+    """Rows of a segment, newest first."""
+    rows = []
+    for line in decompress(bytes(segment.data), segment.codec).decode().splitlines():
+        row = json.loads(line)
+        row['timestamp'] = datetime.fromisoformat(row['timestamp'])
+        rows.append(row)
+    rows.sort(key=lambda row: (row['timestamp'], row['id']), reverse=True)
+    return rows
+
+
+def write_segment(card_id, month, rows):
+    """Create or extend the segment of `card_id` and `month` with `rows`."""
+    segment = EventArchiveSegment.objects.filter(card_id=card_id, month=month).first()
+    if segment is not None:
+        known = {row['id'] for row in rows}
+        rows = rows + [row for row in decode_segment(segment) if row['id'] not in known]
+    else:
+        segment = EventArchiveSegment(card_id=card_id, month=month)
+    rows.sort(key=lambda row: (row['timestamp'], row['id']))
+    segment.codec = default_codec()
+    segment.data = compress(encode_rows(rows), segment.codec)
+    segment.event_count = len(rows)
+    segment.first_timestamp = rows[0]['timestamp']
+    segment.last_timestamp = rows[-1]['timestamp']
+    segment.save()
+    return segment
+
+
+def archive_card(card_id, cutoff):
+    """Move the events of one card older than `cutoff` to its segments. Returns the number moved."""
+    rows = list(
+        EventHistory.objects.filter(card_id=card_id, timestamp__lt=cutoff)
+        .order_by('timestamp', 'id').values(*RECORD_FIELDS)
+    )
+    for month, month_rows in groupby(rows, key=lambda row: date(row['timestamp'].year, row['timestamp'].month, 1)):
+        month_rows = list(month_rows)
+        ids = [row['id'] for row in month_rows]
+        with transaction.atomic():
+            write_segment(card_id, month, month_rows)
+            for start in range(0, len(ids), DELETE_BATCH_SIZE):
+                EventHistory.objects.filter(id__in=ids[start:start + DELETE_BATCH_SIZE]).delete()
+    return len(rows)
+
+
+def archive_events(cutoff, dry_run=False):
+    """Archive every event older than `cutoff`. Returns (cards, events) affected."""
+    old_events = EventHistory.objects.filter(timestamp__lt=cutoff)
+    card_ids = list(old_events.order_by().values_list('card_id', flat=True).distinct())
+    if dry_run:
+        return len(card_ids), old_events.count()
+    archived = 0
+    for card_id in card_ids:
+        archived += archive_card(card_id, cutoff)
+    logger.info(f"Archived {archived} history events of {len(card_ids)} cards older than {cutoff}")
+    return len(card_ids), archived
+
+
+def archived_rows(card_id, before=None, limit=None, event_types=None, start=None, end=None):
+    """
+    Archived events of a card as values() rows, newest first. `before` is a
+    (timestamp, id) keyset position; only older events are returned.
+    """
+    segments = EventArchiveSegment.objects.filter(card_id=card_id).order_by('-month')
+    if before is not None:
+        segments = segments.filter(first_timestamp__lte=before[0])
+    if start is not None:
+        segments = segments.filter(last_timestamp__gte=start)
+    if end is not None:
+        segments = segments.filter(first_timestamp__lte=end)
+
+    rows = []
+    for segment in segments.iterator(chunk_size=4):
+        for row in decode_segment(segment):
+            if before is not None and (row['timestamp'], row['id']) >= before:
+                continue
+            if event_types and row['event_type'] not in event_types:
+                continue
+            if (start is not None and row['timestamp'] < start) or (end is not None and row['timestamp'] > end):
+                continue
+            rows.append(row)
+            if limit is not None and len(rows) >= limit:
+                return rows
+    return rows
+
+
+def latest_archived_rows(card_ids):
+    """{card_id: newest archived event row} of the cards among `card_ids` that have archived events."""
+    newest_month = EventArchiveSegment.objects.filter(card_id=OuterRef('card_id')).order_by('-month').values('month')[:1]
+    segments = EventArchiveSegment.objects.filter(card_id__in=card_ids, month=Subquery(newest_month))
+    return {segment.card_id: decode_segment(segment)[0] for segment in segments.iterator(chunk_size=4)}
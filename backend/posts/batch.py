@@ -0,0 +1,166 @@
+"""
+In process execution of batched API requests.
+
+`run_batch` dispatches each sub-request straight to the view its path
+resolves to, on the caller's thread and database connection, and collects
+the rendered responses. Only DRF views are reachable, so every sub-request
+still goes through DRF authentication, permissions and CSRF checks; the
+middleware stack runs once, for the batch request itself.
+
+With `atomic` the whole batch runs in one transaction that is rolled back as
+soon as a sub-request fails; later sub-requests are not run.
+"""
+import json
+import logging
+import time
+from contextlib import nullcontext
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.urls import Resolver404, resolve
+from rest_framework.views import APIView
+
+logger = logging.getLogger(__name__)
+
+METHODS = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+# Request headers handed down to the sub-requests (cookies, CSRF token, auth, language).
+INHERITED_META = (
+    'HTTP_COOKIE', 'HTTP_X_CSRFTOKEN', 'HTTP_AUTHORIZATION', 'HTTP_ACCEPT_LANGUAGE', 'HTTP_HOST',
+    'HTTP_REFERER', 'HTTP_ORIGIN', 'HTTP_USER_AGENT', 'REMOTE_ADDR', 'SERVER_NAME', 'SERVER_PORT',
+)
+
+
+class BatchError(Exception):
+    """The batch itself is malformed; nothing was run."""
+
+
+def max_requests():
+    return getattr(settings, 'BATCH_MAX_REQUESTS', 20)
+
+
+def time_limit():
+    return getattr(settings, 'BATCH_TIME_LIMIT', 10.0)
+
+
+def parse_batch(data):
+    """Validate the batch payload and return (sub-requests, atomic)."""
+    if not isinstance(data, dict) or not isinstance(data.get('requests'), list) or not data['requests']:
+        raise BatchError('Expected {"requests": [{"method", "path", "body"}, ...], "atomic": false}.')
+    if not isinstance(data.get('atomic', False), bool):
+        raise BatchError('atomic must be true or false.')
+    if len(data['requests']) > max_requests():
+        raise BatchError(f'A batch may hold at most {max_requests()} requests.')
+    subrequests = []
+    for index, item in enumerate(data['requests']):
+        if not isinstance(item, dict):
+            raise BatchError(f'Request {index} must be an object.')
+        method = str(item.get('method', 'GET')).upper()
+        path = item.get('path')
+        if method not in METHODS:
+            raise BatchError(f'Request {index}: method must be one of {", ".join(METHODS)}.')
+        if not isinstance(path, str) or not path.startswith('/'):
+            raise BatchError(f'Request {index}: path must be an absolute path such as /cards/.')
+        subrequests.append({'id': item.get('id', index), 'method': method, 'path': path, 'body': item.get('body')})
+    return subrequests, data.get('atomic', False)
+
+
+def build_request(request, method, path, body):
+    """WSGIRequest for a sub-request, carrying the batch request's session, user and headers."""
+    url = urlsplit(path)
+    payload = json.dumps(body).encode() if body is not None else b''
+    environ = {key: request.META[key] for key in INHERITED_META if key in request.META}
+    environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': url.path,
+        'SCRIPT_NAME': '',
+        'QUERY_STRING': url.query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(payload)),
+        'wsgi.input': BytesIO(payload),
+        'wsgi.url_scheme': request.scheme,
+    })
+    environ.setdefault('SERVER_NAME', 'localhost')
+    environ.setdefault('SERVER_PORT', '443' if request.is_secure() else '80')
+    subrequest = WSGIRequest(environ)
+    for attribute in ('session', 'user'):
+        if hasattr(request, attribute):
+            setattr(subrequest, attribute, getattr(request, attribute))
+    return subrequest
+
+
+def batch_view(path):
+    """(view, args, kwargs) for `path`, or None when it is not a plain DRF API view."""
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return None
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None or not issubclass(view_class, APIView) or getattr(view_class, 'view_is_async', False):
+        return None
+    if getattr(match.func, 'batch_exempt', False):
+        return None
+    return match.func, match.args, match.kwargs
+
+
+def error_body(detail):
+    return json.dumps({'detail': detail}).encode()
+
+
+def dispatch(request, subrequest):
+    """(status, JSON body bytes) of one sub-request."""
+    view = batch_view(subrequest['path'])
+    if view is None:
+        return 404, error_body('No API endpoint at this path that can be batched.')
+    func, args, kwargs = view
+    try:
+        response = func(build_request(request, subrequest['method'], subrequest['path'], subrequest['body']),
+                         *args, **kwargs)
+        if getattr(response, 'streaming', False):
+            return 400, error_body('Streaming responses cannot be batched.')
+        if hasattr(response, 'render'):
+            response.render()
+    except Exception as e:
+        logger.error(f"Batched {subrequest['method']} {subrequest['path']} failed: {e}", exc_info=True)
+        return 500, error_body('Internal server error.')
+    content = response.content
+    if not response.get('Content-Type', '').startswith('application/json'):
+        # Rendered pages and empty bodies are passed along as a JSON string or null.
+        content = json.dumps(content.decode('utf-8', errors='replace')).encode() if content else b'null'
+    return response.status_code, content or b'null'
+
+
+def run_batch(request, subrequests, atomic=False):
+    """
+    Run the sub-requests in order and return (responses, rolled_back), where
+    responses are (id, status, JSON body bytes) tuples in request order.
+    """
+    started = time.monotonic()
+    responses = []
+    rolled_back = False
+    with transaction.atomic() if atomic else nullcontext():
+        for subrequest in subrequests:
+            if rolled_back:
+                responses.append((subrequest['id'], 424, error_body('Not run, an earlier request failed.')))
+                continue
+            if time.monotonic() - started > time_limit():
+                responses.append((subrequest['id'], 504, error_body('Not run, the batch time limit was exceeded.')))
+                status = 504
+            else:
+                status, content = dispatch(request, subrequest)
+                responses.append((subrequest['id'], status, content))
+            if atomic and status >= 400:
+                transaction.set_rollback(True)
+                rolled_back = True
+    return responses, rolled_back
+
+
+def render_batch(responses, rolled_back):
+    """The batch response body. Sub-response bodies are already JSON and are spliced in as they are."""
+    parts = [
+        b'{"id":%s,"status":%d,"body":%s}' % (json.dumps(response_id).encode(), status, content)
+        for response_id, status, content in responses
+    ]
+    return b'{"rolled_back":%s,"responses":[%s]}' % (b'true' if rolled_back else b'false', b','.join(parts))
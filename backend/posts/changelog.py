@@ -0,0 +1,66 @@
+"""
+Retention of the card change log behind the delta sync endpoint.
+
+A client only needs the newest CardChange of each card past its cursor, so
+`compact` deletes entries older than the retention window that a later entry
+of the same card supersedes; no cursor loses a card through that. Tombstones
+of hard deleted cards have nothing superseding them, so `compact` drops them
+once they leave the window too, and a client whose cursor predates them
+would never hear about the deletion.
+
+The contract is therefore that cursors are good for the retention window:
+`cursor_expired` is true for a cursor older than the first entry recorded
+inside it, and the endpoint answers such a cursor with 410 Gone, upon which
+the client throws its copy away and syncs again from cursor 0. Every card
+keeps at least its newest entry, so a sync from 0 still sees all of them.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import CardChange
+
+
+def retention_cutoff(now=None):
+    days = getattr(settings, 'CARD_CHANGES_RETENTION_DAYS', 30)
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def oldest_valid_cursor(cutoff=None):
+    """
+    Lowest cursor that cannot have missed a compacted entry: the last id
+    before the first entry inside the window, or the newest id when every
+    entry is older. Compaction keeps the newest entry, so no removed entry
+    is past it.
+    """
+    cutoff = cutoff or retention_cutoff()
+    first_recent = (
+        CardChange.objects.filter(timestamp__gte=cutoff)
+        .order_by('id').values_list('id', flat=True).first()
+    )
+    if first_recent is not None:
+        return first_recent - 1
+    return CardChange.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def cursor_expired(since):
+    return since > 0 and since < oldest_valid_cursor()
+
+
+def compact(cutoff=None, dry_run=False):
+    """Delete superseded entries and tombstones older than the cutoff; returns how many."""
+    cutoff = cutoff or retention_cutoff()
+    newest = CardChange.objects.order_by('-id').values_list('id', flat=True).first()
+    if newest is None:
+        return 0
+    later = CardChange.objects.filter(card_id=OuterRef('card_id'), id__gt=OuterRef('id'))
+    old = CardChange.objects.filter(timestamp__lt=cutoff).exclude(id=newest)
+    superseded = old.filter(Exists(later))
+    tombstones = old.filter(operation='deleted')
+    stale = superseded | tombstones
+    if dry_run:
+        return stale.count()
+    deleted, _ = stale.delete()
+    return deleted
@@ -0,0 +1,129 @@
+"""
+Conditional GET for the read APIs.
+
+The ETag of a response is built from the versions of the scopes the
+endpoint reads (see posts/versions.py), the current date, the full request
+path and the Accept and Accept-Encoding headers. Answering If-None-Match
+therefore costs one primary key lookup of the version stamps and never
+touches the rows; a match is answered with 304.
+
+Each process counts, per endpoint, the requests answered with 304 and
+estimates what they saved from the running average size and time of the
+endpoint's full responses. `stats()` reports the counters of this process.
+"""
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.http import HttpResponseNotModified
+from django.utils import timezone
+from django.utils.cache import quote_etag
+from django.utils.http import parse_etags
+
+from . import versions
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.not_modified = 0
+        self.full_responses = 0
+        self.full_bytes = 0
+        self.full_seconds = 0.0
+        self.saved_bytes = 0
+        self.saved_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'not_modified': self.not_modified,
+            'hit_rate': round(self.not_modified / self.requests, 3) if self.requests else 0.0,
+            'bytes_saved': self.saved_bytes,
+            'seconds_saved': round(self.saved_seconds, 3),
+        }
+
+
+lock = threading.Lock()
+counters = {}
+
+
+def endpoint_stats(endpoint):
+    if endpoint not in counters:
+        counters[endpoint] = EndpointStats()
+    return counters[endpoint]
+
+
+def record_hit(endpoint, seconds):
+    with lock:
+        entry = endpoint_stats(endpoint)
+        entry.requests += 1
+        entry.not_modified += 1
+        if entry.full_responses:
+            entry.saved_bytes += entry.full_bytes // entry.full_responses
+            entry.saved_seconds += max(0.0, entry.full_seconds / entry.full_responses - seconds)
+
+
+def record_full(endpoint, size, seconds):
+    with lock:
+        entry = endpoint_stats(endpoint)
+        entry.requests += 1
+        entry.full_responses += 1
+        entry.full_bytes += size
+        entry.full_seconds += seconds
+
+
+def stats():
+    with lock:
+        return {endpoint: entry.as_dict() for endpoint, entry in sorted(counters.items())}
+
+
+def make_etag(request, scopes):
+    key = '|'.join((
+        versions.token(*scopes), str(timezone.localdate()),
+        request.get_full_path(), request.META.get('HTTP_ACCEPT', ''), request.META.get('HTTP_ACCEPT_ENCODING', ''),
+    ))
+    return quote_etag(hashlib.sha1(key.encode()).hexdigest()[:32])
+
+
+def respond(endpoint, request, scopes, view):
+    """
+    Answer a GET with 304 when If-None-Match holds the current ETag of
+    `scopes`, otherwise call `view()` and tag its response. Responses the
+    view marks `stale` (served while revalidating) are not tagged.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return view()
+    started = time.perf_counter()
+    etag = make_etag(request, scopes)
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+        response.headers['ETag'] = etag
+        record_hit(endpoint, time.perf_counter() - started)
+        return response
+    response = view()
+    if response.status_code != 200 or getattr(response, 'stale', False):
+        return response
+    response.headers['ETag'] = etag
+
+    def measure(response):
+        record_full(endpoint, len(response.content), time.perf_counter() - started)
+
+    if hasattr(response, 'add_post_render_callback'):
+        response.add_post_render_callback(measure)
+    else:
+        measure(response)
+    return response
+
+
+def conditional_view(endpoint, scopes):
+    """
+    Decorator for function views (below @api_view): `scopes(request,
+    **kwargs)` returns the version scopes the response depends on.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            return respond(endpoint, request, scopes(request, **kwargs), lambda: view(request, *args, **kwargs))
+        return wrapped
+    return decorator
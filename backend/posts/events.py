@@ -0,0 +1,135 @@
+"""
+Recording of EventHistory rows from the write endpoints.
+
+How events are written is chosen with the EVENT_HISTORY_MODE setting:
+
+``'atomic'`` (default)
+    The event is inserted on the caller's connection. The views wrap the
+    primary write and its event in one transaction, so both are committed
+    together with a single commit.
+
+``'buffered'``
+    Once the caller's transaction commits, the event is queued in process
+    and a background thread writes the queue with bulk_create every
+    EVENT_HISTORY_FLUSH_INTERVAL seconds, or sooner when
+    EVENT_HISTORY_BATCH_SIZE events are waiting. This takes the event
+    insert off the request path; events still queued when the process dies
+    are lost. A batch that fails on a bad row (its card was deleted
+    meanwhile, say) is retried row by row and the bad rows are dropped; a
+    batch that fails otherwise stays queued, up to
+    EVENT_HISTORY_MAX_QUEUED events, beyond which the oldest are dropped.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+
+from . import live, summaries, versions
+from .models import EventHistory
+
+logger = logging.getLogger(__name__)
+
+
+class EventBuffer:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    def add(self, event):
+        self.extend([event])
+
+    def extend(self, events):
+        with self.lock:
+            self.events.extend(events)
+            self.trim()
+            pending = len(self.events)
+            # Started lazily so forked workers each get their own thread.
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='event-history-flush', daemon=True)
+                self.thread.start()
+        if pending >= getattr(settings, 'EVENT_HISTORY_BATCH_SIZE', 200):
+            self.wakeup.set()
+
+    def trim(self):
+        """Drop the oldest queued events beyond EVENT_HISTORY_MAX_QUEUED. Call with the lock held."""
+        excess = len(self.events) - getattr(settings, 'EVENT_HISTORY_MAX_QUEUED', 10000)
+        if excess > 0:
+            logger.error(f"History event queue is full, dropping the {excess} oldest events")
+            del self.events[:excess]
+
+    def run(self):
+        while True:
+            self.wakeup.wait(getattr(settings, 'EVENT_HISTORY_FLUSH_INTERVAL', 1.0))
+            self.wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                connection.close()
+
+    def flush(self):
+        with self.lock:
+            events, self.events = self.events, []
+        if not events:
+            return
+        try:
+            with transaction.atomic():
+                write_events(events)
+        except (IntegrityError, ValueError) as e:
+            logger.warning(f"Could not write {len(events)} history events together, retrying one by one: {e}")
+            for event in events:
+                event.pk = None
+                try:
+                    with transaction.atomic():
+                        write_events([event])
+                except (IntegrityError, ValueError) as e:
+                    logger.error(f"Dropping history event {event.event_type} of card {event.card_id}: {e}")
+        except Exception as e:
+            logger.error(f"Could not write {len(events)} history events, keeping them queued: {e}", exc_info=True)
+            for event in events:
+                event.pk = None
+            with self.lock:
+                self.events[:0] = events
+                self.trim()
+
+
+buffer = EventBuffer()
+atexit.register(buffer.flush)
+
+
+def record_event(card, event_type, description, **fields):
+    """Record an EventHistory entry for `card` according to EVENT_HISTORY_MODE."""
+    event = EventHistory(card=card, event_type=event_type, description=description, **fields)
+    if getattr(settings, 'EVENT_HISTORY_MODE', 'atomic') == 'buffered':
+        transaction.on_commit(lambda: buffer.add(event))
+    else:
+        event.save()
+        summaries.events_recorded([event])
+        versions.bump(f'events:{event.card_id}')
+        live.publish_events([event])
+    return event
+
+
+def record_events(events):
+    """Record unsaved EventHistory instances of a bulk operation with one insert."""
+    if getattr(settings, 'EVENT_HISTORY_MODE', 'atomic') == 'buffered':
+        transaction.on_commit(lambda: buffer.extend(events))
+    else:
+        write_events(events)
+    return events
+
+
+def write_events(events):
+    """Insert `events` and update what derives from them, on the current connection."""
+    EventHistory.objects.bulk_create(events, batch_size=500)
+    summaries.events_recorded(events)
+    versions.bump(*{f'events:{event.card_id}' for event in events})
+    live.publish_events(events)
+
+
+def flush_events():
+    """Write the buffered events now (tests, management commands, shutdown)."""
+    buffer.flush()
@@ -0,0 +1,58 @@
+"""
+Constant memory export of cards to an Excel workbook.
+
+Cards are read with `iterator()` in chunks of `chunk_size` and appended to
+an openpyxl write-only workbook, which spools rows to a temporary file
+instead of keeping cells in memory. The finished workbook is written to a
+file object the caller streams, so no complete copy of the data set is held
+in RAM.
+"""
+import logging
+import time
+
+from openpyxl import Workbook
+
+from .importer import REQUIRED_COLUMNS, current_rss_mb
+from .models import Card
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FIELDS = ['name', 'brand', 'model', 'series', 'risk', 'location']
+CHUNK_SIZE = 2000
+
+
+class CardExporter:
+    def __init__(self, queryset=None, chunk_size=CHUNK_SIZE):
+        if queryset is None:
+            queryset = Card.objects.filter(is_deleted=False)
+        self.queryset = queryset
+        self.chunk_size = chunk_size
+        self.rows_written = 0
+        self.peak_memory_mb = 0
+
+    def write(self, file):
+        """Write the workbook to `file` (a path or a binary file object) and return stats."""
+        started = time.perf_counter()
+        self.sample_memory()
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet('Cards')
+        # Same headers the importer expects, so an export can be imported back.
+        sheet.append(REQUIRED_COLUMNS)
+        rows = self.queryset.order_by('id').values_list(*EXPORT_FIELDS)
+        for row in rows.iterator(chunk_size=self.chunk_size):
+            sheet.append(row)
+            self.rows_written += 1
+            if self.rows_written % self.chunk_size == 0:
+                self.sample_memory()
+        workbook.save(file)
+        self.sample_memory()
+        stats = {
+            'rows': self.rows_written,
+            'seconds': round(time.perf_counter() - started, 3),
+            'peak_memory_mb': round(self.peak_memory_mb, 1),
+        }
+        logger.info(f"Excel export finished: {stats}")
+        return stats
+
+    def sample_memory(self):
+        self.peak_memory_mb = max(self.peak_memory_mb, current_rss_mb())
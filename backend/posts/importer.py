@@ -0,0 +1,237 @@
+"""
+Single pass, bounded memory import of cards from an Excel workbook.
+
+The workbook is opened in openpyxl read-only mode and its rows are read
+once: the header row is detected among the first rows while streaming, and
+the data rows that follow are processed in chunks of `chunk_size`. Each
+chunk's cards and their `card_created` events are written with bulk_create
+inside one transaction.
+"""
+import logging
+import resource
+import time
+
+from django.db import transaction
+from openpyxl import load_workbook
+
+from .models import Card, EventHistory
+from .signals import cards_bulk_created
+from .utils import identity_key, normalize_column
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = ['Equipo biomedico', 'Marca', 'Modelo', 'Serie', 'Clasificacion por riesgo', 'Ubicacion']
+# The header row must be within the first rows of the sheet.
+HEADER_SEARCH_ROWS = 30
+CHUNK_SIZE = 500
+
+
+class ImportFormatError(Exception):
+    """The workbook does not have the layout the importer expects."""
+
+
+class ImportCancelled(Exception):
+    """Raised from the `on_chunk` callback to stop an import between chunks."""
+
+
+def cell_text(value):
+    """Cell value as stripped text, None for blank cells."""
+    if value is None:
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    value = str(value).strip()
+    return value or None
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize() / (1024 * 1024)
+    except OSError:
+        # ru_maxrss is the lifetime peak (KB on Linux), the best we have elsewhere.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class CardImporter:
+    """
+    `on_chunk`, if given, is called with the importer after every committed
+    chunk; it can report progress and raise ImportCancelled to stop. Chunks
+    written before the cancellation are kept.
+    """
+
+    def __init__(self, file, chunk_size=CHUNK_SIZE, on_chunk=None):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.on_chunk = on_chunk
+        # Row count from the sheet dimensions, None when the file lacks them.
+        self.total_rows = None
+        self.created_cards = []
+        self.skipped_cards = []
+        self.errors = []
+        self.rows_read = 0
+        self.peak_memory_mb = 0
+        self.started = None
+        self.finished = None
+        # Identity keys of the cards created by this import, to catch
+        # duplicates inside the same file.
+        self.seen_keys = set()
+
+    def run(self):
+        self.started = time.perf_counter()
+        self.sample_memory()
+        workbook = load_workbook(self.file, read_only=True, data_only=True)
+        try:
+            sheet = workbook.worksheets[0]
+            self.total_rows = sheet.max_row
+            rows = enumerate(sheet.iter_rows(values_only=True), start=1)
+            columns = self.find_header(rows)
+            chunk = []
+            for row_number, values in rows:
+                chunk.append((row_number, values))
+                if len(chunk) >= self.chunk_size:
+                    self.process_chunk(chunk, columns)
+                    chunk = []
+            self.process_chunk(chunk, columns)
+        finally:
+            workbook.close()
+        self.finished = time.perf_counter()
+        result = self.result()
+        logger.info(f"Excel import finished: {result['stats']}")
+        return result
+
+    def result(self):
+        """Response payload for what has been imported so far."""
+        elapsed = (self.finished or time.perf_counter()) - self.started if self.started else 0
+        stats = {
+            'rows': self.rows_read,
+            'seconds': round(elapsed, 3),
+            'rows_per_second': round(self.rows_read / elapsed) if elapsed else self.rows_read,
+            'peak_memory_mb': round(self.peak_memory_mb, 1),
+        }
+        return {
+            'created_cards_count': len(self.created_cards),
+            'created_card_ids': self.created_cards,
+            'skipped_cards_count': len(self.skipped_cards),
+            'skipped_cards': self.skipped_cards,
+            'errors': sorted(self.errors, key=lambda error: error['row']),
+            'stats': stats,
+        }
+
+    def find_header(self, rows):
+        """Consume rows up to the header and return {normalized column: index}."""
+        required = [normalize_column(col) for col in REQUIRED_COLUMNS]
+        for row_number, values in rows:
+            normalized = [normalize_column(value) if value is not None else None for value in values]
+            if all(req in normalized for req in required):
+                logger.debug(f"Found header row at row {row_number}")
+                columns = {}
+                for index, name in enumerate(normalized):
+                    if name is not None:
+                        columns.setdefault(name, index)
+                return columns
+            if row_number >= HEADER_SEARCH_ROWS:
+                break
+        raise ImportFormatError(
+            'Could not find header row containing required columns in the Excel file. '
+            'Please ensure the header row has the columns: ' + ', '.join(REQUIRED_COLUMNS)
+        )
+
+    def sample_memory(self):
+        self.peak_memory_mb = max(self.peak_memory_mb, current_rss_mb())
+
+    def process_chunk(self, chunk, columns):
+        records = []
+        for row_number, values in chunk:
+            record = {
+                name: cell_text(values[index]) if index < len(values) else None
+                for name, index in columns.items()
+            }
+            if any(record.values()):
+                key = identity_key(record.get('equipo biomedico'), record.get('modelo'), record.get('serie'))
+                records.append((row_number, record, key))
+        self.rows_read += len(records)
+
+        # One lookup for the whole chunk instead of a query per row.
+        existing_keys = set(
+            Card.objects.filter(identity_key__in={key for _, _, key in records})
+            .values_list('identity_key', flat=True)
+        )
+        pending = []
+        for row_number, record, key in records:
+            try:
+                card = self.build_card(row_number, record, key, existing_keys)
+            except Exception as e:
+                self.errors.append({'row': row_number, 'error': str(e)})
+                continue
+            if card is not None:
+                self.seen_keys.add(key)
+                pending.append((row_number, card))
+        self.write_cards(pending)
+        self.sample_memory()
+        if self.on_chunk is not None:
+            self.on_chunk(self)
+
+    def build_card(self, row_number, record, key, existing_keys):
+        """Unsaved card for a row, or None when the row is a duplicate."""
+        name_val = record.get('equipo biomedico')
+        if not name_val:
+            raise ValueError('Missing value for Equipo biomedico')
+
+        if key in existing_keys or key in self.seen_keys:
+            self.skipped_cards.append({
+                'row': row_number,
+                'name': name_val,
+                'reason': 'Duplicate card (same name, model, and series already exists)'
+            })
+            return None
+
+        return Card(
+            name=name_val,
+            brand=record.get('marca'),
+            model=record.get('modelo'),
+            series=record.get('serie'),
+            risk=record.get('clasificacion por riesgo'),
+            location=record.get('ubicacion'),
+            status='Activo',
+            identity_key=key,
+        )
+
+    def write_cards(self, pending):
+        """
+        Insert the chunk in one transaction. If that fails, retry row by row
+        so the offending rows are reported and the rest still get imported.
+        """
+        if not pending:
+            return
+        try:
+            with transaction.atomic():
+                self.insert_cards([card for _, card in pending])
+        except Exception as e:
+            logger.warning(f"Bulk insert of rows {pending[0][0]}-{pending[-1][0]} failed, retrying one by one: {e}")
+            written = []
+            for row_number, card in pending:
+                card.pk = None
+                try:
+                    with transaction.atomic():
+                        self.insert_cards([card])
+                except Exception as e:
+                    self.seen_keys.discard(card.identity_key)
+                    self.errors.append({'row': row_number, 'error': str(e)})
+                else:
+                    written.append((row_number, card))
+            pending = written
+        self.created_cards.extend(card.id for _, card in pending)
+
+    def insert_cards(self, cards):
+        Card.objects.bulk_create(cards)
+        EventHistory.objects.bulk_create([
+            EventHistory(
+                card=card,
+                event_type='card_created',
+                description=f'Tarjeta creada desde importación Excel: {card.name}',
+            )
+            for card in cards
+        ])
+        cards_bulk_created(cards)
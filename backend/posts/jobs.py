@@ -0,0 +1,114 @@
+"""
+Database backed queue for Excel imports.
+
+The API only stores the upload as a queued ImportJob; a separate worker
+process (`manage.py run_import_jobs`) claims queued jobs one at a time and
+runs CardImporter, saving progress, row errors and a heartbeat after every
+chunk.
+
+A running job without a heartbeat for IMPORT_JOB_LEASE_SECONDS lost its
+worker. `reclaim_stale_jobs` queues it again (rows already imported are
+skipped as duplicates on the next run), finishes it as cancelled if that
+was requested, or fails it after IMPORT_JOB_MAX_ATTEMPTS runs.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .importer import CardImporter, ImportCancelled, ImportFormatError
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+
+def claim_next_job():
+    """Atomically move the oldest queued job to running, or return None."""
+    for job_id in ImportJob.objects.filter(status='queued').order_by('id').values_list('id', flat=True)[:10]:
+        now = timezone.now()
+        claimed = ImportJob.objects.filter(id=job_id, status='queued').update(
+            status='running', started_at=now, heartbeat_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return ImportJob.objects.get(id=job_id)
+    return None
+
+
+def cancel_job(job):
+    """Cancel a queued job at once, or ask a running one to stop after its current chunk."""
+    if ImportJob.objects.filter(id=job.id, status='queued').update(
+        status='cancelled', cancel_requested=True, finished_at=timezone.now()
+    ):
+        discard_file(job)
+        return
+    ImportJob.objects.filter(id=job.id, status='running').update(cancel_requested=True)
+    # Nothing else would finish it if its worker is gone.
+    reclaim_stale_jobs(ImportJob.objects.filter(id=job.id))
+
+
+def reclaim_stale_jobs(jobs=None):
+    """Queue again, cancel or fail the running jobs among `jobs` (all by default) whose worker died."""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'IMPORT_JOB_LEASE_SECONDS', 600))
+    stale = (jobs if jobs is not None else ImportJob.objects.all()).filter(status='running').filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    )
+    for job in stale:
+        # The status check makes each transition happen once, should two
+        # processes reclaim the same job.
+        running = ImportJob.objects.filter(id=job.id, status='running', heartbeat_at=job.heartbeat_at)
+        if job.cancel_requested:
+            if running.update(status='cancelled', finished_at=timezone.now()):
+                discard_file(job)
+                logger.warning(f"Import job {job.id} lost its worker and was cancelled")
+        elif job.attempts >= getattr(settings, 'IMPORT_JOB_MAX_ATTEMPTS', 3):
+            if running.update(status='failed', error='The import stopped unexpectedly.', finished_at=timezone.now()):
+                discard_file(job)
+                logger.warning(f"Import job {job.id} lost its worker {job.attempts} times and was failed")
+        elif running.update(status='queued', heartbeat_at=None):
+            logger.warning(f"Import job {job.id} lost its worker and was queued again")
+
+
+def discard_file(job):
+    """Delete the uploaded workbook once it will not be read again."""
+    job.file.delete(save=False)
+    ImportJob.objects.filter(id=job.id).update(file='')
+
+
+def save_progress(job, importer):
+    ImportJob.objects.filter(id=job.id).update(
+        total_rows=importer.total_rows,
+        rows_processed=importer.rows_read,
+        created_count=len(importer.created_cards),
+        skipped_count=len(importer.skipped_cards),
+        error_count=len(importer.errors),
+        errors=sorted(importer.errors, key=lambda error: error['row']),
+        heartbeat_at=timezone.now(),
+    )
+
+
+def run_job(job):
+    def on_chunk(importer):
+        save_progress(job, importer)
+        if ImportJob.objects.filter(id=job.id, cancel_requested=True).exists():
+            raise ImportCancelled()
+
+    importer = CardImporter(job.file.path, on_chunk=on_chunk)
+    fields = {}
+    try:
+        fields['result'] = importer.run()
+        fields['status'] = 'completed'
+    except ImportCancelled:
+        fields['result'] = importer.result()
+        fields['status'] = 'cancelled'
+    except ImportFormatError as e:
+        fields.update(status='failed', error=str(e))
+    except Exception as e:
+        logger.error(f"Import job {job.id} failed: {e}", exc_info=True)
+        fields.update(status='failed', error=f'Error reading Excel file: {str(e)}')
+
+    save_progress(job, importer)
+    ImportJob.objects.filter(id=job.id).update(finished_at=timezone.now(), **fields)
+    discard_file(job)
+    logger.info(f"Import job {job.id} {fields['status']}")
@@ -0,0 +1,187 @@
+"""
+Server-Sent Events stream of card changes.
+
+Writes call `publish`, which inserts a LiveUpdate row in the writer's
+transaction, so a notification exists exactly when its change committed.
+Every ASGI worker process runs one Broadcaster task while it has connected
+clients: it polls the table for rows past the last id it has seen and hands
+them to the per-client queues. The database is the only thing the processes
+share, so fan-out needs no broker. SQLite serializes writers, which keeps ids
+in commit order and makes the id a valid resume position (Last-Event-ID).
+
+Expired notifications are pruned by the writers every PRUNE_EVERY_ROWS
+published rows, so the table stays bounded whether or not anyone listens.
+"""
+import asyncio
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import LiveUpdate
+
+logger = logging.getLogger(__name__)
+
+# Notifications a slow client may have pending before it is disconnected.
+CLIENT_QUEUE_SIZE = 1000
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 3000
+POLL_BATCH_SIZE = 500
+# Prune expired notifications every this many polls, and every this many
+# rows published by a process.
+PRUNE_EVERY = 600
+PRUNE_EVERY_ROWS = 1000
+
+published_rows = 0
+
+
+def publish(kind, card_id=None, **payload):
+    """Queue a notification for the live stream; `card_id` None means fleet wide."""
+    LiveUpdate.objects.create(kind=kind, card_id=card_id, payload=payload)
+    published(1)
+
+
+def publish_cards(cards):
+    LiveUpdate.objects.bulk_create([
+        LiveUpdate(kind='card', card_id=card.pk, payload={'status': card.status, 'is_deleted': card.is_deleted})
+        for card in cards
+    ])
+    published(len(cards))
+
+
+def publish_events(events):
+    """Notifications for recorded EventHistory rows (the card's history changed)."""
+    LiveUpdate.objects.bulk_create([
+        LiveUpdate(kind='history', card_id=event.card_id, payload={'event_type': event.event_type})
+        for event in events
+    ], batch_size=500)
+    published(len(events))
+
+
+def published(count):
+    global published_rows
+    published_rows += count
+    if published_rows >= PRUNE_EVERY_ROWS:
+        published_rows = 0
+        # After commit, so the delete is not part of the writer's transaction.
+        transaction.on_commit(lambda: expired().delete())
+
+
+def expired():
+    retention = getattr(settings, 'LIVE_UPDATES_RETENTION', 3600)
+    return LiveUpdate.objects.filter(created_at__lt=timezone.now() - timedelta(seconds=retention))
+
+
+class Broadcaster:
+    def __init__(self):
+        self.queues = set()
+        self.task = None
+        self.last_id = None
+
+    def subscribe(self, queue, latest_id):
+        """Add a client; `latest_id` is the newest notification id when it connected."""
+        self.queues.add(queue)
+        if self.task is None or self.task.done():
+            # A new poller starts from now, not from where the last one stopped.
+            self.last_id = latest_id
+            self.task = asyncio.create_task(self.run())
+
+    def unsubscribe(self, queue):
+        self.queues.discard(queue)
+
+    async def run(self):
+        interval = getattr(settings, 'LIVE_UPDATES_POLL_INTERVAL', 0.5)
+        polls = 0
+        try:
+            while self.queues:
+                rows = [
+                    row async for row in LiveUpdate.objects.filter(id__gt=self.last_id)
+                    .order_by('id').values('id', 'card_id', 'kind', 'payload')[:POLL_BATCH_SIZE]
+                ]
+                for row in rows:
+                    self.dispatch(row)
+                if rows:
+                    self.last_id = rows[-1]['id']
+                if len(rows) < POLL_BATCH_SIZE:
+                    await asyncio.sleep(interval)
+                polls += 1
+                if polls % PRUNE_EVERY == 0:
+                    await prune()
+        except Exception as e:
+            logger.error(f"Live updates poller stopped: {e}", exc_info=True)
+            for queue in list(self.queues):
+                self.drop(queue)
+        finally:
+            self.task = None
+
+    def dispatch(self, row):
+        for queue in list(self.queues):
+            try:
+                queue.put_nowait(row)
+            except asyncio.QueueFull:
+                self.drop(queue)
+
+    def drop(self, queue):
+        """Disconnect a client; the stream ends and the client reconnects with Last-Event-ID."""
+        self.queues.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+
+broadcaster = Broadcaster()
+
+
+async def prune():
+    await expired().adelete()
+
+
+def format_event(row):
+    data = json.dumps({'card_id': row['card_id'], **row['payload']}, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {row['id']}\nevent: {row['kind']}\ndata: {data}\n\n"
+
+
+async def event_stream(card_id=None, last_id=None):
+    """
+    SSE messages for one client: all notifications, or only those of
+    `card_id`. With `last_id` the notifications missed since then are
+    replayed first; if too many were missed a `reset` event tells the
+    client to refetch instead.
+    """
+    queue = asyncio.Queue(maxsize=CLIENT_QUEUE_SIZE)
+    latest = await LiveUpdate.objects.order_by('-id').values_list('id', flat=True).afirst() or 0
+    # Subscribe before replaying so nothing falls between the two; the id
+    # check below drops what the replay already sent, and without a resume
+    # position everything published before the client connected.
+    broadcaster.subscribe(queue, latest)
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        sent = last_id if last_id is not None else latest
+        if last_id is not None:
+            missed = LiveUpdate.objects.filter(id__gt=last_id).order_by('id')
+            if card_id is not None:
+                missed = missed.filter(card_id=card_id)
+            missed = [row async for row in missed.values('id', 'card_id', 'kind', 'payload')[:CLIENT_QUEUE_SIZE + 1]]
+            if len(missed) > CLIENT_QUEUE_SIZE:
+                yield "event: reset\ndata: {}\n\n"
+                missed = []
+            for row in missed:
+                sent = row['id']
+                yield format_event(row)
+        while True:
+            try:
+                row = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if row is None:
+                return
+            if row['id'] <= sent or (card_id is not None and row['card_id'] != card_id):
+                continue
+            sent = row['id']
+            yield format_event(row)
+    finally:
+        broadcaster.unsubscribe(queue)
@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.archive import archive_events
+
+
+class Command(BaseCommand):
+    help = 'Move history events older than the hot window into compressed per card and month archive segments.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=None,
+                            help='Age in days past which events are archived (default: EVENT_HISTORY_HOT_DAYS).')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be archived.')
+
+    def handle(self, *args, **options):
+        days = options['older_than_days']
+        if days is None:
+            days = getattr(settings, 'EVENT_HISTORY_HOT_DAYS', 365)
+        cutoff = timezone.now() - timedelta(days=days)
+        cards, events = archive_events(cutoff, dry_run=options['dry_run'])
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {events} events of {cards} cards older than {cutoff:%Y-%m-%d}.'))
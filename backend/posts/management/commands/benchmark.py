@@ -0,0 +1,324 @@
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+from openpyxl import Workbook
+from rest_framework.pagination import Cursor
+from rest_framework.renderers import JSONRenderer
+
+from posts import events, search
+from posts.exporter import CardExporter
+from posts.importer import REQUIRED_COLUMNS, CardImporter, current_rss_mb
+from posts.models import Card, Cronograma, EventHistory
+from posts.pagination import CardCursorPagination, EventFeedPagination
+from posts.renderers import FastJSONRenderer
+from posts.serializers import CardSerializer, CronogramaSerializer, EventHistorySerializer
+
+SCENARIOS = {}
+
+
+def scenario(name):
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+DEVICE_NAMES = [
+    'Monitor de signos vitales', 'Bomba de infusión', 'Desfibrilador', 'Electrocardiógrafo',
+    'Ventilador mecánico', 'Incubadora neonatal', 'Autoclave', 'Oxímetro de pulso',
+    'Lámpara cielítica', 'Mesa quirúrgica', 'Unidad de electrocirugía', 'Ecógrafo',
+    'Rayos X portátil', 'Centrífuga', 'Nebulizador', 'Aspirador de secreciones',
+    'Balanza pediátrica', 'Tensiómetro digital', 'Glucómetro', 'Lámpara de fototerapia',
+]
+BRANDS = ['Mindray', 'Philips', 'GE', 'Dräger', 'Baxter', 'Welch Allyn', 'Nihon Kohden', 'Covidien', 'Siemens', 'Zoll']
+LOCATIONS = [
+    'Urgencias', 'UCI adultos', 'UCI neonatal', 'Cirugía', 'Hospitalización piso 2',
+    'Hospitalización piso 3', 'Laboratorio', 'Imagenología', 'Consulta externa', 'Esterilización',
+]
+
+
+def seed_cards(start, stop, batch_size=5000):
+    """Bulk insert synthetic cards numbered from `start` up to `stop`."""
+    risks = ['I', 'IIA', 'IIB', 'III']
+    for offset in range(start, stop, batch_size):
+        with transaction.atomic():
+            Card.objects.bulk_create([
+                Card(
+                    name=f'{DEVICE_NAMES[i % len(DEVICE_NAMES)]} {i % 97}',
+                    brand=BRANDS[i % len(BRANDS)],
+                    model=f'{BRANDS[i % len(BRANDS)][:2].upper()}-{i % 300}',
+                    series=f'SN{i:08d}',
+                    risk=risks[i % 4],
+                    location=LOCATIONS[i % len(LOCATIONS)],
+                    status='Activo',
+                    is_deleted=(i % 20 == 0),
+                )
+                for i in range(offset, min(offset + batch_size, stop))
+            ])
+
+
+def measure(func, repeat):
+    """Run `func` `repeat` times and return the timings in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+@scenario('cards_page')
+def bench_cards_page(command, options):
+    """First page, a page from the middle of the table and the unpaginated list."""
+    client = Client()
+    page_size = options['page_size']
+    seeded = 0
+    command.stdout.write(f'{"cards":>10} {"first page":>12} {"middle page":>12} {"full list":>12}')
+    for size in sorted(options['sizes'] or [1000, 100000, 1000000]):
+        seed_cards(seeded, size)
+        seeded = size
+
+        def first_page():
+            client.get('/cards/', {'page_size': page_size})
+
+        paginator = CardCursorPagination()
+        paginator.base_url = 'http://testserver/cards/'
+        paginator.page_size = page_size
+        middle_url = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=str(size // 2)))
+
+        def middle_page():
+            client.get(middle_url)
+
+        first = statistics.median(measure(first_page, options['repeat']))
+        middle = statistics.median(measure(middle_page, options['repeat']))
+        if size <= options['full_list_limit']:
+            full = f'{statistics.median(measure(lambda: client.get("/cards/"), 1)):10.1f}ms'
+        else:
+            full = f'{"skipped":>12}'
+        command.stdout.write(f'{size:>10} {first:10.1f}ms {middle:10.1f}ms {full}')
+
+
+@scenario('serialization')
+def bench_serialization(command, options):
+    """Rows/sec of ModelSerializer + JSONRenderer against values() + FastJSONRenderer."""
+    size = max(options['sizes'] or [100000])
+    seed_cards(0, size)
+    card_ids = list(Card.objects.values_list('id', flat=True)[:1000])
+    with transaction.atomic():
+        Cronograma.objects.bulk_create(
+            [Cronograma(card_id=card_ids[i % len(card_ids)], date=f'2025-{i % 12 + 1:02d}-01', title=f'Actividad {i}')
+             for i in range(size)],
+            batch_size=5000,
+        )
+        EventHistory.objects.bulk_create(
+            [EventHistory(card_id=card_ids[i % len(card_ids)], event_type='status_changed',
+                          description=f'Estado cambiado {i}') for i in range(size)],
+            batch_size=5000,
+        )
+
+    cases = [
+        ('cards', CardSerializer, Card.objects.all()),
+        ('cronograma', CronogramaSerializer, Cronograma.objects.all()),
+        ('events', EventHistorySerializer, EventHistory.objects.order_by('-timestamp')),
+    ]
+    command.stdout.write(f'{"rows":>10} {"serializer":>12} {"model rows/s":>14} {"values rows/s":>14}')
+    for label, serializer_class, queryset in cases:
+        def model_path():
+            JSONRenderer().render(serializer_class(queryset.all(), many=True).data)
+
+        def values_path():
+            rows = serializer_class.values_queryset(queryset.all())
+            FastJSONRenderer().render(serializer_class.serialize_values(rows))
+
+        model = statistics.median(measure(model_path, options['repeat']))
+        values = statistics.median(measure(values_path, options['repeat']))
+        command.stdout.write(f'{size:>10} {label:>12} {size / model * 1000:>14,.0f} {size / values * 1000:>14,.0f}')
+
+
+@scenario('search')
+def bench_search(command, options):
+    """Latency of ranked full-text queries at the largest requested size."""
+    size = max(options['sizes'] or [500000])
+    seed_cards(0, size)
+    search.rebuild_index()
+    queries = ['SN00012345', 'sn000123', 'desfibrilador zoll', 'Cielitica 42', 'monitor urgencias', 'bomba']
+    command.stdout.write(f'{"cards":>10} {"query":>20} {"median":>10} {"p95":>10}')
+    for query in queries:
+        timings = sorted(measure(lambda: search.search_card_ids(query, limit=50), options['repeat']))
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        command.stdout.write(f'{size:>10} {query:>20} {statistics.median(timings):8.2f}ms {p95:8.2f}ms')
+
+
+def write_workbook(path, start, stop):
+    """Synthetic inventory workbook with a title row above the header."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(['Inventario de equipos biomédicos'])
+    sheet.append(REQUIRED_COLUMNS)
+    for i in range(start, stop):
+        sheet.append([
+            f'{DEVICE_NAMES[i % len(DEVICE_NAMES)]} {i % 97}', BRANDS[i % len(BRANDS)],
+            f'M-{i % 300}', f'XL{i:08d}', ['I', 'IIA', 'IIB', 'III'][i % 4], LOCATIONS[i % len(LOCATIONS)],
+        ])
+    workbook.save(path)
+
+
+@scenario('import')
+def bench_import(command, options):
+    """Excel import throughput on synthetic workbooks."""
+    command.stdout.write(f'{"rows":>10} {"seconds":>10} {"rows/s":>10} {"peak MB":>10}')
+    start = 0
+    for size in sorted(options['sizes'] or [10000, 50000, 100000]):
+        with tempfile.NamedTemporaryFile(suffix='.xlsx') as workbook_file:
+            write_workbook(workbook_file.name, start, start + size)
+            stats = CardImporter(workbook_file.name).run()['stats']
+        start += size
+        command.stdout.write(
+            f'{size:>10} {stats["seconds"]:>10.2f} {stats["rows_per_second"]:>10,} {stats["peak_memory_mb"]:>10.1f}'
+        )
+
+
+@scenario('export')
+def bench_export(command, options):
+    """Excel export time and memory growth over the RSS before the export."""
+    command.stdout.write(f'{"cards":>10} {"seconds":>10} {"rows/s":>10} {"extra MB":>10}')
+    seeded = 0
+    for size in sorted(options['sizes'] or [1000, 100000, 500000]):
+        seed_cards(seeded, size)
+        seeded = size
+        baseline = current_rss_mb()
+        with tempfile.TemporaryFile() as export_file:
+            stats = CardExporter().write(export_file)
+        command.stdout.write(
+            f'{size:>10} {stats["seconds"]:>10.2f} {stats["rows"] / stats["seconds"]:>10,.0f} '
+            f'{stats["peak_memory_mb"] - baseline:>10.1f}'
+        )
+
+
+def seed_events(card_ids, start, stop, batch_size=10000):
+    """Bulk insert synthetic events spread over the cards, one minute apart."""
+    event_types = [choice for choice, _ in EventHistory.EVENT_TYPES]
+    origin = timezone.now() - timedelta(minutes=stop)
+    for offset in range(start, stop, batch_size):
+        with transaction.atomic():
+            EventHistory.objects.bulk_create([
+                EventHistory(
+                    card_id=card_ids[(i * 7919) % len(card_ids)],
+                    event_type=event_types[i % len(event_types)],
+                    description=f'Evento sintético {i}',
+                    timestamp=origin + timedelta(minutes=i),
+                )
+                for i in range(offset, min(offset + batch_size, stop))
+            ])
+
+
+@scenario('event_feed')
+def bench_event_feed(command, options):
+    """Fleet wide event feed: first page, a deep page and filtered pages."""
+    client = Client()
+    seed_cards(0, 10000)
+    card_ids = list(Card.objects.values_list('id', flat=True))
+    page_size = options['page_size']
+    seeded = 0
+    command.stdout.write(f'{"events":>10} {"query":>20} {"median":>10}')
+    for size in sorted(options['sizes'] or [100000, 1000000]):
+        seed_events(card_ids, seeded, size)
+        seeded = size
+        middle = EventHistory.objects.order_by('-timestamp', '-id').values('timestamp', 'id')[size // 2]
+        deep_cursor = EventFeedPagination().encode_cursor((middle['timestamp'], middle['id']))
+        queries = [
+            ('first page', {}),
+            ('deep page', {'cursor': deep_cursor}),
+            ('event_type', {'event_type': 'status_changed'}),
+            ('location', {'location': LOCATIONS[3]}),
+            ('date range', {'start': middle['timestamp'].date().isoformat(),
+                            'end': middle['timestamp'].date().isoformat()}),
+        ]
+        for label, params in queries:
+            params = {'page_size': page_size, **params}
+            timing = statistics.median(measure(lambda: client.get('/api/events/', params), options['repeat']))
+            command.stdout.write(f'{size:>10} {label:>20} {timing:8.2f}ms')
+
+
+@scenario('event_writes')
+def bench_event_writes(command, options):
+    """Latency of event-logging write endpoints under concurrent clients, per EVENT_HISTORY_MODE."""
+    seed_cards(0, 1000)
+    card_ids = list(Card.objects.filter(is_deleted=False).values_list('id', flat=True))
+    cronograma_ids = [
+        cronograma.id for cronograma in Cronograma.objects.bulk_create(
+            [Cronograma(card_id=card_id, date='2025-01-01', title='Calibración') for card_id in card_ids[:200]]
+        )
+    ]
+    threads = options['threads']
+    requests_per_thread = options['repeat'] * 10
+    command.stdout.write(f'{"mode":>10} {"threads":>8} {"req/s":>8} {"p50":>10} {"p99":>10}')
+    for mode in ('atomic', 'buffered'):
+        timings = []
+
+        def client_loop(worker):
+            client = Client()
+            try:
+                for i in range(requests_per_thread):
+                    n = worker * requests_per_thread + i
+                    started = time.perf_counter()
+                    if n % 2:
+                        client.post(f'/toggle_status/{card_ids[n % len(card_ids)]}/')
+                    else:
+                        client.post(f'/api/cronograma/{cronograma_ids[n % len(cronograma_ids)]}/update/',
+                                    {'completed': n % 4 == 0}, content_type='application/json')
+                    timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                connections.close_all()
+
+        with override_settings(EVENT_HISTORY_MODE=mode):
+            started = time.perf_counter()
+            workers = [threading.Thread(target=client_loop, args=(worker,)) for worker in range(threads)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - started
+            events.flush_events()
+        timings.sort()
+        p99 = timings[int(len(timings) * 0.99) - 1]
+        command.stdout.write(
+            f'{mode:>10} {threads:>8} {len(timings) / elapsed:>8,.0f} '
+            f'{statistics.median(timings):8.2f}ms {p99:8.2f}ms'
+        )
+
+
+class Command(BaseCommand):
+    help = 'Run a benchmark scenario against a throwaway database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=sorted(SCENARIOS))
+        parser.add_argument('--sizes', nargs='+', type=int,
+                            help='Table or workbook sizes, each scenario has its own default.')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent clients for write scenarios.')
+        parser.add_argument('--full-list-limit', type=int, default=100000,
+                            help='Largest table size for which the unpaginated list is timed.')
+
+    def handle(self, *args, **options):
+        workdir = tempfile.mkdtemp(prefix='posts-bench-')
+        # A file backed database so timings include real disk writes.
+        connection.settings_dict['TEST']['NAME'] = os.path.join(workdir, 'bench.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(DEBUG=False):
+                SCENARIOS[options['scenario']](self, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(workdir, ignore_errors=True)
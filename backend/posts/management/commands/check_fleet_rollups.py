@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.rollups import differences
+
+
+class Command(BaseCommand):
+    help = 'Compare the fleet dashboard rollups with counts from the cards; fails when they disagree.'
+
+    def handle(self, *args, **options):
+        wrong = differences()
+        for dimension, value, stored, actual in wrong:
+            self.stdout.write(f'{dimension}={value!r}: rollup {stored}, cards {actual}')
+        if wrong:
+            raise CommandError(f'{len(wrong)} fleet rollups disagree with the cards; run rebuild_fleet_rollups.')
+        self.stdout.write(self.style.SUCCESS('Fleet rollups match the cards.'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts.changelog import compact, retention_cutoff
+
+
+class Command(BaseCommand):
+    help = ('Delete card change log entries older than CARD_CHANGES_RETENTION_DAYS that a later entry '
+            'supersedes, and tombstones of hard deleted cards past it. Sync cursors older than the '
+            'retention window are answered with 410 and must start over from 0.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted.')
+
+    def handle(self, *args, **options):
+        cutoff = retention_cutoff()
+        deleted = compact(cutoff, dry_run=options['dry_run'])
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {deleted} card changes older than {cutoff:%Y-%m-%d}.'))
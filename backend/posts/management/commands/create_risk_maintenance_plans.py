@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from posts.models import MaintenancePlan
+from posts.recurrence import RISK_PLAN_MONTHS
+
+
+class Command(BaseCommand):
+    help = 'Create the default preventive maintenance plan of each risk class that does not have an active one.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', default=None, help='First occurrence date, YYYY-MM-DD (default: today).')
+        parser.add_argument('--title', default='Mantenimiento preventivo', help='Title of the generated activities.')
+
+    def handle(self, *args, **options):
+        start = timezone.localdate()
+        if options['start']:
+            start = parse_date(options['start'])
+            if start is None:
+                raise CommandError('--start must be a YYYY-MM-DD date.')
+        existing = set(
+            MaintenancePlan.objects.filter(active=True, card__isnull=True).values_list('risk', flat=True)
+        )
+        created = [
+            MaintenancePlan.objects.create(
+                risk=risk, title=options['title'], frequency='monthly', interval=months, start_date=start,
+            )
+            for risk, months in RISK_PLAN_MONTHS.items() if risk not in existing
+        ]
+        for plan in created:
+            self.stdout.write(f'Risk {plan.risk}: every {plan.interval} months from {plan.start_date}.')
+        self.stdout.write(self.style.SUCCESS(f'Created {len(created)} risk maintenance plans.'))
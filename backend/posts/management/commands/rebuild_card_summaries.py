@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.summaries import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per card maintenance summaries from the cronograma, documents, interventions and history.'
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the summaries of {count} cards.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the fleet dashboard rollups (live cards per status, risk, location, brand and due date).'
+
+    def handle(self, *args, **options):
+        rows = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} fleet rollup rows.'))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+from posts.models import Card
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of cards from scratch.'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Full-text search needs an SQLite database.')
+        search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {Card.objects.count()} cards.'))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts.jobs import claim_next_job, reclaim_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued Excel import jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Run the jobs currently queued and exit instead of polling.')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait between checks for new jobs.')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            reclaim_stale_jobs()
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+            self.stdout.write(f'Running import job {job.id} ({job.original_name})')
+            run_job(job)
+            job.refresh_from_db()
+            self.stdout.write(f'Import job {job.id} {job.status}: {job.created_count} created, '
+                              f'{job.skipped_count} skipped, {job.error_count} errors')
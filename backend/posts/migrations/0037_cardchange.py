@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:28
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_card_changes(apps, schema_editor):
+    """Seed the change log so a sync from cursor 0 returns every existing card."""
+    Card = apps.get_model('posts', 'Card')
+    CardChange = apps.get_model('posts', 'CardChange')
+    card_ids = Card.objects.order_by('id').values_list('id', flat=True)
+    CardChange.objects.bulk_create(
+        (CardChange(card_id=card_id, operation='created') for card_id in card_ids.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0036_card_deleted_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('card_id', models.BigIntegerField(db_index=True)),
+                ('operation', models.CharField(choices=[('created', 'Creada'), ('updated', 'Actualizada'), ('deleted', 'Eliminada')], max_length=20)),
+                ('timestamp', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.RunPython(backfill_card_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+import unicodedata
+
+from django.db import migrations
+
+# The index as posts.search defined it when this migration was written.
+FTS_TABLE = 'posts_card_fts'
+SEARCH_FIELDS = ('name', 'brand', 'model', 'series', 'location')
+SEARCH_WEIGHTS = (10.0, 2.0, 2.0, 5.0, 1.0)
+
+
+def fold(value):
+    """Accents stripped, lower case, as posts.utils.normalize_column folds text."""
+    if not value:
+        return ''
+    return unicodedata.normalize('NFD', str(value)).encode('ascii', 'ignore').decode('ascii').lower().strip()
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    Card = apps.get_model('posts', 'Card')
+    rows = [
+        (card_id, *(fold(value) for value in values))
+        for card_id, *values in Card.objects.using(connection.alias)
+        .filter(is_deleted=False).values_list('id', *SEARCH_FIELDS)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"{', '.join(SEARCH_FIELDS)}, tokenize='unicode61 remove_diacritics 2', "
+            f"detail=column, prefix='2 3')"
+        )
+        weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) VALUES ('rank', %s)", [f'bm25({weights})'])
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(SEARCH_FIELDS)}) VALUES (%s, %s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0037_cardchange'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:58
+
+import unicodedata
+
+from django.db import migrations, models
+
+# As posts.utils.identity_key built the key when this migration was written.
+IDENTITY_SEPARATOR = '\x1f'
+
+
+def fold(value):
+    return unicodedata.normalize('NFD', str(value)).encode('ascii', 'ignore').decode('ascii').lower().strip()
+
+
+def identity_key(name, model, series):
+    return IDENTITY_SEPARATOR.join(fold(value or '') for value in (series, name, model))
+
+
+def backfill_identity_keys(apps, schema_editor):
+    Card = apps.get_model('posts', 'Card')
+    batch = []
+    for card in Card.objects.only('id', 'name', 'model', 'series').iterator(chunk_size=1000):
+        card.identity_key = identity_key(card.name, card.model, card.series)
+        batch.append(card)
+        if len(batch) >= 1000:
+            Card.objects.bulk_update(batch, ['identity_key'])
+            batch = []
+    Card.objects.bulk_update(batch, ['identity_key'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0038_card_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='card',
+            name='identity_key',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=310),
+        ),
+        migrations.RunPython(backfill_identity_keys, migrations.RunPython.noop),
+    ]
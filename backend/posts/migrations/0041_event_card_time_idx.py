@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0040_importjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventhistory',
+            index=models.Index(fields=['card', 'timestamp', 'id'], name='event_card_time_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+DESCRIPTION_PREFIXES = {
+    'document_added': 'Documento agregado:',
+    'document_removed': 'Documento eliminado:',
+}
+
+
+def link_batch(EventHistory, Document, batch):
+    titles = {(event.card_id, event.title) for event in batch}
+    documents = {}
+    rows = Document.objects.filter(
+        card_id__in={card_id for card_id, _ in titles},
+        title__in={title for _, title in titles},
+    ).order_by('id').values_list('card_id', 'title', 'id')
+    for card_id, title, document_id in rows:
+        # First match by id, as the old Document.objects.filter(...).first() lookup.
+        documents.setdefault((card_id, title), document_id)
+    linked = []
+    for event in batch:
+        event.document_id = documents.get((event.card_id, event.title))
+        if event.document_id is not None:
+            linked.append(event)
+    EventHistory.objects.bulk_update(linked, ['document'])
+
+
+def link_document_events(apps, schema_editor):
+    """Resolve the document of existing events from the title in their description."""
+    EventHistory = apps.get_model('posts', 'EventHistory')
+    Document = apps.get_model('posts', 'Document')
+    events = EventHistory.objects.filter(
+        event_type__in=DESCRIPTION_PREFIXES, document__isnull=True,
+    ).only('id', 'card_id', 'event_type', 'description')
+    batch = []
+    for event in events.iterator(chunk_size=1000):
+        prefix = DESCRIPTION_PREFIXES[event.event_type]
+        if prefix not in event.description:
+            continue
+        event.title = event.description.replace(prefix, '').strip()
+        batch.append(event)
+        if len(batch) >= 1000:
+            link_batch(EventHistory, Document, batch)
+            batch = []
+    if batch:
+        link_batch(EventHistory, Document, batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0041_event_card_time_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventhistory',
+            name='document',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='posts.document'),
+        ),
+        migrations.RunPython(link_document_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0042_eventhistory_document'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='eventhistory',
+            index=models.Index(fields=['timestamp', 'id'], name='event_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='eventhistory',
+            index=models.Index(fields=['event_type', 'timestamp', 'id'], name='event_type_time_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0043_event_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventArchiveSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('codec', models.CharField(max_length=10)),
+                ('event_count', models.PositiveIntegerField()),
+                ('first_timestamp', models.DateTimeField()),
+                ('last_timestamp', models.DateTimeField()),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('card', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_archive', to='posts.card')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['card', 'last_timestamp'], name='event_archive_card_time_idx')],
+                'constraints': [models.UniqueConstraint(fields=('card', 'month'), name='event_archive_card_month_uniq')],
+            },
+        ),
+    ]
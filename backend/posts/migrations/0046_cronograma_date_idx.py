@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0045_liveupdate'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cronograma',
+            index=models.Index(fields=['date', 'card'], name='cronograma_date_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0046_cronograma_date_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MaintenancePlanException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('occurrence_date', models.DateField()),
+                ('new_date', models.DateField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cronograma',
+            name='occurrence_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='MaintenancePlan',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('risk', models.CharField(blank=True, max_length=50)),
+                ('title', models.CharField(max_length=255)),
+                ('frequency', models.CharField(choices=[('weekly', 'Semanal'), ('monthly', 'Mensual'), ('yearly', 'Anual')], max_length=10)),
+                ('interval', models.PositiveIntegerField(default=1)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('card', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='maintenance_plans', to='posts.card')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='cronograma',
+            name='plan',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='occurrences', to='posts.maintenanceplan'),
+        ),
+        migrations.AddConstraint(
+            model_name='cronograma',
+            constraint=models.UniqueConstraint(condition=models.Q(('plan__isnull', False)), fields=('plan', 'card', 'occurrence_date'), name='cronograma_plan_occurrence_uniq'),
+        ),
+        migrations.AddField(
+            model_name='maintenanceplanexception',
+            name='card',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='maintenance_exceptions', to='posts.card'),
+        ),
+        migrations.AddField(
+            model_name='maintenanceplanexception',
+            name='plan',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exceptions', to='posts.maintenanceplan'),
+        ),
+        migrations.AddConstraint(
+            model_name='maintenanceplan',
+            constraint=models.CheckConstraint(condition=models.Q(models.Q(('card__isnull', False), ('risk', '')), models.Q(('card__isnull', True), models.Q(('risk', ''), _negated=True)), _connector='OR'), name='maintenance_plan_card_or_risk'),
+        ),
+        migrations.AddConstraint(
+            model_name='maintenanceplanexception',
+            constraint=models.UniqueConstraint(fields=('plan', 'card', 'occurrence_date'), name='plan_exception_uniq'),
+        ),
+    ]
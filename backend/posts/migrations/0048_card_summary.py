@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, OuterRef, Subquery
+
+
+def fill_summaries(apps, schema_editor):
+    """One summary per existing card, from grouped queries over each source table."""
+    Card = apps.get_model('posts', 'Card')
+    CardSummary = apps.get_model('posts', 'CardSummary')
+    Cronograma = apps.get_model('posts', 'Cronograma')
+    Document = apps.get_model('posts', 'Document')
+    EventHistory = apps.get_model('posts', 'EventHistory')
+    RegistroIntervencion = apps.get_model('posts', 'RegistroIntervencion')
+
+    pending = {
+        row['card_id']: row for row in Cronograma.objects.filter(completed=False).values('card_id')
+        .annotate(next_due=Min('date'), pending_count=Count('id')).order_by()
+    }
+    documents = dict(
+        Document.objects.filter(is_deleted=False).values('card_id')
+        .annotate(n=Count('id')).order_by().values_list('card_id', 'n')
+    )
+    interventions = dict(
+        RegistroIntervencion.objects.values('card_id').annotate(last=Max('date')).order_by().values_list('card_id', 'last')
+    )
+    latest = EventHistory.objects.filter(card_id=OuterRef('pk')).order_by('-timestamp', '-id')
+    cards = Card.objects.annotate(
+        last_event_at=Subquery(latest.values('timestamp')[:1]),
+        last_event_type=Subquery(latest.values('event_type')[:1]),
+    ).values_list('id', 'last_event_at', 'last_event_type')
+    CardSummary.objects.bulk_create([
+        CardSummary(
+            card_id=card_id,
+            next_due=pending.get(card_id, {}).get('next_due'),
+            pending_count=pending.get(card_id, {}).get('pending_count', 0),
+            document_count=documents.get(card_id, 0),
+            last_intervention=interventions.get(card_id),
+            last_event_at=last_event_at,
+            last_event_type=last_event_type or '',
+        )
+        for card_id, last_event_at, last_event_type in cards.iterator(chunk_size=1000)
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0047_maintenance_plans'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CardSummary',
+            fields=[
+                ('card', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='posts.card')),
+                ('next_due', models.DateField(blank=True, null=True)),
+                ('pending_count', models.PositiveIntegerField(default=0)),
+                ('document_count', models.PositiveIntegerField(default=0)),
+                ('last_intervention', models.DateField(blank=True, null=True)),
+                ('last_event_at', models.DateTimeField(blank=True, null=True)),
+                ('last_event_type', models.CharField(blank=True, max_length=50)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['next_due'], name='card_summary_next_due_idx'), models.Index(fields=['last_event_at'], name='card_summary_last_event_idx')],
+            },
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
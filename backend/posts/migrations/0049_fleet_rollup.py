@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:30
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+DIMENSIONS = ('status', 'risk', 'location', 'brand')
+
+
+def fill_rollups(apps, schema_editor):
+    """Count the live cards per dimension value, as posts.rollups.compute does."""
+    Card = apps.get_model('posts', 'Card')
+    FleetRollup = apps.get_model('posts', 'FleetRollup')
+    live = Card.objects.filter(is_deleted=False)
+    counts = Counter()
+    for dimension in DIMENSIONS:
+        for value, count in live.values_list(dimension).annotate(count=Count('id')).order_by():
+            counts[(dimension, value or '')] += count
+    due = live.filter(summary__next_due__isnull=False).values_list('summary__next_due')
+    for next_due, count in due.annotate(count=Count('id')).order_by():
+        counts[('due', next_due.isoformat())] += count
+    FleetRollup.objects.bulk_create([
+        FleetRollup(dimension=dimension, value=value, count=count) for (dimension, value), count in counts.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0048_card_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FleetRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=20)),
+                ('value', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'value'), name='fleet_rollup_uniq')],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
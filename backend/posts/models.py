@@ -1,7 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 import uuid
 from django.utils import timezone
 
+from .utils import identity_key
+
 class Card(models.Model):
     RISK_CHOICES = [
         ('I', 'I'),
@@ -19,15 +21,104 @@ class Card(models.Model):
     status = models.CharField(max_length=50, blank=True, null=True)
     is_deleted = models.BooleanField(default=False)
     access_token = models.UUIDField(default=uuid.uuid4, unique=False, editable=False)
+    # Normalized series + name + model, kept by save(); see utils.identity_key.
+    identity_key = models.CharField(max_length=310, db_index=True, editable=False, default='')
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of live / deleted cards walks this index in id order.
+            models.Index(fields=['is_deleted', 'id'], name='card_deleted_id_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.access_token:
             self.access_token = uuid.uuid4()
-        super().save(*args, **kwargs)
+        self.identity_key = identity_key(self.name, self.model, self.series)
+        # The fleet rollup signals read the card's state before the write and
+        # apply the difference after it; one transaction, with the row
+        # locked by the first read, keeps concurrent writes from both
+        # applying a difference from the same state.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
 
     def __str__(self):
         return self.name
 
+class CardChange(models.Model):
+    """
+    Log of card writes. Its id is the cursor handed to clients by the delta
+    sync endpoint, so ids only ever grow; old entries are compacted away
+    (see posts/changelog.py).
+    """
+    OPERATIONS = [
+        ('created', 'Creada'),
+        ('updated', 'Actualizada'),
+        ('deleted', 'Eliminada'),
+    ]
+
+    # Plain integer instead of a FK so the entry survives a hard delete.
+    card_id = models.BigIntegerField(db_index=True)
+    operation = models.CharField(max_length=20, choices=OPERATIONS)
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.card_id} {self.operation} #{self.id}"
+
+class CardSummary(models.Model):
+    """
+    Per card maintenance summary for the card list, kept up to date on every
+    write to the card's cronograma, interventions, documents and history
+    (see posts/summaries.py) so listings read it without aggregating.
+    `manage.py rebuild_card_summaries` recomputes it from the source tables.
+    """
+    card = models.OneToOneField(Card, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    next_due = models.DateField(null=True, blank=True)  # Earliest pending activity; overdue when in the past
+    pending_count = models.PositiveIntegerField(default=0)  # Pending activities, each plan with pending occurrences once
+    document_count = models.PositiveIntegerField(default=0)  # Live documents
+    last_intervention = models.DateField(null=True, blank=True)
+    last_event_at = models.DateTimeField(null=True, blank=True)
+    last_event_type = models.CharField(max_length=50, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_due'], name='card_summary_next_due_idx'),
+            models.Index(fields=['last_event_at'], name='card_summary_last_event_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.card_id} (próxima {self.next_due})"
+
+class VersionStamp(models.Model):
+    """Version of a scope of rows, for cache keys and ETags (see posts/versions.py)."""
+    scope = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.scope} @{self.version}"
+
+class FleetRollup(models.Model):
+    """
+    Live card count per value of a card dimension (status, risk, location,
+    brand, and 'due': the next due maintenance date), kept up to date by the
+    card and cronograma writes (see posts/rollups.py). Empty values are
+    stored as ''.
+    """
+    dimension = models.CharField(max_length=20)
+    value = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'value'], name='fleet_rollup_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}={self.value}: {self.count}"
+
 class Document(models.Model):
     card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name='documents')
     title = models.CharField(max_length=255)
@@ -38,11 +129,72 @@ class Document(models.Model):
     def __str__(self):
         return self.title
 
+class MaintenancePlan(models.Model):
+    """
+    Recurring preventive maintenance, for one card or for every live card of
+    a risk class. Occurrences are expanded on read (see posts/recurrence.py);
+    only completed or rescheduled ones are stored, as Cronograma rows and
+    MaintenancePlanException rows.
+    """
+    FREQUENCIES = [
+        ('weekly', 'Semanal'),
+        ('monthly', 'Mensual'),
+        ('yearly', 'Anual'),
+    ]
+
+    card = models.ForeignKey(Card, on_delete=models.CASCADE, null=True, blank=True, related_name='maintenance_plans')
+    risk = models.CharField(max_length=50, blank=True)  # Risk class plan when card is empty
+    title = models.CharField(max_length=255)
+    frequency = models.CharField(max_length=10, choices=FREQUENCIES)
+    interval = models.PositiveIntegerField(default=1)  # Every `interval` weeks, months or years
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(card__isnull=False, risk='') | (models.Q(card__isnull=True) & ~models.Q(risk='')),
+                name='maintenance_plan_card_or_risk',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.card_id or self.risk})"
+
+class MaintenancePlanException(models.Model):
+    """A skipped or moved occurrence of a plan for one card."""
+    plan = models.ForeignKey(MaintenancePlan, on_delete=models.CASCADE, related_name='exceptions')
+    card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name='maintenance_exceptions')
+    occurrence_date = models.DateField()
+    new_date = models.DateField(null=True, blank=True)  # Empty when the occurrence is skipped
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['plan', 'card', 'occurrence_date'], name='plan_exception_uniq'),
+        ]
+
 class Cronograma(models.Model):
     card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name="cronograma")
     date = models.DateField()
     title = models.CharField(max_length=255)
     completed = models.BooleanField(default=False)
+    # Set when the row is a stored occurrence of a maintenance plan.
+    plan = models.ForeignKey(MaintenancePlan, on_delete=models.SET_NULL, null=True, blank=True, related_name='occurrences')
+    occurrence_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Calendar windows: date range scan, card id read from the index for the join.
+            models.Index(fields=['date', 'card'], name='cronograma_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['plan', 'card', 'occurrence_date'], condition=models.Q(plan__isnull=False),
+                name='cronograma_plan_occurrence_uniq',
+            ),
+        ]
 
 class RegistroIntervencion(models.Model):
     card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name="intervenciones")
@@ -70,6 +222,91 @@ class EventHistory(models.Model):
     description = models.TextField()
     timestamp = models.DateTimeField(default=timezone.now)
     document_file = models.FileField(upload_to='deleted_documents/', null=True, blank=True)
+    # Document a document_added / document_removed event refers to.
+    document = models.ForeignKey(Document, on_delete=models.SET_NULL, null=True, blank=True, related_name='events')
+
+    class Meta:
+        indexes = [
+            # Per card timeline, newest first (keyset pagination on timestamp, id).
+            models.Index(fields=['card', 'timestamp', 'id'], name='event_card_time_idx'),
+            # Fleet wide feed, newest first, optionally narrowed to one event type.
+            models.Index(fields=['timestamp', 'id'], name='event_time_idx'),
+            models.Index(fields=['event_type', 'timestamp', 'id'], name='event_type_time_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_event_type_display()} - {self.card.name} - {self.timestamp}"
+
+class EventArchiveSegment(models.Model):
+    """
+    EventHistory rows of one card and month moved out of the hot table by
+    `manage.py archive_events`, stored as compressed NDJSON (see posts/archive.py).
+    """
+    card = models.ForeignKey(Card, on_delete=models.CASCADE, related_name='event_archive')
+    month = models.DateField()  # First day of the month
+    codec = models.CharField(max_length=10)
+    event_count = models.PositiveIntegerField()
+    first_timestamp = models.DateTimeField()
+    last_timestamp = models.DateTimeField()
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['card', 'month'], name='event_archive_card_month_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['card', 'last_timestamp'], name='event_archive_card_time_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.card_id} {self.month:%Y-%m} ({self.event_count} eventos)"
+
+class LiveUpdate(models.Model):
+    """
+    Change notification for the live updates stream (see posts/live.py).
+    Rows are short lived; every server process polls the table by id and
+    pushes new rows to its connected clients.
+    """
+    card_id = models.BigIntegerField(null=True)  # None for fleet wide notifications
+    kind = models.CharField(max_length=30)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.card_id}"
+
+class ImportJob(models.Model):
+    """Excel import submitted through the API and run by the `run_import_jobs` worker."""
+    STATUSES = [
+        ('queued', 'En cola'),
+        ('running', 'En proceso'),
+        ('completed', 'Completada'),
+        ('failed', 'Fallida'),
+        ('cancelled', 'Cancelada'),
+    ]
+
+    file = models.FileField(upload_to='imports/')
+    original_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUSES, default='queued', db_index=True)
+    cancel_requested = models.BooleanField(default=False)
+    total_rows = models.PositiveIntegerField(null=True, blank=True)
+    rows_processed = models.PositiveIntegerField(default=0)
+    created_count = models.PositiveIntegerField(default=0)
+    skipped_count = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0)
+    # Row errors so far, saved with the progress after every chunk.
+    errors = models.JSONField(default=list, blank=True)
+    result = models.JSONField(null=True, blank=True)  # Same payload as import_cards_from_excel
+    error = models.TextField(blank=True)
+    # Times the job was claimed by a worker; a job whose worker died is
+    # queued again until it runs out of attempts.
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Last sign of life of the worker running the job.
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.original_name} ({self.get_status_display()})"
@@ -0,0 +1,131 @@
+from base64 import b64decode, b64encode
+from datetime import datetime
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class CardCursorPagination(CursorPagination):
+    """
+    Keyset pagination for card listings, ordered by the primary key.
+
+    Cards that are soft deleted or restored between two pages do not shift
+    the rest of the listing. Pagination is only applied when the client sends
+    `cursor` or `page_size`, so existing clients keep getting a plain list.
+    """
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class EventKeysetPagination(BasePagination):
+    """
+    Keyset pagination for event timelines, newest first.
+
+    The cursor is the (timestamp, id) of the last event of the previous
+    page, so every page is an index range scan no matter how deep it is,
+    and ties on timestamp are broken by id. Works on model and values()
+    querysets. Like CardCursorPagination it is opt-in through `cursor` or
+    `page_size`.
+
+    `older_rows(before, limit)`, if given, continues a page once the
+    queryset is exhausted; it must return rows older than every row of the
+    queryset, newest first.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param], strict=True, cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def encode_cursor(self, position):
+        timestamp, pk = position
+        return b64encode(f'{timestamp.isoformat()}|{pk}'.encode()).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            timestamp, pk = b64decode(encoded.encode('ascii'), validate=True).decode().split('|')
+            return datetime.fromisoformat(timestamp), int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None, older_rows=None):
+        if not self.is_requested(request):
+            return None
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+
+        position = self.decode_cursor(request)
+        queryset = queryset.order_by('-timestamp', '-id')
+        if position is not None:
+            timestamp, pk = position
+            # (timestamp, id) < position, written so the timestamp bound is a range on the index.
+            queryset = queryset.filter(timestamp__lte=timestamp).exclude(timestamp=timestamp, id__gte=pk)
+
+        results = list(queryset[:page_size + 1])
+        if older_rows is not None and len(results) <= page_size:
+            results.extend(older_rows(position, page_size + 1 - len(results)))
+        self.has_next = len(results) > page_size
+        results = results[:page_size]
+        if results:
+            last = results[-1]
+            self.next_position = (last['timestamp'], last['id']) if isinstance(last, dict) else (last.timestamp, last.pk)
+        return results
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class EventFeedPagination(EventKeysetPagination):
+    """Always paginated: the fleet wide feed is far too large for one response."""
+    page_size = 50
+    max_page_size = 500
+
+    def is_requested(self, request):
+        return True
@@ -0,0 +1,204 @@
+"""
+Lazy expansion of recurring maintenance plans.
+
+A MaintenancePlan is never materialized ahead of time. For a date window,
+`expand_occurrences` computes the occurrence dates of the active plans,
+applies the stored exceptions (skipped or moved occurrences) and leaves out
+occurrences that already have a Cronograma row (completed, or reopened as
+pending). The work is bounded by the window and takes a fixed number of
+queries, however long the plans run.
+
+`pending_plan_occurrences` finds, per card, the earliest plan occurrence
+still pending, for the card summaries (posts/summaries.py).
+"""
+import calendar
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Q
+
+from .models import Card, Cronograma, MaintenancePlan, MaintenancePlanException
+
+# Default preventive maintenance interval in months per risk class, used by
+# `manage.py create_risk_maintenance_plans`.
+RISK_PLAN_MONTHS = {'III': 3, 'IIB': 6, 'IIA': 12, 'I': 12}
+# The first pending occurrence is searched for in windows of this many days
+# per unit of the plan interval, long enough to hold an occurrence.
+SEARCH_WINDOW_DAYS = 366
+
+
+def add_months(day, months):
+    """`day` moved `months` months ahead, clamped to the end of shorter months."""
+    month_index = day.month - 1 + months
+    year, month = day.year + month_index // 12, month_index % 12 + 1
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def occurrence_dates(plan, start, end):
+    """Occurrence dates of `plan` from `start` to `end`, inclusive."""
+    last = min(end, plan.end_date) if plan.end_date else end
+    first = max(start, plan.start_date)
+    if first > last:
+        return []
+    dates = []
+    if plan.frequency == 'weekly':
+        step = 7 * plan.interval
+        # Jump straight to the first occurrence in the window.
+        n = -(-(first - plan.start_date).days // step)
+        day = plan.start_date + timedelta(days=n * step)
+        while day <= last:
+            dates.append(day)
+            day += timedelta(days=step)
+        return dates
+    step = plan.interval * (12 if plan.frequency == 'yearly' else 1)
+    months_in = (first.year - plan.start_date.year) * 12 + first.month - plan.start_date.month
+    n = max(0, months_in // step)
+    day = add_months(plan.start_date, n * step)
+    while day <= last:
+        if day >= first:
+            dates.append(day)
+        n += 1
+        day = add_months(plan.start_date, n * step)
+    return dates
+
+
+def plan_applies_to(plan, card):
+    return plan.card_id == card.pk if plan.card_id else (card.risk == plan.risk and not card.is_deleted)
+
+
+def expand_occurrences(start, end, cards=None):
+    """
+    Pending plan occurrences dated from `start` to `end` for the live cards in
+    `cards` (a Card queryset, all live cards by default), as rows shaped like
+    the CronogramaSerializer output with `id` None. Sorted by date.
+    """
+    cards = (cards if cards is not None else Card.objects.all()).filter(is_deleted=False)
+    plans = list(
+        MaintenancePlan.objects.filter(active=True, start_date__lte=end)
+        .filter(Q(end_date__isnull=True) | Q(end_date__gte=start))
+        .filter(Q(card__in=cards.values('id')) | Q(card__isnull=True))
+    )
+    if not plans:
+        return []
+
+    risks = {plan.risk for plan in plans if not plan.card_id}
+    cards_by_risk = defaultdict(list)
+    if risks:
+        for card_id, risk in cards.filter(risk__in=risks).values_list('id', 'risk'):
+            cards_by_risk[risk].append(card_id)
+    risk_card_ids = {card_id for card_ids in cards_by_risk.values() for card_id in card_ids}
+
+    plan_ids = [plan.id for plan in plans]
+    # Exceptions of occurrences in the window or moved into it.
+    moves = {}
+    moved_in = []
+    for plan_id, card_id, occurrence_date, new_date in MaintenancePlanException.objects.filter(
+        Q(occurrence_date__range=(start, end)) | Q(new_date__range=(start, end)), plan_id__in=plan_ids,
+    ).values_list('plan_id', 'card_id', 'occurrence_date', 'new_date'):
+        moves[(plan_id, card_id, occurrence_date)] = new_date
+        if new_date is not None and start <= new_date <= end and not start <= occurrence_date <= end:
+            moved_in.append((plan_id, card_id, occurrence_date))
+    stored = set(
+        Cronograma.objects.filter(plan_id__in=plan_ids)
+        .filter(Q(occurrence_date__range=(start, end)) | Q(date__range=(start, end)))
+        .values_list('plan_id', 'card_id', 'occurrence_date')
+    )
+
+    plans_by_id = {plan.id: plan for plan in plans}
+    occurrences = []
+
+    def add(plan, card_id, occurrence_date):
+        key = (plan.id, card_id, occurrence_date)
+        if key in stored:
+            return
+        day = moves.get(key, occurrence_date)
+        if day is None or not start <= day <= end:
+            return
+        occurrences.append({
+            'id': None,
+            'date': day.isoformat(),
+            'title': plan.title,
+            'card_id': card_id,
+            'completed': False,
+            'plan_id': plan.id,
+            'occurrence_date': occurrence_date.isoformat(),
+        })
+
+    for plan in plans:
+        card_ids = [plan.card_id] if plan.card_id else cards_by_risk.get(plan.risk, [])
+        if not card_ids:
+            continue
+        for occurrence_date in occurrence_dates(plan, start, end):
+            for card_id in card_ids:
+                add(plan, card_id, occurrence_date)
+    for plan_id, card_id, occurrence_date in moved_in:
+        plan = plans_by_id[plan_id]
+        if plan.card_id or card_id in risk_card_ids:
+            add(plan, card_id, occurrence_date)
+    occurrences.sort(key=lambda occurrence: (occurrence['date'], occurrence['plan_id'], occurrence['card_id']))
+    return occurrences
+
+
+def first_pending_date(plan, stored, moves):
+    """
+    Date of the earliest pending occurrence of `plan` for one card, or None.
+    `stored` holds the occurrence dates with a Cronograma row, `moves` maps
+    the occurrence dates with an exception to their new date (None: skipped).
+    """
+    candidates = [new_date for occurrence_date, new_date in moves.items()
+                  if new_date is not None and occurrence_date not in stored]
+    taken = set(stored) | set(moves)
+    # Every window holds at least one occurrence, and only finitely many
+    # are taken, so the search ends.
+    window = timedelta(days=SEARCH_WINDOW_DAYS * plan.interval)
+    start = plan.start_date
+    while plan.end_date is None or start <= plan.end_date:
+        end = start + window
+        pending = [day for day in occurrence_dates(plan, start, end) if day not in taken]
+        if pending:
+            candidates.append(pending[0])
+            break
+        start = end + timedelta(days=1)
+    return min(candidates, default=None)
+
+
+def pending_plan_occurrences(card_ids):
+    """
+    {card_id: (next_date, plans)} for the live cards among `card_ids` that
+    have pending plan occurrences: the date of the earliest one (moves
+    applied) and the number of plans with one. Occurrences stored as
+    Cronograma rows, completed or not, and skipped ones are not counted.
+    """
+    risks = dict(Card.objects.filter(id__in=card_ids, is_deleted=False).values_list('id', 'risk'))
+    if not risks:
+        return {}
+    plans = list(
+        MaintenancePlan.objects.filter(active=True)
+        .filter(Q(card__in=list(risks)) | Q(card__isnull=True, risk__in=set(risks.values())))
+    )
+    if not plans:
+        return {}
+    plan_ids = [plan.id for plan in plans]
+    moves = defaultdict(dict)
+    for plan_id, card_id, occurrence_date, new_date in MaintenancePlanException.objects.filter(
+        plan_id__in=plan_ids, card_id__in=list(risks),
+    ).values_list('plan_id', 'card_id', 'occurrence_date', 'new_date'):
+        moves[(plan_id, card_id)][occurrence_date] = new_date
+    stored = defaultdict(set)
+    for plan_id, card_id, occurrence_date in Cronograma.objects.filter(
+        plan_id__in=plan_ids, card_id__in=list(risks),
+    ).values_list('plan_id', 'card_id', 'occurrence_date'):
+        stored[(plan_id, card_id)].add(occurrence_date)
+    cards_by_risk = defaultdict(list)
+    for card_id, risk in risks.items():
+        cards_by_risk[risk].append(card_id)
+
+    pending = {}
+    for plan in plans:
+        for card_id in [plan.card_id] if plan.card_id else cards_by_risk.get(plan.risk, []):
+            day = first_pending_date(plan, stored.get((plan.id, card_id), set()), moves.get((plan.id, card_id), {}))
+            if day is None:
+                continue
+            next_date, count = pending.get(card_id, (day, 0))
+            pending[card_id] = (min(next_date, day), count + 1)
+    return pending
@@ -0,0 +1,138 @@
+"""
+Incrementally maintained fleet counts for the dashboards.
+
+FleetRollup holds the number of live cards per value of each dimension.
+Every write that can move a card between values reads the card's state
+(its dimension values, or nothing once it is deleted) before and after the
+write and applies the difference as +1/-1 updates, so the counts never
+need a scan of the cards. The before state is read with the cards locked,
+in the transaction of the write, so concurrent writes to a card apply their
+differences one after the other. Rows whose count drops to zero are
+deleted, so there is at most one row per value in use.
+
+The 'due' dimension counts live cards by their next due maintenance date
+(CardSummary.next_due); overdue cards are those with a due date before
+today, summed over the index range of past due dates.
+
+`compute` counts everything from the source tables; the
+rebuild_fleet_rollups and check_fleet_rollups commands use it to repair and
+verify the rollups.
+"""
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import Card, FleetRollup
+
+DIMENSIONS = ('status', 'risk', 'location', 'brand')
+
+
+def card_states(card_ids, lock=False):
+    """
+    {card_id: {dimension: value}} of the live cards among `card_ids`. With
+    `lock` the card rows, deleted ones included, stay locked until the
+    transaction ends.
+    """
+    cards = Card.objects.filter(id__in=card_ids)
+    if lock:
+        cards = cards.select_for_update(of=('self',))
+    states = {}
+    for card_id, is_deleted, *values, next_due in cards.values_list(
+        'id', 'is_deleted', *DIMENSIONS, 'summary__next_due',
+    ):
+        if is_deleted:
+            continue
+        state = {dimension: value or '' for dimension, value in zip(DIMENSIONS, values)}
+        if next_due is not None:
+            state['due'] = next_due.isoformat()
+        states[card_id] = state
+    return states
+
+
+def apply(before, after):
+    """Move the rollups from the card states `before` a write to those `after` it."""
+    deltas = Counter()
+    for states, sign in ((before, -1), (after, 1)):
+        for state in states.values():
+            for dimension, value in state.items():
+                deltas[(dimension, value)] += sign
+    for (dimension, value), delta in deltas.items():
+        if not delta:
+            continue
+        rollups = FleetRollup.objects.filter(dimension=dimension, value=value)
+        if not rollups.update(count=F('count') + delta):
+            rollup, created = FleetRollup.objects.get_or_create(
+                dimension=dimension, value=value, defaults={'count': delta},
+            )
+            if not created:
+                rollups.update(count=F('count') + delta)
+        if delta < 0:
+            rollups.filter(count=0).delete()
+
+
+@contextmanager
+def tracking(card_ids):
+    """Apply the rollup changes of the writes to `card_ids` done inside the block."""
+    with transaction.atomic():
+        before = card_states(card_ids, lock=True)
+        yield
+        apply(before, card_states(card_ids))
+
+
+def compute():
+    """{(dimension, value): count} of the live cards, from the cards and their summaries."""
+    live = Card.objects.filter(is_deleted=False)
+    counts = Counter()
+    for dimension in DIMENSIONS:
+        for value, count in live.values_list(dimension).annotate(count=Count('id')).order_by():
+            counts[(dimension, value or '')] += count
+    due = live.filter(summary__next_due__isnull=False).values_list('summary__next_due')
+    for next_due, count in due.annotate(count=Count('id')).order_by():
+        counts[('due', next_due.isoformat())] += count
+    return counts
+
+
+def stored():
+    return {
+        (dimension, value): count
+        for dimension, value, count in FleetRollup.objects.exclude(count=0).values_list('dimension', 'value', 'count')
+    }
+
+
+def rebuild():
+    """Replace the rollups with freshly computed counts. Returns the number of rows."""
+    counts = compute()
+    with transaction.atomic():
+        FleetRollup.objects.all().delete()
+        FleetRollup.objects.bulk_create([
+            FleetRollup(dimension=dimension, value=value, count=count)
+            for (dimension, value), count in counts.items()
+        ], batch_size=500)
+    return len(counts)
+
+
+def differences():
+    """[(dimension, value, stored, actual)] where the rollups disagree with the source tables."""
+    actual, kept = compute(), stored()
+    return sorted(
+        (dimension, value, kept.get((dimension, value), 0), actual.get((dimension, value), 0))
+        for dimension, value in set(actual) | set(kept)
+        if kept.get((dimension, value), 0) != actual.get((dimension, value), 0)
+    )
+
+
+def fleet_aggregates(today):
+    """The dashboard payload, read from the rollup rows alone."""
+    result = {dimension: {} for dimension in DIMENSIONS}
+    for dimension, value, count in FleetRollup.objects.filter(dimension__in=DIMENSIONS).values_list(
+        'dimension', 'value', 'count',
+    ):
+        result[dimension][value] = count
+    overdue = FleetRollup.objects.filter(dimension='due', value__lt=today.isoformat()).aggregate(total=Sum('count'))
+    return {
+        'total': sum(result['status'].values()),
+        **result,
+        'overdue': overdue['total'] or 0,
+    }
@@ -0,0 +1,142 @@
+"""
+Full-text search over cards backed by an SQLite FTS5 table.
+
+The table stores the searchable fields of live cards already folded with
+`normalize_column` (accents stripped, lower case), and queries are folded
+the same way, so "Calibracion" matches "Calibración". Rows are keyed by the
+card id and kept in sync by the Card signals and by `index_cards` on bulk
+writes; soft deleted cards are removed from the index, so queries never need
+to join the cards table. Other database backends fall back to `icontains`
+lookups.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import Card
+from .utils import normalize_column
+
+FTS_TABLE = 'posts_card_fts'
+SEARCH_FIELDS = ('name', 'brand', 'model', 'series', 'location')
+# bm25 column weights, same order as SEARCH_FIELDS.
+SEARCH_WEIGHTS = (10.0, 2.0, 2.0, 5.0, 1.0)
+TOKEN_RE = re.compile(r'\w+')
+# Queries matching more cards than this are returned in id order instead of by rank.
+RANKED_MATCH_LIMIT = 2000
+
+
+def is_available(using=None):
+    return (using or connection).vendor == 'sqlite'
+
+
+def create_index(using=None):
+    # detail=column drops token positions (no phrase queries needed), and the
+    # prefix indexes make short "as you type" prefixes cheap.
+    with (using or connection).cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"{', '.join(SEARCH_FIELDS)}, tokenize='unicode61 remove_diacritics 2', "
+            f"detail=column, prefix='2 3')"
+        )
+        weights = ', '.join(str(weight) for weight in SEARCH_WEIGHTS)
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) VALUES ('rank', %s)", [f'bm25({weights})'])
+
+
+def drop_index(using=None):
+    with (using or connection).cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def index_rows(rows, using=None):
+    """Upsert (id, name, brand, model, series, location) tuples into the index."""
+    rows = [
+        (row[0], *(normalize_column(value) if value else '' for value in row[1:]))
+        for row in rows
+    ]
+    if not rows:
+        return
+    conn = using or connection
+    # One transaction, so concurrent upserts of the same card cannot interleave.
+    with transaction.atomic(using=conn.alias), conn.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(SEARCH_FIELDS)}) VALUES (%s, %s, %s, %s, %s, %s)",
+            rows,
+        )
+
+
+def index_cards(cards):
+    """Index live cards and drop soft deleted ones from the index."""
+    if not is_available():
+        return
+    remove_cards([card.pk for card in cards if card.is_deleted])
+    index_rows([
+        (card.pk, *(getattr(card, field) for field in SEARCH_FIELDS))
+        for card in cards if not card.is_deleted
+    ])
+
+
+def remove_cards(card_ids):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(card_id,) for card_id in card_ids])
+
+
+def rebuild_index(batch_size=5000, using=None):
+    """Re-create the whole index from the cards table."""
+    conn = using or connection
+    drop_index(conn)
+    create_index(conn)
+    rows = Card.objects.using(conn.alias).filter(is_deleted=False).order_by('id').values_list('id', *SEARCH_FIELDS)
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            index_rows(batch, conn)
+            batch = []
+    index_rows(batch, conn)
+
+
+def build_match(query):
+    """
+    Turn free text into an FTS5 expression. All folded words must match; the
+    last one is treated as a prefix since it is usually still being typed.
+    """
+    tokens = [f'"{token}"' for token in TOKEN_RE.findall(normalize_column(query))]
+    if tokens:
+        tokens[-1] += '*'
+    return ' '.join(tokens)
+
+
+def search_card_ids(query, limit, offset=0):
+    """Ids of live cards matching `query`, best match first."""
+    match = build_match(query)
+    if not match:
+        return list(
+            Card.objects.filter(is_deleted=False).order_by('id')
+            .values_list('id', flat=True)[offset:offset + limit]
+        )
+    if not is_available():
+        lookup = Q()
+        for token in TOKEN_RE.findall(query):
+            lookup &= Q(*(Q(**{f'{field}__icontains': token}) for field in SEARCH_FIELDS), _connector=Q.OR)
+        return list(
+            Card.objects.filter(lookup, is_deleted=False).order_by('id')
+            .values_list('id', flat=True)[offset:offset + limit]
+        )
+    with connection.cursor() as cursor:
+        # Ranking has to score every match, so very broad queries (a single
+        # common word) are cheaper to return in id order. Probe with an
+        # unranked query that stops after RANKED_MATCH_LIMIT rows.
+        cursor.execute(
+            f"SELECT count(*) FROM (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s LIMIT %s)",
+            [match, RANKED_MATCH_LIMIT + 1],
+        )
+        order = 'rank' if cursor.fetchone()[0] <= RANKED_MATCH_LIMIT else 'rowid'
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY {order} LIMIT %s OFFSET %s",
+            [match, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
@@ -1,11 +1,65 @@
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Card, Document, Cronograma, RegistroIntervencion, EventHistory
+from .models import (
+    Card, CardSummary, Document, Cronograma, RegistroIntervencion, EventHistory, ImportJob, MaintenancePlan,
+)
+
+# Bound once so values() rows get exactly the DateTimeField output format.
+datetime_representation = serializers.DateTimeField().to_representation
+
+
+def media_url(field, name, request=None):
+    """URL of a stored file name, as FileField.to_representation builds it."""
+    if not name:
+        return None
+    url = field.storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+class ValuesSerializerMixin:
+    """
+    High-throughput path for list endpoints. Rows come from
+    ``queryset.values(*values_fields)`` and each serializer's
+    ``row_to_representation(row, context)`` classmethod turns them into the
+    same dicts ``.data`` would produce, without instantiating models or
+    running the per-field serializer machinery.
+    """
+    values_fields = ()
+
+    @classmethod
+    def values_queryset(cls, queryset):
+        return queryset.values(*cls.values_fields)
+
+    @classmethod
+    def serialize_values(cls, rows, context=None):
+        context = context or {}
+        return [cls.row_to_representation(row, context) for row in rows]
+
+
+class CardSerializer(ValuesSerializerMixin, serializers.ModelSerializer):
+    values_fields = ('id', 'name', 'brand', 'model', 'series', 'risk', 'location', 'status', 'image', 'is_deleted')
 
-class CardSerializer(serializers.ModelSerializer):
     class Meta:
         model = Card
         fields = ['id', 'name', 'brand', 'model', 'series', 'risk', 'location', 'status', 'image', 'is_deleted']
 
+    @classmethod
+    def row_to_representation(cls, row, context):
+        return {
+            'id': row['id'],
+            'name': row['name'] or '',
+            'brand': row['brand'] or '',
+            'model': row['model'] or '',
+            'series': row['series'] or '',
+            'risk': row['risk'] or '',
+            'location': row['location'] or '',
+            'status': row['status'] or '',
+            'image': media_url(Card._meta.get_field('image'), row['image'], context.get('request')),
+            'is_deleted': row['is_deleted'],
+        }
+
     def to_representation(self, instance):
         ret = super().to_representation(instance)
         for field, value in ret.items():
@@ -14,15 +68,93 @@ class CardSerializer(serializers.ModelSerializer):
                 ret[field] = ''
         return ret
 
+class CardSummarySerializer(ValuesSerializerMixin, serializers.ModelSerializer):
+    """Embedded in card listings as `summary`; `overdue` is derived from next_due and today."""
+    values_fields = (
+        'next_due', 'pending_count', 'document_count', 'last_intervention', 'last_event_at', 'last_event_type',
+    )
+
+    class Meta:
+        model = CardSummary
+        fields = ['next_due', 'pending_count', 'document_count', 'last_intervention', 'last_event_at', 'last_event_type']
+
+    @classmethod
+    def row_to_representation(cls, row, context):
+        today = context.get('today') or timezone.localdate()
+        return {
+            'next_due': row['next_due'].isoformat() if row['next_due'] else None,
+            'overdue': row['next_due'] is not None and row['next_due'] < today,
+            'pending_count': row['pending_count'] or 0,
+            'document_count': row['document_count'] or 0,
+            'last_intervention': row['last_intervention'].isoformat() if row['last_intervention'] else None,
+            'last_event_at': datetime_representation(row['last_event_at']) if row['last_event_at'] else None,
+            'last_event_type': row['last_event_type'] or '',
+        }
+
 class DocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Document
         fields = ['id', 'title', 'file', 'uploaded_at']
 
-class CronogramaSerializer(serializers.ModelSerializer):
+class CronogramaSerializer(ValuesSerializerMixin, serializers.ModelSerializer):
+    values_fields = ('id', 'date', 'title', 'card_id', 'completed', 'plan_id', 'occurrence_date')
+
     class Meta:
         model = Cronograma
-        fields = ['id', 'date', 'title', 'card_id', 'completed']
+        fields = ['id', 'date', 'title', 'card_id', 'completed', 'plan_id', 'occurrence_date']
+        read_only_fields = ['occurrence_date']
+
+    @classmethod
+    def row_to_representation(cls, row, context):
+        return {
+            'id': row['id'],
+            'date': row['date'].isoformat() if row['date'] else None,
+            'title': row['title'],
+            'card_id': row['card_id'],
+            'completed': row['completed'],
+            'plan_id': row['plan_id'],
+            'occurrence_date': row['occurrence_date'].isoformat() if row['occurrence_date'] else None,
+        }
+
+# Most activities one bulk cronograma request may create or update.
+BULK_CRONOGRAMA_LIMIT = 5000
+
+class CronogramaBulkCreateSerializer(serializers.Serializer):
+    """An activity to schedule on every live card matching `card_ids`, `location` and `risk` (combined)."""
+    title = serializers.CharField(max_length=255)
+    date = serializers.DateField()
+    card_ids = serializers.ListField(
+        child=serializers.IntegerField(), required=False, max_length=BULK_CRONOGRAMA_LIMIT,
+    )
+    location = serializers.CharField(required=False)
+    risk = serializers.ChoiceField(choices=Card.RISK_CHOICES, required=False)
+
+    def validate(self, attrs):
+        if not any(field in attrs for field in ('card_ids', 'location', 'risk')):
+            raise serializers.ValidationError('Select the cards with card_ids, location or risk.')
+        return attrs
+
+class CronogramaBulkUpdateSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), min_length=1, max_length=BULK_CRONOGRAMA_LIMIT)
+    completed = serializers.BooleanField()
+
+class MaintenancePlanSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MaintenancePlan
+        fields = ['id', 'card', 'risk', 'title', 'frequency', 'interval', 'start_date', 'end_date', 'active', 'created_at']
+
+    def validate(self, attrs):
+        card = attrs.get('card', getattr(self.instance, 'card', None))
+        risk = attrs.get('risk', getattr(self.instance, 'risk', ''))
+        if bool(card) == bool(risk):
+            raise serializers.ValidationError('Set exactly one of card or risk.')
+        if attrs.get('interval', 1) < 1:
+            raise serializers.ValidationError({'interval': 'Must be at least 1.'})
+        end_date = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        start_date = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        if end_date and start_date and end_date < start_date:
+            raise serializers.ValidationError({'end_date': 'Must not be before start_date.'})
+        return attrs
 
 class RegistroIntervencionSerializer(serializers.ModelSerializer):
     action_type = serializers.ChoiceField(choices=RegistroIntervencion._meta.get_field('action_type').choices)
@@ -31,14 +163,58 @@ class RegistroIntervencionSerializer(serializers.ModelSerializer):
         model = RegistroIntervencion
         fields = ['id', 'action_type', 'date', 'description', 'responsible', 'card_id']
 
-class EventHistorySerializer(serializers.ModelSerializer):
+class EventHistorySerializer(ValuesSerializerMixin, serializers.ModelSerializer):
     event_type_display = serializers.CharField(source='get_event_type_display', read_only=True)
     document_file = serializers.SerializerMethodField()  # Cambiar nombre aquí
 
+    values_fields = ('id', 'event_type', 'description', 'timestamp', 'card_id', 'document_file', 'document__file')
+    event_type_labels = dict(EventHistory.EVENT_TYPES)
+
     class Meta:
         model = EventHistory
         fields = ['id', 'event_type', 'event_type_display', 'description', 'timestamp', 'card_id', 'document_file']
 
+    @classmethod
+    def row_to_representation(cls, row, context):
+        event_type = row['event_type']
+        return {
+            'id': row['id'],
+            'event_type': event_type,
+            'event_type_display': cls.event_type_labels.get(event_type, event_type),
+            'description': row['description'],
+            'timestamp': datetime_representation(row['timestamp']),
+            'card_id': row['card_id'],
+            'document_file': cls.document_file_url(row, context),
+        }
+
+    @classmethod
+    def document_file_url(cls, row, context):
+        """Same result as get_document_file, from a values() row."""
+        request = context.get('request')
+        if row['event_type'] not in ['document_added', 'document_removed']:
+            return None
+        if row['document_file']:
+            return cls.stored_file_url(row['document_file'], request)
+        if row['event_type'] == 'document_removed':
+            return media_url(Document._meta.get_field('file'), row['document__file'], request)
+        return None
+
+    @staticmethod
+    def stored_file_url(file_path, request):
+        if not file_path.startswith('http'):
+            if not file_path.startswith('/media/'):
+                if file_path.startswith('media/'):
+                    file_path = f'/{file_path}'
+                else:
+                    file_path = f'/media/{file_path}'
+
+            if request is not None:
+                return request.build_absolute_uri(file_path)
+            else:
+                return file_path
+        else:
+            return file_path
+
     def get_document_file(self, obj):
         """
         Retorna la URL del documento según el tipo de evento
@@ -47,36 +223,58 @@ class EventHistorySerializer(serializers.ModelSerializer):
         
         if obj.event_type in ['document_added', 'document_removed']:
             if obj.document_file:
-                file_path = str(obj.document_file)
-                if not file_path.startswith('http'):
-                    if not file_path.startswith('/media/'):
-                        if file_path.startswith('media/'):
-                            file_path = f'/{file_path}'
-                        else:
-                            file_path = f'/media/{file_path}'
-                    
-                    if request is not None:
-                        return request.build_absolute_uri(file_path)
-                    else:
-                        return file_path
-                else:
-                    return file_path
+                return self.stored_file_url(str(obj.document_file), request)
             
-            if obj.event_type == 'document_removed':
-                description = obj.description
-                if 'Documento eliminado:' in description:
-                    title = description.replace('Documento eliminado:', '').strip()
-                    try:
-                        document = Document.objects.filter(
-                            card=obj.card, 
-                            title=title
-                        ).first()
-                        if document and document.file:
-                            file_path = document.file.url
-                            if request is not None:
-                                return request.build_absolute_uri(file_path)
-                            return file_path
-                    except:
-                        pass
+            if obj.event_type == 'document_removed' and obj.document_id and obj.document.file:
+                file_path = obj.document.file.url
+                if request is not None:
+                    return request.build_absolute_uri(file_path)
+                return file_path
         
-        return None
\ No newline at end of file
+        return None
+
+
+class EventFeedSerializer(EventHistorySerializer):
+    """Events of the fleet wide feed, with the card they belong to inlined."""
+    card = serializers.SerializerMethodField()
+
+    card_fields = ('name', 'location', 'risk', 'status', 'is_deleted')
+    values_fields = EventHistorySerializer.values_fields + tuple(f'card__{field}' for field in card_fields)
+
+    class Meta(EventHistorySerializer.Meta):
+        fields = EventHistorySerializer.Meta.fields + ['card']
+
+    def get_card(self, obj):
+        return self.card_representation(obj.card_id, {field: getattr(obj.card, field) for field in self.card_fields})
+
+    @classmethod
+    def row_to_representation(cls, row, context):
+        data = super().row_to_representation(row, context)
+        card = {field: row[f'card__{field}'] for field in cls.card_fields}
+        data['card'] = cls.card_representation(row['card_id'], card)
+        return data
+
+    @classmethod
+    def card_representation(cls, card_id, values):
+        # Empty text fields are '' as in CardSerializer.
+        return {'id': card_id, **{
+            field: value if field == 'is_deleted' else value or '' for field, value in values.items()
+        }}
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImportJob
+        fields = ['id', 'original_name', 'status', 'cancel_requested', 'progress', 'total_rows', 'rows_processed',
+                  'created_count', 'skipped_count', 'error_count', 'errors', 'result', 'error',
+                  'attempts', 'created_at', 'started_at', 'heartbeat_at', 'finished_at']
+
+    def get_progress(self, obj):
+        """Fraction of the sheet processed, from 0 to 1."""
+        if obj.status == 'completed':
+            return 1.0
+        if not obj.total_rows:
+            return 0.0
+        return min(obj.rows_processed / obj.total_rows, 1.0)
@@ -0,0 +1,139 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import live, rollups, search, snapshots, summaries, versions
+from .models import (
+    Card, CardChange, CardSummary, Cronograma, Document, MaintenancePlan, MaintenancePlanException,
+    RegistroIntervencion,
+)
+
+
+def cards_bulk_created(cards):
+    """
+    Side effects of the Card signals for rows inserted with bulk_create(),
+    which does not send post_save. `cards` must already have their pks.
+    """
+    CardChange.objects.bulk_create([CardChange(card_id=card.pk, operation='created') for card in cards])
+    search.index_cards(cards)
+    summaries.rebuild([card.pk for card in cards])
+    rollups.apply({}, rollups.card_states([card.pk for card in cards]))
+    versions.bump('cards')
+    snapshots.invalidate()
+    live.publish('cards_imported', count=len(cards))
+
+
+@receiver(pre_save, sender=Card)
+@receiver(pre_delete, sender=Card)
+def card_writing(sender, instance, raw=False, **kwargs):
+    # Rollup state before the write, applied against the state after it.
+    # Card.save() and delete() run in a transaction, which the lock holds
+    # until the difference is applied.
+    if not raw:
+        instance._fleet_before = rollups.card_states([instance.pk], lock=True) if instance.pk else {}
+
+
+@receiver(post_save, sender=Card)
+def card_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    CardChange.objects.create(card_id=instance.pk, operation='created' if created else 'updated')
+    if created:
+        CardSummary.objects.get_or_create(card_id=instance.pk)
+    before = getattr(instance, '_fleet_before', {})
+    rollups.apply(before, rollups.card_states([instance.pk]))
+    if plans_may_apply_differently(instance, before):
+        summaries.refresh([instance.pk], 'cronograma')
+    search.index_cards([instance])
+    live.publish_cards([instance])
+    versions.bump('cards', f'card:{instance.pk}')
+    snapshots.invalidate()
+
+
+def plans_may_apply_differently(instance, before):
+    """Whether a card write can change which maintenance plans apply to the card."""
+    was = before.get(instance.pk)
+    if instance.is_deleted:
+        return was is not None
+    return was is None or was['risk'] != (instance.risk or '')
+
+
+@receiver(post_delete, sender=Card)
+def card_deleted(sender, instance, **kwargs):
+    CardChange.objects.create(card_id=instance.pk, operation='deleted')
+    rollups.apply(getattr(instance, '_fleet_before', {}), {})
+    search.remove_cards([instance.pk])
+    live.publish('card_deleted', instance.pk)
+    versions.bump('cards', f'card:{instance.pk}')
+    snapshots.invalidate()
+
+
+@receiver(post_save, sender=Cronograma)
+@receiver(post_delete, sender=Cronograma)
+def cronograma_changed(sender, instance, **kwargs):
+    summaries.refresh([instance.card_id], 'cronograma')
+    versions.bump('cronograma', f'cronograma:{instance.card_id}')
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+def document_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    summaries.refresh([instance.card_id], 'documents')
+    versions.bump(f'documents:{instance.card_id}')
+
+
+@receiver(post_save, sender=RegistroIntervencion)
+@receiver(post_delete, sender=RegistroIntervencion)
+def intervention_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    summaries.refresh([instance.card_id], 'interventions')
+    versions.bump(f'interventions:{instance.card_id}')
+
+
+@receiver(pre_save, sender=MaintenancePlan)
+def plan_saving(sender, instance, raw=False, **kwargs):
+    # The cards the plan applied to before the write need their summaries refreshed too.
+    if not raw and instance.pk:
+        instance._cards_before = plan_card_ids(MaintenancePlan.objects.filter(pk=instance.pk).first())
+
+
+def plan_card_ids(plan):
+    if plan is None:
+        return set()
+    if plan.card_id:
+        return {plan.card_id}
+    return set(Card.objects.filter(risk=plan.risk, is_deleted=False).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=MaintenancePlan)
+@receiver(post_delete, sender=MaintenancePlan)
+def plan_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    card_ids = plan_card_ids(instance) | getattr(instance, '_cards_before', set())
+    summaries.refresh(sorted(card_ids), 'cronograma')
+    versions.bump('plans')
+
+
+@receiver(post_save, sender=MaintenancePlanException)
+@receiver(post_delete, sender=MaintenancePlanException)
+def plan_exception_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    summaries.refresh([instance.card_id], 'cronograma')
+    versions.bump('plans')
+
+
+@receiver(post_migrate)
+def database_migrated(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    # Cached counts and card list snapshots describe the database they were
+    # built from, not a new or restored one. The test
+    # databases are neither, and must not wipe a running server's caches.
+    if sender.name == 'posts' and using == DEFAULT_DB_ALIAS and not getattr(settings, 'TESTING', False):
+        caches['default'].clear()
+        caches['snapshots'].clear()
@@ -0,0 +1,243 @@
+"""
+Precompressed snapshot of the live card list.
+
+The plain `GET /cards/` (no query parameters, JSON) is the most common
+request and its body rarely changes. The snapshot keeps that body rendered
+and compressed (gzip, plus brotli and zstd when their packages are
+installed) in the `snapshots` cache, a file cache shared by the worker
+processes of the host. One cache entry holds every encoding and the 'cards'
+version it was built from (see posts/versions.py), so writing it swaps the
+snapshot atomically and readers can always tell whether it is current.
+
+Image URLs in the list are absolute, so the body depends on the host it is
+served for. There is one snapshot, for CARD_SNAPSHOT_ORIGIN; requests for
+any other origin get the list rendered as usual, so Host headers cannot
+multiply the snapshots.
+
+Card writes schedule a rebuild in a background thread once they commit; an
+flock() on CARD_SNAPSHOT_LOCK_FILE lets one process rebuild at a time, and
+the kernel releases it if that process dies. Until the new snapshot is in
+place, requests are served the previous one for up to
+CARD_SNAPSHOT_STALE_SECONDS after the write (stale-while-revalidate). Past
+that, or with no snapshot at all, the list is rendered as usual and the
+snapshot is saved from that response.
+"""
+import fcntl
+import gzip
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.encoding import iri_to_uri
+
+from . import versions
+from .models import Card
+from .renderers import FastJSONRenderer
+from .serializers import CardSerializer
+
+try:
+    import brotli
+except ImportError:  # brotli is optional.
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional.
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = 'cards:snapshot'
+# Writes arriving within this many seconds share one rebuild.
+REBUILD_DELAY = 0.2
+# Preferred first when the client accepts several.
+ENCODINGS = ('br', 'zstd', 'gzip')
+
+
+def enabled():
+    return getattr(settings, 'CARD_SNAPSHOT_ENABLED', True) and bool(origin())
+
+
+def origin():
+    return getattr(settings, 'CARD_SNAPSHOT_ORIGIN', None)
+
+
+def serves(request):
+    """Whether `request` is for the origin the snapshot is built for."""
+    return enabled() and f'{request.scheme}://{request.get_host()}' == origin()
+
+
+def snapshot_cache():
+    return caches['snapshots']
+
+
+def compress(body):
+    encodings = {'identity': body, 'gzip': gzip.compress(body, compresslevel=6)}
+    if brotli is not None:
+        encodings['br'] = brotli.compress(body, quality=9)
+    if zstandard is not None:
+        encodings['zstd'] = zstandard.ZstdCompressor(level=10).compress(body)
+    return encodings
+
+
+def accepted_encoding(header, available):
+    """Best of `available` allowed by an Accept-Encoding header, 'identity' if none is."""
+    qualities = {}
+    for part in header.split(','):
+        name, _, params = part.partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name.strip().lower()] = quality
+    for encoding in ENCODINGS:
+        if encoding in available and qualities.get(encoding, qualities.get('*', 0.0)) > 0:
+            return encoding
+    return 'identity'
+
+
+class SnapshotRequest:
+    """Stands in for the request in the serializer context: URLs are made absolute against `base_url`."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def build_absolute_uri(self, location):
+        if not urlsplit(location).scheme and location.startswith('/') and not location.startswith('//'):
+            location = self.base_url + location
+        return iri_to_uri(location)
+
+
+def render_cards(base_url):
+    """The body of the plain card list, as CardViewSet.list renders it."""
+    rows = CardSerializer.values_queryset(Card.objects.filter(is_deleted=False))
+    data = CardSerializer.serialize_values(rows, {'request': SnapshotRequest(base_url)})
+    return FastJSONRenderer().render(data, 'application/json', {})
+
+
+def save(version, body):
+    snapshot_cache().set(SNAPSHOT_KEY, {
+        'version': version,
+        'built_at': time.time(),
+        'encodings': compress(body),
+    }, None)
+
+
+@contextmanager
+def rebuild_lock():
+    """Hold the host wide rebuild lock for the block; yields False when another process has it."""
+    path = settings.CARD_SNAPSHOT_LOCK_FILE
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def rebuild():
+    """Rebuild the snapshot, unless another process is at it."""
+    if not enabled():
+        return False
+    with rebuild_lock() as locked:
+        if not locked:
+            return False
+        # The version is read before the rows, so a write in between leaves
+        # the snapshot marked stale rather than current.
+        [version] = versions.current('cards')
+        started = time.perf_counter()
+        save(version, render_cards(origin()))
+        logger.info(f"Card list snapshot rebuilt in {time.perf_counter() - started:.3f}s")
+    return True
+
+
+class Rebuilder:
+    """Per process background thread running the rebuilds scheduled by card writes."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = False
+        self.thread = None
+
+    def schedule(self):
+        with self.lock:
+            self.pending = True
+            # Started lazily so forked workers each get their own thread.
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='card-snapshot-rebuild', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        try:
+            while True:
+                time.sleep(REBUILD_DELAY)
+                with self.lock:
+                    if not self.pending:
+                        self.thread = None
+                        return
+                    self.pending = False
+                try:
+                    rebuild()
+                except Exception as e:
+                    logger.error(f"Could not rebuild the card list snapshot: {e}", exc_info=True)
+        finally:
+            connection.close()
+
+
+rebuilder = Rebuilder()
+
+
+def invalidate():
+    """Called on card writes: rebuild the snapshots once the transaction commits."""
+    if enabled():
+        transaction.on_commit(rebuilder.schedule)
+
+
+def cached_response(request):
+    """
+    (response, version): the snapshot response for `request` when one is
+    current or stale within CARD_SNAPSHOT_STALE_SECONDS, else None, and the
+    'cards' version to save a freshly rendered list under.
+    """
+    [version] = versions.current('cards')
+    snapshot = snapshot_cache().get(SNAPSHOT_KEY)
+    if snapshot is None:
+        return None, version
+    if snapshot['version'] != version:
+        # Versions are the time of the last write, in nanoseconds.
+        stale_for = time.time() - version / 1e9
+        if stale_for > getattr(settings, 'CARD_SNAPSHOT_STALE_SECONDS', 30):
+            return None, version
+        rebuilder.schedule()
+    encoding = accepted_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''), snapshot['encodings'])
+    response = HttpResponse(snapshot['encodings'][encoding], content_type='application/json')
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    patch_vary_headers(response, ('Accept-Encoding',))
+    response.stale = snapshot['version'] != version
+    return response, version
+
+
+def save_on_render(request, response, version):
+    """Save the snapshot from a freshly rendered plain card list response."""
+    def store(response):
+        if response.status_code == 200:
+            save(version, response.content)
+
+    response.add_post_render_callback(store)
+    patch_vary_headers(response, ('Accept-Encoding',))
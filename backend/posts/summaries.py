@@ -0,0 +1,169 @@
+"""
+Incremental maintenance of CardSummary rows.
+
+Every source table has a function computing its summary fields for a set of
+cards with one grouped query on the card's own rows. Writes call `refresh`
+with the affected cards and sources, which recomputes just those fields and
+updates them in place. History events only ever get newer, so
+`events_recorded` moves the last event forward without reading the table.
+`rebuild` recomputes whole rows from every source.
+
+The 'cronograma' fields include the recurring maintenance plans: a plan
+with a pending occurrence counts as one pending activity, due at its
+earliest pending occurrence (see recurrence.pending_plan_occurrences).
+Plan, plan exception and card risk or deletion changes refresh them too.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, OuterRef, Q, Subquery
+
+from . import recurrence, rollups, versions
+from .models import Card, CardSummary, Cronograma, Document, EventHistory, RegistroIntervencion
+
+SUMMARY_FIELDS = (
+    'next_due', 'pending_count', 'document_count', 'last_intervention', 'last_event_at', 'last_event_type',
+)
+REBUILD_BATCH_SIZE = 500
+
+
+def cronograma_fields(card_ids):
+    fields = {card_id: {'next_due': None, 'pending_count': 0} for card_id in card_ids}
+    rows = (
+        Cronograma.objects.filter(card_id__in=card_ids, completed=False)
+        .values('card_id').annotate(next_due=Min('date'), pending_count=Count('id')).order_by()
+    )
+    for row in rows:
+        fields[row['card_id']] = {'next_due': row['next_due'], 'pending_count': row['pending_count']}
+    for card_id, (next_date, plans) in recurrence.pending_plan_occurrences(card_ids).items():
+        next_due = fields[card_id]['next_due']
+        fields[card_id] = {
+            'next_due': min(next_due, next_date) if next_due else next_date,
+            'pending_count': fields[card_id]['pending_count'] + plans,
+        }
+    return fields
+
+
+def document_fields(card_ids):
+    fields = {card_id: {'document_count': 0} for card_id in card_ids}
+    rows = (
+        Document.objects.filter(card_id__in=card_ids, is_deleted=False)
+        .values('card_id').annotate(document_count=Count('id')).order_by()
+    )
+    for row in rows:
+        fields[row['card_id']] = {'document_count': row['document_count']}
+    return fields
+
+
+def intervention_fields(card_ids):
+    fields = {card_id: {'last_intervention': None} for card_id in card_ids}
+    rows = (
+        RegistroIntervencion.objects.filter(card_id__in=card_ids)
+        .values('card_id').annotate(last_intervention=Max('date')).order_by()
+    )
+    for row in rows:
+        fields[row['card_id']] = {'last_intervention': row['last_intervention']}
+    return fields
+
+
+def event_fields(card_ids):
+    from .archive import latest_archived_rows
+
+    latest = EventHistory.objects.filter(card_id=OuterRef('pk')).order_by('-timestamp', '-id')
+    rows = Card.objects.filter(id__in=card_ids).annotate(
+        last_event_at=Subquery(latest.values('timestamp')[:1]),
+        last_event_type=Subquery(latest.values('event_type')[:1]),
+    ).values_list('id', 'last_event_at', 'last_event_type')
+    fields = {card_id: {'last_event_at': None, 'last_event_type': ''} for card_id in card_ids}
+    without_hot_events = []
+    for card_id, last_event_at, last_event_type in rows:
+        fields[card_id] = {'last_event_at': last_event_at, 'last_event_type': last_event_type or ''}
+        if last_event_at is None:
+            without_hot_events.append(card_id)
+    # Every event of those cards may have been moved to the archive.
+    if without_hot_events:
+        for card_id, row in latest_archived_rows(without_hot_events).items():
+            fields[card_id] = {'last_event_at': row['timestamp'], 'last_event_type': row['event_type'] or ''}
+    return fields
+
+
+SOURCES = {
+    'cronograma': cronograma_fields,
+    'documents': document_fields,
+    'interventions': intervention_fields,
+    'events': event_fields,
+}
+
+
+def refresh(card_ids, *sources):
+    """Recompute the fields of `sources` for `card_ids` and store them."""
+    card_ids = list(card_ids)
+    if 'cronograma' in sources:
+        # The next due date moves cards between the 'due' fleet rollups.
+        with rollups.tracking(card_ids):
+            store(card_ids, sources)
+    else:
+        store(card_ids, sources)
+
+
+def store(card_ids, sources):
+    values = {card_id: {} for card_id in card_ids}
+    for source in sources:
+        for card_id, fields in SOURCES[source](card_ids).items():
+            values[card_id].update(fields)
+    # Cards whose fields came out the same (e.g. after a bulk operation) share one UPDATE.
+    groups = defaultdict(list)
+    for card_id, fields in values.items():
+        groups[tuple(sorted(fields.items()))].append(card_id)
+    updated = 0
+    for fields, group in groups.items():
+        updated += CardSummary.objects.filter(card_id__in=group).update(**dict(fields))
+    versions.bump('summaries')
+    if updated < len(values):
+        missing = set(values) - set(CardSummary.objects.filter(card_id__in=values).values_list('card_id', flat=True))
+        # A card without a summary row yet gets a full one. After commit,
+        # so a card being deleted along with its rows is not resurrected.
+        transaction.on_commit(lambda: rebuild(missing))
+
+
+def events_recorded(events):
+    """Move the last event of the cards of `events` (just written) forward."""
+    latest = {}
+    for event in events:
+        if event.card_id not in latest or event.timestamp >= latest[event.card_id].timestamp:
+            latest[event.card_id] = event
+    versions.bump('summaries')
+    if len(latest) == 1:
+        [(card_id, event)] = latest.items()
+        CardSummary.objects.filter(card_id=card_id).filter(
+            Q(last_event_at__isnull=True) | Q(last_event_at__lte=event.timestamp)
+        ).update(last_event_at=event.timestamp, last_event_type=event.event_type)
+        return
+    moved = []
+    for summary in CardSummary.objects.filter(card_id__in=latest).only('card_id', 'last_event_at'):
+        event = latest[summary.card_id]
+        if summary.last_event_at is None or summary.last_event_at <= event.timestamp:
+            summary.last_event_at, summary.last_event_type = event.timestamp, event.event_type
+            moved.append(summary)
+    CardSummary.objects.bulk_update(moved, ['last_event_at', 'last_event_type'], batch_size=REBUILD_BATCH_SIZE)
+
+
+def rebuild(card_ids=None):
+    """Recompute the summaries of `card_ids` (all cards by default). Returns the number written."""
+    cards = Card.objects.order_by('id')
+    if card_ids is not None:
+        cards = cards.filter(id__in=card_ids)
+    ids = list(cards.values_list('id', flat=True))
+    for start in range(0, len(ids), REBUILD_BATCH_SIZE):
+        batch = ids[start:start + REBUILD_BATCH_SIZE]
+        values = {card_id: {} for card_id in batch}
+        for source in SOURCES.values():
+            for card_id, fields in source(batch).items():
+                values[card_id].update(fields)
+        CardSummary.objects.bulk_create(
+            [CardSummary(card_id=card_id, **fields) for card_id, fields in values.items()],
+            update_conflicts=True, unique_fields=['card'],
+            update_fields=list(SUMMARY_FIELDS),
+        )
+    versions.bump('summaries')
+    return len(ids)
@@ -1,3 +1,787 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.db import OperationalError, connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from . import aggregates, archive, changelog, jobs, live, rollups, snapshots, summaries, versions
+from .events import EventBuffer, record_event
+from .models import (
+    Card, CardChange, CardSummary, Cronograma, Document, EventHistory, FleetRollup, ImportJob, LiveUpdate,
+    MaintenancePlan, RegistroIntervencion,
+)
+from .renderers import FastJSONRenderer
+from .serializers import CardSerializer, CronogramaSerializer, EventFeedSerializer, EventHistorySerializer
+from .signals import cards_bulk_created
+
+
+class ValuesSerializationParityTests(TestCase):
+    """The values() fast path must render exactly what the model serializers render."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.card = Card.objects.create(
+            name='Monitor de signos vitales', brand='Mindray', model='uMEC 12', series='SN 1',
+            risk='IIB', location='Urgencias', status='Activo', image='cards/monitor.jpg',
+        )
+        cls.bare_card = Card.objects.create(name='Ñandú', is_deleted=True)
+        Cronograma.objects.create(card=cls.card, date=date(2025, 3, 1), title='Calibración "anual"')
+        Cronograma.objects.create(card=cls.card, date=date(2025, 4, 1), title='Limpieza', completed=True)
+        manual = Document.objects.create(card=cls.card, title='Manual', file='documents/manual.pdf')
+        events = [
+            ('status_changed', 'Estado cambiado de "Activo" a "Fuera de servicio"', None, None),
+            ('document_added', 'Documento agregado: Manual', '/media/documents/manual.pdf', manual),
+            ('document_removed', 'Documento eliminado: Manual', None, manual),
+            ('document_removed', 'Documento eliminado: Inexistente', None, None),
+            ('document_removed', 'Documento eliminado: Guia', 'documents/guia.pdf', None),
+            ('document_added', 'Documento agregado: Externo', 'https://example.com/x.pdf', None),
+        ]
+        for i, (event_type, description, document_file, document) in enumerate(events):
+            EventHistory.objects.create(
+                card=cls.card, event_type=event_type, description=description,
+                document_file=document_file, document=document,
+                timestamp=datetime(2025, 1, 1, 12, 0, i, 123456 * (i % 2), tzinfo=dt_timezone.utc),
+            )
+
+    def assert_parity(self, serializer_class, queryset, context):
+        expected = JSONRenderer().render(serializer_class(queryset, many=True, context=context).data)
+        rows = serializer_class.values_queryset(queryset)
+        data = serializer_class.serialize_values(rows, context)
+        self.assertEqual(JSONRenderer().render(data), expected)
+        self.assertEqual(FastJSONRenderer().render(data), expected)
+
+    def test_cards(self):
+        request = RequestFactory().get('/cards/')
+        self.assert_parity(CardSerializer, Card.objects.order_by('id'), {'request': request})
+        self.assert_parity(CardSerializer, Card.objects.order_by('id'), {})
+
+    def test_cronograma(self):
+        self.assert_parity(CronogramaSerializer, Cronograma.objects.order_by('id'), {})
+
+    def test_event_history(self):
+        request = RequestFactory().get('/card/1/history/api/')
+        events = EventHistory.objects.order_by('-timestamp')
+        self.assert_parity(EventHistorySerializer, events, {'request': request})
+        self.assert_parity(EventHistorySerializer, events, {})
+        removed = [event for event in EventHistorySerializer(events, many=True).data
+                   if event['event_type'] == 'document_removed']
+        self.assertEqual([event['document_file'] for event in removed],
+                         ['/media/documents/guia.pdf', None, '/media/documents/manual.pdf'])
+
+    def test_event_feed(self):
+        EventHistory.objects.create(card=self.bare_card, event_type='status_changed', description='Dado de baja')
+        request = RequestFactory().get('/api/events/')
+        events = EventHistory.objects.order_by('-timestamp', '-id')
+        self.assert_parity(EventFeedSerializer, events, {'request': request})
+        rows = EventFeedSerializer.values_queryset(EventHistory.objects.filter(card=self.bare_card))
+        self.assertEqual(EventFeedSerializer.serialize_values(rows)[0]['card'], {
+            'id': self.bare_card.id, 'name': 'Ñandú', 'location': '', 'risk': '', 'status': '', 'is_deleted': True,
+        })
+
+
+class CardHistoryPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.card = Card.objects.create(name='Desfibrilador')
+        other = Card.objects.create(name='Autoclave')
+        same_second = datetime(2025, 2, 1, 8, 0, tzinfo=dt_timezone.utc)
+        for i in range(7):
+            EventHistory.objects.create(
+                card=cls.card, event_type='status_changed' if i % 2 else 'document_added',
+                description=f'Evento {i}',
+                # Several events share a timestamp to check the id tie-break.
+                timestamp=same_second if i < 4 else datetime(2025, 2, i, 8, 0, tzinfo=dt_timezone.utc),
+            )
+        EventHistory.objects.create(card=other, event_type='status_changed', description='Otra tarjeta')
+        cls.url = reverse('card_history_api', args=[cls.card.id])
+
+    def test_pages_cover_history_in_order(self):
+        expected = list(
+            EventHistory.objects.filter(card=self.card).order_by('-timestamp', '-id').values_list('id', flat=True)
+        )
+        seen = []
+        url = self.url + '?page_size=3'
+        while url:
+            data = self.client.get(url).json()
+            self.assertLessEqual(len(data['results']), 3)
+            seen.extend(event['id'] for event in data['results'])
+            url = data['next']
+        self.assertEqual(seen, expected)
+
+    def test_unpaginated_response_is_a_list(self):
+        self.assertEqual(len(self.client.get(self.url).json()), 7)
+
+    def test_filters(self):
+        data = self.client.get(self.url, {'event_type': 'status_changed', 'start': '2025-02-01', 'end': '2025-02-05'}).json()
+        self.assertEqual({event['event_type'] for event in data}, {'status_changed'})
+        self.assertEqual({event['description'] for event in data}, {'Evento 1', 'Evento 3', 'Evento 5'})
+        self.assertEqual(self.client.get(self.url, {'event_type': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'start': 'ayer'}).status_code, 400)
+
+    def test_page_query_uses_timeline_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Query plan assertions are written for SQLite.')
+        last = EventHistory.objects.filter(card=self.card).order_by('-timestamp', '-id')[2]
+        page = (
+            EventHistory.objects.filter(card=self.card)
+            .filter(timestamp__lte=last.timestamp).exclude(timestamp=last.timestamp, id__gte=last.id)
+            .order_by('-timestamp', '-id')[:100]
+        )
+        plan = page.explain()
+        self.assertIn('event_card_time_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class CardHistoryQueryCountTests(TestCase):
+    def test_history_queries_do_not_grow_with_removed_documents(self):
+        card = Card.objects.create(name='Ecógrafo')
+        for i in range(50):
+            document = Document.objects.create(card=card, title=f'Informe {i}', file=f'documents/informe{i}.pdf')
+            EventHistory.objects.create(card=card, event_type='document_removed',
+                                        description=f'Documento eliminado: {document.title}', document=document)
+        url = reverse('card_history_api', args=[card.id])
+        # The ETag's version stamps, the card lookup, the events query with
+        # the documents joined in, and the archive segments lookup.
+        with self.assertNumQueries(4):
+            data = self.client.get(url).json()
+        self.assertEqual(len(data), 50)
+        self.assertTrue(all(event['document_file'].endswith('.pdf') for event in data))
+        # A page filled from the hot table does not look at the archive.
+        with self.assertNumQueries(3):
+            self.client.get(url, {'page_size': 20})
+
+
+class CardBundleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.card = Card.objects.create(name='Monitor', location='UCI')
+        for i in range(10):
+            Document.objects.create(card=cls.card, title=f'Manual {i}', file=f'documents/manual{i}.pdf')
+            Cronograma.objects.create(card=cls.card, date=date(2026, 1, i + 1), title=f'Revisión {i}')
+            RegistroIntervencion.objects.create(card=cls.card, action_type='preventiva', date=date(2026, 1, i + 1),
+                                                description='Limpieza', responsible='Técnico')
+        Document.objects.create(card=cls.card, title='Retirado', file='documents/retirado.pdf', is_deleted=True)
+        for i in range(30):
+            EventHistory.objects.create(card=cls.card, event_type='status_changed', description=f'Cambio {i}')
+        cls.url = reverse('card_bundle_api', args=[cls.card.id])
+
+    def test_one_query_per_section(self):
+        # Card with its summary, documents, cronograma, interventions and events.
+        with self.assertNumQueries(5):
+            data = self.client.get(self.url, {'events': 20}).json()
+        self.assertEqual(data['card']['name'], 'Monitor')
+        self.assertEqual(data['card']['summary']['document_count'], 10)
+        self.assertEqual(len(data['documents']), 10)
+        self.assertEqual(len(data['cronogramas']), 10)
+        self.assertEqual(len(data['intervenciones']), 10)
+        self.assertEqual(len(data['history']['results']), 20)
+        self.assertEqual(data['history']['results'][0]['description'], 'Cambio 29')
+
+        rest = self.client.get(data['history']['next']).json()
+        self.assertEqual(len(rest['results']), 10)
+        self.assertIsNone(rest['next'])
+
+    def test_include(self):
+        # The card lookup always runs, it is the existence check.
+        with self.assertNumQueries(3):
+            data = self.client.get(self.url, {'include': 'documents,history'}).json()
+        self.assertEqual(set(data), {'documents', 'history'})
+        self.assertEqual(self.client.get(self.url, {'include': 'card,fotos'}).status_code, 400)
+
+    def test_deleted_card(self):
+        Card.objects.filter(id=self.card.id).update(is_deleted=True)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class EventBufferTests(TestCase):
+    def test_failed_rows_are_dropped_and_the_rest_written(self):
+        kept, deleted = Card.objects.create(name='Bomba de infusión'), Card.objects.create(name='Báscula')
+        buffer = EventBuffer()
+        buffer.events = [
+            EventHistory(card=deleted, event_type='status_changed', description='Antes del borrado'),
+            EventHistory(card=kept, event_type='status_changed', description='Sigue aquí'),
+        ]
+        deleted.delete()
+        with self.assertLogs('posts.events', 'ERROR'):
+            buffer.flush()
+        self.assertEqual(buffer.events, [])
+        self.assertEqual(list(EventHistory.objects.values_list('description', flat=True)), ['Sigue aquí'])
+
+    @override_settings(EVENT_HISTORY_MAX_QUEUED=3)
+    def test_requeued_events_are_capped(self):
+        card = Card.objects.create(name='Centrífuga')
+        buffer = EventBuffer()
+        buffer.events = [EventHistory(card=card, event_type='status_changed', description=str(i)) for i in range(5)]
+        with mock.patch('posts.events.write_events', side_effect=OperationalError('database is locked')), \
+                self.assertLogs('posts.events', 'ERROR'):
+            buffer.flush()
+        self.assertEqual([event.description for event in buffer.events], ['2', '3', '4'])
+
+
+class FleetRollupTests(TestCase):
+    def assert_matches_recompute(self):
+        self.assertEqual(rollups.differences(), [])
+        self.assertFalse(FleetRollup.objects.filter(count__lte=0).exists())
+
+    def test_card_writes(self):
+        card = Card.objects.create(name='Monitor', brand='Mindray', risk='IIB', location='UCI', status='Activo')
+        Card.objects.create(name='Autoclave', brand='Tuttnauer', risk='IIA', location='UCI', status='Activo')
+        self.assert_matches_recompute()
+
+        card.location, card.status = 'Urgencias', 'Fuera de servicio'
+        card.save()
+        self.assert_matches_recompute()
+
+        self.client.post(reverse('card-soft-delete', args=[card.id]))
+        self.assert_matches_recompute()
+        self.assertFalse(FleetRollup.objects.filter(dimension='location', value='Urgencias').exists())
+
+        self.client.post(reverse('card-restore', args=[card.id]))
+        self.assert_matches_recompute()
+        self.assertEqual(rollups.fleet_aggregates(date(2026, 1, 1))['location'], {'UCI': 1, 'Urgencias': 1})
+
+        Card.objects.get(id=card.id).delete()
+        self.assert_matches_recompute()
+        self.assertEqual(rollups.fleet_aggregates(date(2026, 1, 1))['total'], 1)
+
+    def test_due_dates(self):
+        card = Card.objects.create(name='Ventilador', risk='III')
+        first = Cronograma.objects.create(card=card, date=date(2026, 1, 10), title='Preventivo')
+        Cronograma.objects.create(card=card, date=date(2026, 3, 10), title='Preventivo')
+        self.assert_matches_recompute()
+        self.assertEqual(rollups.fleet_aggregates(date(2026, 2, 1))['overdue'], 1)
+
+        first.completed = True
+        first.save()
+        self.assert_matches_recompute()
+        self.assertEqual(rollups.fleet_aggregates(date(2026, 2, 1))['overdue'], 0)
+        self.assertEqual(list(FleetRollup.objects.filter(dimension='due').values_list('value', flat=True)),
+                         ['2026-03-10'])
+
+
+class CardSummaryTests(TestCase):
+    def stored(self):
+        return {row['card_id']: row for row in CardSummary.objects.values('card_id', *summaries.SUMMARY_FIELDS)}
+
+    def assert_matches_rebuild(self):
+        stored = self.stored()
+        summaries.rebuild()
+        self.assertEqual(stored, self.stored())
+
+    def test_card_writes(self):
+        card = Card.objects.create(name='Incubadora', location='Neonatos')
+        other = Card.objects.create(name='Lámpara cialítica')
+        self.assertEqual(self.stored()[card.id]['pending_count'], 0)
+        self.assert_matches_rebuild()
+
+        card.location = 'UCI neonatal'
+        card.save()
+        self.client.post(reverse('card-soft-delete', args=[card.id]))
+        self.assert_matches_rebuild()
+        self.client.post(reverse('card-restore', args=[card.id]))
+        self.assert_matches_rebuild()
+
+        other.delete()
+        self.assertEqual(set(self.stored()), {card.id})
+        self.assert_matches_rebuild()
+
+    def test_cascades(self):
+        card = Card.objects.create(name='Electrocardiógrafo')
+        late = Cronograma.objects.create(card=card, date=date(2026, 5, 1), title='Calibración')
+        early = Cronograma.objects.create(card=card, date=date(2026, 2, 1), title='Limpieza')
+        self.assertEqual(self.stored()[card.id]['next_due'], date(2026, 2, 1))
+        self.assert_matches_rebuild()
+
+        early.completed = True
+        early.save()
+        self.assertEqual(self.stored()[card.id]['next_due'], date(2026, 5, 1))
+        self.assert_matches_rebuild()
+        late.delete()
+        self.assertEqual(self.stored()[card.id]['pending_count'], 0)
+        self.assert_matches_rebuild()
+
+        document = Document.objects.create(card=card, title='Manual', file='documents/manual.pdf')
+        Document.objects.create(card=card, title='Guía', file='documents/guia.pdf')
+        document.is_deleted = True
+        document.save()
+        self.assertEqual(self.stored()[card.id]['document_count'], 1)
+        self.assert_matches_rebuild()
+
+        intervention = RegistroIntervencion.objects.create(
+            card=card, action_type='correctiva', date=date(2026, 3, 1), description='Cambio de cable',
+            responsible='Técnico',
+        )
+        RegistroIntervencion.objects.create(card=card, action_type='preventiva', date=date(2026, 1, 1),
+                                            description='Limpieza', responsible='Técnico')
+        self.assertEqual(self.stored()[card.id]['last_intervention'], date(2026, 3, 1))
+        intervention.delete()
+        self.assertEqual(self.stored()[card.id]['last_intervention'], date(2026, 1, 1))
+        self.assert_matches_rebuild()
+
+        record_event(card, 'status_changed', 'Estado cambiado')
+        self.assertEqual(self.stored()[card.id]['last_event_type'], 'status_changed')
+        self.assert_matches_rebuild()
+
+    def test_plan_occurrences(self):
+        card = Card.objects.create(name='Desfibrilador', risk='III')
+        plan = MaintenancePlan.objects.create(risk='III', title='Preventivo', frequency='monthly',
+                                              start_date=date(2026, 1, 31))
+        self.assertEqual(self.stored()[card.id]['next_due'], date(2026, 1, 31))
+        self.assertEqual(self.stored()[card.id]['pending_count'], 1)
+        self.assert_matches_rebuild()
+
+        url = reverse('maintenanceplan-occurrence', args=[plan.id])
+        self.client.post(url, {'card_id': card.id, 'occurrence_date': '2026-01-31', 'action': 'complete'})
+        self.assertEqual(self.stored()[card.id]['next_due'], date(2026, 2, 28))
+        self.client.post(url, {'card_id': card.id, 'occurrence_date': '2026-02-28', 'action': 'skip'})
+        self.assertEqual(self.stored()[card.id]['next_due'], date(2026, 3, 31))
+        self.client.post(url, {'card_id': card.id, 'occurrence_date': '2026-03-31', 'action': 'move',
+                               'new_date': '2026-03-05'})
+        self.assertEqual(self.stored()[card.id]['next_due'], date(2026, 3, 5))
+        self.assert_matches_rebuild()
+        self.assertEqual(rollups.differences(), [])
+
+        card.risk = 'IIA'
+        card.save()
+        self.assertEqual(self.stored()[card.id], {
+            **self.stored()[card.id], 'next_due': None, 'pending_count': 0,
+        })
+        plan.risk = 'IIA'
+        plan.save()
+        self.assertEqual(self.stored()[card.id]['next_due'], date(2026, 3, 5))
+        self.assert_matches_rebuild()
+        self.assertEqual(rollups.differences(), [])
+
+    def test_rebuild_reads_archived_events_in_one_query(self):
+        old = datetime(2024, 3, 5, tzinfo=dt_timezone.utc)
+        cards = [Card.objects.create(name=f'Monitor {i}') for i in range(6)]
+        for card in cards:
+            EventHistory.objects.create(card=card, event_type='status_changed', description='Antiguo', timestamp=old)
+        archive.archive_events(datetime(2025, 1, 1, tzinfo=dt_timezone.utc))
+        with CaptureQueriesContext(connection) as few:
+            summaries.rebuild([card.id for card in cards[:2]])
+        with CaptureQueriesContext(connection) as many:
+            summaries.rebuild([card.id for card in cards])
+        self.assertEqual(len(few), len(many))
+        self.assertEqual({row['last_event_at'] for row in self.stored().values()}, {old})
+
+
+class MaintenanceCountsTests(TestCase):
+    def test_plan_occurrences_are_counted(self):
+        card = Card.objects.create(name='Autoclave', risk='IIA', location='Esterilización')
+        Cronograma.objects.create(card=card, date=date(2026, 1, 10), title='Validación', completed=True)
+        MaintenancePlan.objects.create(card=card, title='Limpieza', frequency='weekly', interval=2,
+                                       start_date=date(2026, 1, 5))
+        counts = aggregates.compute_counts(date(2026, 1, 1), date(2026, 2, 28), 'month', 'location', date(2026, 2, 1))
+        self.assertEqual(counts, [
+            {'period': '2026-01-01', 'group': 'Esterilización', 'pending': 0, 'completed': 1, 'overdue': 2, 'total': 3},
+            {'period': '2026-02-01', 'group': 'Esterilización', 'pending': 2, 'completed': 0, 'overdue': 0, 'total': 2},
+        ])
+
+
+class CardChangesTests(TestCase):
+    def sync(self, since=0, **params):
+        return self.client.get(reverse('card-changes'), {'since': since, **params})
+
+    def test_delta_sync(self):
+        monitor, bascula = Card.objects.create(name='Monitor'), Card.objects.create(name='Báscula')
+        first = self.sync().json()
+        self.assertEqual([card['name'] for card in first['cards']], ['Monitor', 'Báscula'])
+        self.assertFalse(first['has_more'])
+
+        monitor.status = 'Fuera de servicio'
+        monitor.save()
+        self.client.post(reverse('card-soft-delete', args=[bascula.id]))
+        delta = self.sync(first['cursor']).json()
+        self.assertEqual([(card['id'], card['status']) for card in delta['cards']], [(monitor.id, 'Fuera de servicio')])
+        self.assertEqual(delta['deleted'], [bascula.id])
+
+        self.client.post(reverse('card-restore', args=[bascula.id]))
+        Card.objects.get(id=monitor.id).delete()
+        delta = self.sync(delta['cursor']).json()
+        self.assertEqual([card['id'] for card in delta['cards']], [bascula.id])
+        self.assertEqual(delta['deleted'], [monitor.id])
+        self.assertEqual(self.sync(delta['cursor']).json(), {
+            'cursor': delta['cursor'], 'has_more': False, 'cards': [], 'deleted': [],
+        })
+
+    def test_pages(self):
+        ids = [Card.objects.create(name=f'Monitor {i}').id for i in range(5)]
+        seen, cursor = [], 0
+        with mock.patch('posts.views.CARD_CHANGES_LIMIT', 2):
+            while True:
+                page = self.sync(cursor, limit=50).json()
+                self.assertLessEqual(len(page['cards']), 2)
+                seen += [card['id'] for card in page['cards']]
+                cursor = page['cursor']
+                if not page['has_more']:
+                    break
+        self.assertEqual(seen, ids)
+        self.assertEqual(self.sync('abc').status_code, 400)
+
+    def test_compaction_expires_old_cursors(self):
+        monitor, bascula = Card.objects.create(name='Monitor'), Card.objects.create(name='Báscula')
+        monitor.save()
+        old_cursor = self.sync().json()['cursor']
+        bascula.delete()
+        CardChange.objects.update(timestamp=changelog.retention_cutoff() - timedelta(days=1))
+        autoclave = Card.objects.create(name='Autoclave')
+        recent_cursor = self.sync().json()['cursor']
+
+        self.assertEqual(changelog.compact(), 3)
+        self.assertEqual(list(CardChange.objects.values_list('card_id', 'operation')),
+                         [(monitor.id, 'updated'), (autoclave.id, 'created')])
+        self.assertEqual(self.sync(old_cursor).status_code, 410)
+        self.assertEqual(self.sync(recent_cursor).json()['cards'], [])
+        full = self.sync().json()
+        self.assertEqual([card['id'] for card in full['cards']], [monitor.id, autoclave.id])
+        self.assertEqual(full['deleted'], [])
+
+
+@override_settings(CARD_SNAPSHOT_ORIGIN='http://testserver')
+class CardSnapshotTests(TestCase):
+    def setUp(self):
+        snapshots.snapshot_cache().clear()
+        patcher = mock.patch.object(snapshots.rebuilder, 'schedule')
+        self.schedule = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, **headers):
+        return self.client.get(reverse('card-list'), HTTP_ACCEPT_ENCODING='gzip, deflate', **headers)
+
+    def names(self, response):
+        body = response.content
+        if response.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return [card['name'] for card in json.loads(body)]
+
+    def test_served_compressed_once_rendered(self):
+        Card.objects.create(name='Monitor')
+        rendered = self.get()
+        self.assertNotIn('Content-Encoding', rendered.headers)
+        served = self.get()
+        self.assertEqual(served.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(self.names(served), self.names(rendered))
+        self.assertEqual(served.headers['ETag'], rendered.headers['ETag'])
+        self.assertIn('Accept-Encoding', served.headers['Vary'])
+
+        identity = self.client.get(reverse('card-list'))
+        self.assertNotIn('Content-Encoding', identity.headers)
+        self.assertEqual(self.names(identity), ['Monitor'])
+
+    def test_other_hosts_are_rendered(self):
+        Card.objects.create(name='Monitor')
+        self.get()
+        self.assertNotIn('Content-Encoding', self.get(HTTP_HOST='otro.example').headers)
+
+    def test_writes_invalidate(self):
+        Card.objects.create(name='Monitor')
+        self.get()
+        Card.objects.create(name='Báscula')
+
+        stale = self.get()
+        self.assertEqual(self.names(stale), ['Monitor'])
+        self.assertNotIn('ETag', stale.headers)
+        self.schedule.assert_called()
+
+        with override_settings(CARD_SNAPSHOT_STALE_SECONDS=0):
+            self.assertEqual(self.names(self.get()), ['Monitor', 'Báscula'])
+        self.assertTrue(snapshots.rebuild())
+        current = self.get()
+        self.assertEqual(current.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(self.names(current), ['Monitor', 'Báscula'])
+        self.assertIn('ETag', current.headers)
+
+
+class ConditionalGetTests(TestCase):
+    def get(self, url, etag=None):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag) if etag else self.client.get(url)
+
+    def test_versions(self):
+        self.assertEqual(versions.current('cards', 'card:1'), [0, 0])
+        card = Card.objects.create(name='Monitor')
+        created, = versions.current(f'card:{card.id}')
+        self.assertGreater(created, 0)
+        with self.assertRaises(OperationalError), transaction.atomic():
+            card.save()
+            raise OperationalError('rolled back')
+        self.assertEqual(versions.current(f'card:{card.id}'), [created])
+        card.save()
+        self.assertGreater(versions.current(f'card:{card.id}')[0], created)
+
+    def test_not_modified_until_written(self):
+        card = Card.objects.create(name='Monitor')
+        url = reverse('card_documents_api', args=[card.id])
+        etag = self.get(url).headers['ETag']
+        not_modified = self.get(url, etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.headers['ETag'], etag)
+
+        Document.objects.create(card=card, title='Manual', file='documents/manual.pdf')
+        changed = self.get(url, etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(len(changed.json()), 1)
+        self.assertNotEqual(changed.headers['ETag'], etag)
+
+        list_etag = self.get(reverse('card-list')).headers['ETag']
+        self.assertEqual(self.get(reverse('card-list'), list_etag).status_code, 304)
+        card.status = 'Activo'
+        card.save()
+        self.assertEqual(self.get(reverse('card-list'), list_etag).status_code, 200)
+
+    def test_deleted_card_is_not_found(self):
+        card = Card.objects.create(name='Monitor')
+        url = reverse('card_documents_api', args=[card.id])
+        etag = self.get(url).headers['ETag']
+        card.delete()
+        self.assertEqual(self.get(url, etag).status_code, 404)
+
+
+@override_settings(LIVE_UPDATES_POLL_INTERVAL=0.01)
+class LiveStreamTests(TestCase):
+    async def read(self, stream, count):
+        return [await asyncio.wait_for(stream.__anext__(), 5) for _ in range(count)]
+
+    async def close(self, stream):
+        await stream.aclose()
+        if live.broadcaster.task is not None:
+            await live.broadcaster.task
+
+    def ids(self, messages):
+        return [int(message.split('\n')[0].removeprefix('id: ')) for message in messages]
+
+    async def test_resume_replays_missed_notifications(self):
+        publish = sync_to_async(live.publish)
+        for i in range(5):
+            await publish('history', 1 + i % 2, n=i)
+        ids = [row async for row in LiveUpdate.objects.order_by('id').values_list('id', flat=True)]
+
+        stream = live.event_stream(last_id=ids[1])
+        self.assertEqual(await self.read(stream, 1), [f'retry: {live.RETRY_MILLISECONDS}\n\n'])
+        self.assertEqual(self.ids(await self.read(stream, 3)), ids[2:])
+        await publish('history', 2, n=5)
+        [message] = await self.read(stream, 1)
+        self.assertEqual(message.split('\n')[1:3], ['event: history', 'data: {"card_id":2,"n":5}'])
+        await self.close(stream)
+
+        stream = live.event_stream(card_id=1, last_id=ids[0])
+        self.assertEqual(self.ids((await self.read(stream, 3))[1:]), [ids[2], ids[4]])
+        await self.close(stream)
+
+    async def test_new_clients_only_get_new_notifications(self):
+        publish = sync_to_async(live.publish)
+        await publish('history', 1)
+        stream = live.event_stream()
+        await self.read(stream, 1)
+        await publish('history', 1)
+        [message] = await self.read(stream, 1)
+        latest = await LiveUpdate.objects.order_by('-id').values_list('id', flat=True).afirst()
+        self.assertEqual(self.ids([message]), [latest])
+        await self.close(stream)
+
+    async def test_too_many_missed_resets(self):
+        for i in range(3):
+            await sync_to_async(live.publish)('history', 1, n=i)
+        with mock.patch('posts.live.CLIENT_QUEUE_SIZE', 2):
+            stream = live.event_stream(last_id=0)
+            self.assertEqual((await self.read(stream, 2))[1:], ['event: reset\ndata: {}\n\n'])
+            await self.close(stream)
+
+
+class EventArchiveTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.card = Card.objects.create(name='Desfibrilador')
+        for i in range(12):
+            EventHistory.objects.create(
+                card=cls.card, event_type='status_changed' if i % 2 else 'document_added',
+                description=f'Evento {i}', timestamp=datetime(2025, 1 + i // 4, 1 + i, 8, 0, tzinfo=dt_timezone.utc),
+            )
+        cls.url = reverse('card_history_api', args=[cls.card.id])
+
+    def history(self, **params):
+        return [event['description'] for event in self.client.get(self.url, params).json()]
+
+    def test_history_reads_through_the_archive(self):
+        before = self.history()
+        filtered = self.history(event_type='status_changed', start='2025-01-03', end='2025-02-08')
+        self.assertEqual(archive.archive_events(datetime(2025, 3, 1, tzinfo=dt_timezone.utc)), (1, 8))
+        self.assertEqual(EventHistory.objects.count(), 4)
+        self.assertEqual(list(self.card.event_archive.order_by('month').values_list('month', 'event_count')),
+                         [(date(2025, 1, 1), 4), (date(2025, 2, 1), 4)])
+
+        self.assertEqual(self.history(), before)
+        self.assertEqual(self.history(event_type='status_changed', start='2025-01-03', end='2025-02-08'), filtered)
+        seen, url = [], self.url + '?page_size=3'
+        while url:
+            data = self.client.get(url).json()
+            seen.extend(event['description'] for event in data['results'])
+            url = data['next']
+        self.assertEqual(seen, before)
+
+    def test_late_events_extend_the_month_segment(self):
+        archive.archive_events(datetime(2025, 2, 1, tzinfo=dt_timezone.utc))
+        EventHistory.objects.create(card=self.card, event_type='status_changed', description='Tardío',
+                                    timestamp=datetime(2025, 1, 20, tzinfo=dt_timezone.utc))
+        archive.archive_events(datetime(2025, 2, 1, tzinfo=dt_timezone.utc))
+        [segment] = self.card.event_archive.all()
+        self.assertEqual(segment.event_count, 5)
+        self.assertEqual([row['description'] for row in archive.decode_segment(segment)],
+                         ['Tardío', 'Evento 3', 'Evento 2', 'Evento 1', 'Evento 0'])
+
+
+@override_settings(IMPORT_JOB_LEASE_SECONDS=60, IMPORT_JOB_MAX_ATTEMPTS=2)
+class ImportJobLifecycleTests(TestCase):
+    def queue(self, name='equipos.xlsx'):
+        return ImportJob.objects.create(file=f'imports/{name}', original_name=name)
+
+    def lose_worker(self, job):
+        ImportJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+
+    def test_claim_takes_the_oldest_queued_job_once(self):
+        first, second = self.queue(), self.queue()
+        claimed = jobs.claim_next_job()
+        self.assertEqual((claimed.id, claimed.status, claimed.attempts), (first.id, 'running', 1))
+        self.assertIsNotNone(claimed.heartbeat_at)
+        self.assertEqual(jobs.claim_next_job().id, second.id)
+        self.assertIsNone(jobs.claim_next_job())
+
+    def test_cancel(self):
+        queued = self.queue()
+        jobs.cancel_job(queued)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'cancelled')
+        self.assertEqual(queued.file.name, '')
+
+        running = self.queue()
+        jobs.claim_next_job()
+        jobs.cancel_job(running)
+        running.refresh_from_db()
+        self.assertEqual((running.status, running.cancel_requested), ('running', True))
+
+        self.lose_worker(running)
+        jobs.cancel_job(running)
+        running.refresh_from_db()
+        self.assertEqual(running.status, 'cancelled')
+        self.assertIsNotNone(running.finished_at)
+
+    def test_dead_workers_jobs_are_queued_again_then_failed(self):
+        job = self.queue()
+        jobs.claim_next_job()
+        jobs.reclaim_stale_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'running')
+
+        self.lose_worker(job)
+        jobs.reclaim_stale_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.heartbeat_at), ('queued', None))
+
+        self.assertEqual(jobs.claim_next_job().attempts, 2)
+        self.lose_worker(job)
+        jobs.reclaim_stale_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.error), ('failed', 'The import stopped unexpectedly.'))
+        self.assertIsNone(jobs.claim_next_job())
+
+
+class BatchTests(TestCase):
+    def post(self, requests, atomic=False):
+        return self.client.post(reverse('batch'), {'requests': requests, 'atomic': atomic}, content_type='application/json')
+
+    def statuses(self, response):
+        return [item['status'] for item in response.json()['responses']]
+
+    def test_sub_requests_run_in_order(self):
+        card = Card.objects.create(name='Monitor')
+        response = self.post([
+            {'id': 'nuevo', 'method': 'POST', 'path': '/cards/', 'body': {'name': 'Báscula'}},
+            {'method': 'PATCH', 'path': f'/cards/{card.id}/', 'body': {'status': 'Activo'}},
+            {'path': f'/cards/{card.id}/'},
+            {'path': '/cards/999/'},
+        ])
+        data = response.json()
+        self.assertFalse(data['rolled_back'])
+        self.assertEqual([item['id'] for item in data['responses']], ['nuevo', 1, 2, 3])
+        self.assertEqual(self.statuses(response), [201, 200, 200, 404])
+        self.assertEqual(data['responses'][2]['body']['status'], 'Activo')
+        self.assertTrue(Card.objects.filter(name='Báscula').exists())
+
+    def test_atomic_batch_rolls_back_on_failure(self):
+        card = Card.objects.create(name='Monitor')
+        response = self.post([
+            {'method': 'POST', 'path': '/cards/', 'body': {'name': 'Báscula'}},
+            {'method': 'PATCH', 'path': f'/cards/{card.id}/', 'body': {'risk': 'IV'}},
+            {'method': 'DELETE', 'path': f'/cards/{card.id}/'},
+        ], atomic=True)
+        self.assertTrue(response.json()['rolled_back'])
+        self.assertEqual(self.statuses(response), [201, 400, 424])
+        self.assertEqual(list(Card.objects.values_list('name', flat=True)), ['Monitor'])
+
+    def test_time_limit(self):
+        with mock.patch('posts.batch.time') as clock:
+            clock.monotonic.side_effect = [0.0, 0.0, 11.0]
+            response = self.post([
+                {'method': 'POST', 'path': '/cards/', 'body': {'name': 'Báscula'}},
+                {'method': 'POST', 'path': '/cards/', 'body': {'name': 'Autoclave'}},
+                {'path': '/cards/'},
+            ], atomic=True)
+        self.assertEqual(self.statuses(response), [201, 504, 424])
+        self.assertFalse(Card.objects.exists())
+
+    def test_malformed_and_unbatchable(self):
+        self.assertEqual(self.post([]).status_code, 400)
+        self.assertEqual(self.post([{'method': 'TRACE', 'path': '/cards/'}]).status_code, 400)
+        response = self.post([{'method': 'POST', 'path': '/batch/', 'body': {'requests': []}}, {'path': '/admin/'}])
+        self.assertEqual(self.statuses(response), [404, 404])
+
+
+class CardSearchTests(TestCase):
+    def search(self, query, **params):
+        response = self.client.get(reverse('search_cards'), {'q': query, **params})
+        return [card['name'] for card in response.json()['results']]
+
+    def test_accents_prefixes_and_rank(self):
+        Card.objects.create(name='Monitor', location='Calibración')
+        Card.objects.create(name='Calibrador de presión', brand='Fluke')
+        Card.objects.create(name='Bomba de infusión', series='SN-4471')
+        self.assertEqual(self.search('CALIBRACION'), ['Monitor'])
+        self.assertEqual(self.search('calib'), ['Calibrador de presión', 'Monitor'])
+        self.assertEqual(self.search('bomba infu'), ['Bomba de infusión'])
+        self.assertEqual(self.search('sn 4471'), ['Bomba de infusión'])
+        self.assertEqual(self.search('presion fluke'), ['Calibrador de presión'])
+        self.assertEqual(self.search('calib', page_size=1), ['Calibrador de presión'])
+        self.assertEqual(self.search('calib', page_size=1, page=2), ['Monitor'])
+
+    def test_index_follows_card_writes(self):
+        card = Card.objects.create(name='Ventilador', location='UCI')
+        card.name = 'Ventilador mecánico'
+        card.save()
+        self.assertEqual(self.search('mecanico'), ['Ventilador mecánico'])
+
+        self.client.post(reverse('card-soft-delete', args=[card.id]))
+        self.assertEqual(self.search('ventilador'), [])
+        self.client.post(reverse('card-restore', args=[card.id]))
+        self.assertEqual(self.search('ventilador'), ['Ventilador mecánico'])
+        Card.objects.get(id=card.id).delete()
+        self.assertEqual(self.search('ventilador'), [])
+
+        bulk = Card.objects.bulk_create([Card(name='Autoclave'), Card(name='Autoclave portátil')])
+        cards_bulk_created(bulk)
+        self.assertEqual(sorted(self.search('autoclave')), ['Autoclave', 'Autoclave portátil'])
+
+    def test_icontains_fallback(self):
+        Card.objects.create(name='Monitor', location='UCI')
+        Card.objects.create(name='Monitor fetal', location='Obstetricia')
+        Card.objects.create(name='Monitor', location='UCI', is_deleted=True)
+        with mock.patch('posts.search.is_available', return_value=False):
+            self.assertEqual(self.search('monitor uci'), ['Monitor'])
+            self.assertEqual(self.search('MONITOR'), ['Monitor', 'Monitor fetal'])
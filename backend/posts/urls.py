@@ -6,16 +6,23 @@ from rest_framework.decorators import action
 
 router = DefaultRouter()
 router.register(r'cards', CardViewSet)
+router.register(r'maintenance-plans', views.MaintenancePlanViewSet)
 
 urlpatterns = [
     path('', views.home_api, name='home_api'),
     path('card/<int:card_id>/', views.card_detail_api, name='card_detail_api'),
     path('card/<int:card_id>/documents/', views.card_documents_api, name='card_documents_api'),
     path('card/<int:card_id>/maintenance/', views.card_maintenance_api, name='card_maintenance_api'),
+    path('card/<int:card_id>/bundle/', views.card_bundle_api, name='card_bundle_api'),
+    path('batch/', views.batch_api, name='batch'),
+    path('api/etag-stats/', views.etag_stats_api, name='etag-stats'),
 
     path('search/', views.search_cards, name='search_cards'),
     path('card/<int:card_id>/history/', views.card_history, name='card_history'),
     path('card/<int:card_id>/history/api/', views.card_history_api, name='card_history_api'),
+    path('api/events/', views.event_feed_api, name='event-feed'),
+    path('api/live/', views.live_updates, name='live-updates'),
+    path('card/<int:card_id>/live/', views.live_updates, name='card-live-updates'),
     path('document/<int:document_id>/delete/', views.delete_document, name='delete_document'),
     path('usuario/', views.usuario, name='usuario'),
     path('usuario/guardar/', views.guardar_usuario, name='guardar_usuario'),
@@ -28,11 +35,18 @@ urlpatterns = [
     path('api/cronograma/create/', views.cronograma_create_api, name='cronograma-create'),
     path('api/intervencion/create/', views.intervencion_create_api, name='intervencion-create'),
     path('api/cronograma/<int:cronograma_id>/update/', views.cronograma_update_api, name='cronograma-update'),
+    path('api/cronograma/bulk-create/', views.cronograma_bulk_create_api, name='cronograma-bulk-create'),
+    path('api/cronograma/bulk-update/', views.cronograma_bulk_update_api, name='cronograma-bulk-update'),
     path('api/cronograma/all/', views.all_cronograma_activities_api, name='all-cronograma-activities'),
+    path('api/cronograma/counts/', views.cronograma_counts_api, name='cronograma-counts'),
+    path('api/fleet/aggregates/', views.fleet_aggregates_api, name='fleet-aggregates'),
     
     # API routes for Flutter frontend
     path('', include(router.urls)),
     path('get-csrf-token/', get_csrf_token, name='get-csrf-token'),
     path('import_cards_from_excel/', import_cards_from_excel, name='import-cards-from-excel'),
     path('export_cards_to_excel/', export_cards_to_excel, name='export-cards-to-excel'),
+    path('api/import-jobs/', views.import_job_create_api, name='import-job-create'),
+    path('api/import-jobs/<int:job_id>/', views.import_job_detail_api, name='import-job-detail'),
+    path('api/import-jobs/<int:job_id>/cancel/', views.import_job_cancel_api, name='import-job-cancel'),
 ]
@@ -0,0 +1,50 @@
+import unicodedata
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def normalize_column(col):
+    col = unicodedata.normalize('NFD', str(col)).encode('ascii', 'ignore').decode('ascii')
+    return col.lower().strip()
+
+
+# Separates the parts of Card.identity_key; sorts below every printable character.
+IDENTITY_SEPARATOR = '\x1f'
+
+
+def identity_key(name, model, series):
+    """
+    Normalized duplicate-detection key of a card. The series goes first so a
+    range scan on the key prefix finds every card with a given serial number.
+    """
+    return IDENTITY_SEPARATOR.join(normalize_column(value or '') for value in (series, name, model))
+
+
+def series_key_range(series):
+    """Bounds of the identity keys of cards with this serial number."""
+    prefix = normalize_column(series) + IDENTITY_SEPARATOR
+    return prefix, prefix[:-1] + chr(ord(IDENTITY_SEPARATOR) + 1)
+
+
+def parse_bound(value, end=False):
+    """
+    Aware datetime for a `start`/`end` query parameter, None if unparsable.
+    A bare date as `end` means the last moment of that day, so both bounds
+    are inclusive.
+    """
+    try:
+        # Dates first: parse_datetime also accepts a bare date, as midnight.
+        day = parse_date(value)
+        if day is not None:
+            moment = datetime.combine(day, time.max if end else time.min)
+        else:
+            moment = parse_datetime(value)
+            if moment is None:
+                return None
+    except ValueError:
+        return None
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
@@ -0,0 +1,35 @@
+"""
+Version stamps for cache keys and HTTP validators.
+
+A scope names a set of rows: a whole table ('cards', 'cronograma', 'plans',
+'summaries'), one card itself ('card:12') or the rows of one card
+('documents:12', 'events:12'). Writes call `bump` with the scopes they
+change, which upserts the scopes' VersionStamp rows in the writer's
+transaction: a new version becomes visible exactly when the change it
+stands for commits, to every server process at once. Versions are nanosecond timestamps rather than counters,
+so a bump is a blind upsert with no read-modify-write. A scope that was
+never bumped has version 0.
+"""
+import time
+
+from .models import VersionStamp
+
+
+def current(*scopes):
+    """Current versions of `scopes`, in order."""
+    found = dict(VersionStamp.objects.filter(scope__in=scopes).values_list('scope', 'version'))
+    return [found.get(scope, 0) for scope in scopes]
+
+
+def token(*scopes):
+    """The versions of `scopes` as one string, for cache keys and ETags."""
+    return '.'.join(str(version) for version in current(*scopes))
+
+
+def bump(*scopes):
+    if scopes:
+        version = time.time_ns()
+        VersionStamp.objects.bulk_create(
+            [VersionStamp(scope=scope, version=version) for scope in set(scopes)],
+            update_conflicts=True, unique_fields=['scope'], update_fields=['version'],
+        )
@@ -1,36 +1,90 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from .models import Card, Document, RegistroIntervencion, Cronograma, EventHistory
-from django.http import JsonResponse, HttpResponse
+from .models import (
+    Card, CardChange, Document, RegistroIntervencion, Cronograma, EventHistory, ImportJob, MaintenancePlan,
+    MaintenancePlanException,
+)
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponse, FileResponse, StreamingHttpResponse
 from django.contrib import messages
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.csrf import ensure_csrf_cookie
 from io import BytesIO
+from urllib.parse import urlencode
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import CardSerializer, EventHistorySerializer
-from rest_framework.decorators import api_view
+from .serializers import (
+    CardSerializer, CardSummarySerializer, EventFeedSerializer, EventHistorySerializer, ImportJobSerializer,
+    MaintenancePlanSerializer,
+)
+from .pagination import CardCursorPagination, EventFeedPagination, EventKeysetPagination
+from .renderers import FastJSONRenderer
+from .importer import CardImporter, ImportFormatError
+from .exporter import CardExporter
+from .jobs import cancel_job
+from .events import record_event, record_events
+from .utils import parse_bound, series_key_range
+from . import (
+    aggregates, archive, batch, changelog, conditional, live, recurrence, rollups, search, snapshots, summaries, versions,
+)
+from .conditional import conditional_view
+from rest_framework.decorators import api_view, renderer_classes
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework import viewsets
 from rest_framework.decorators import action
 import qrcode
-import pandas as pd
+import os
+import tempfile
 import logging
-import unicodedata
+
+# Page size limits for search_cards.
+SEARCH_PAGE_SIZE = 50
+SEARCH_MAX_PAGE_SIZE = 200
 
 def search_cards(request):
-    query = request.GET.get('q', '')  
-    filtered_cards = Card.objects.filter(name__icontains=query)  
-    cards_data = list(filtered_cards.values('id', 'name', 'brand', 'model', 'status', 'image'))  
-    return JsonResponse(cards_data, safe=False)
+    """
+    Ranked, accent-insensitive search over name, brand, model, series and
+    location of live cards. Paginated with `page` (1-based) and `page_size`.
+    """
+    query = request.GET.get('q', '')
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+        page_size = min(max(int(request.GET.get('page_size', SEARCH_PAGE_SIZE)), 1), SEARCH_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'detail': 'Invalid page.'}, status=400)
+
+    card_ids = search.search_card_ids(query, limit=page_size + 1, offset=(page - 1) * page_size)
+    has_next = len(card_ids) > page_size
+    card_ids = card_ids[:page_size]
+    rows = Card.objects.filter(id__in=card_ids).values('id', 'name', 'brand', 'model', 'status', 'image')
+    by_id = {row['id']: row for row in rows}
+    cards_data = [by_id[card_id] for card_id in card_ids if card_id in by_id]
+    return JsonResponse({
+        'page': page,
+        'next_page': page + 1 if has_next else None,
+        'results': cards_data,
+    })
 
 import logging
-from rest_framework.exceptions import APIException
+from rest_framework.exceptions import APIException, ValidationError
 
 logger = logging.getLogger(__name__)
 
+# Max change log entries consumed by one delta sync response.
+CARD_CHANGES_LIMIT = 1000
+# CardSummary fields the card list can be ordered by (`ordering`, `-` for descending).
+CARD_SUMMARY_ORDERINGS = ('next_due', 'pending_count', 'document_count', 'last_intervention', 'last_event_at')
+
 class CardViewSet(viewsets.ModelViewSet):
     serializer_class = CardSerializer
     queryset = Card.objects.filter(is_deleted=False)
+    pagination_class = CardCursorPagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
 
     def get_queryset(self):
         return Card.objects.filter(is_deleted=False)
@@ -41,18 +95,151 @@ class CardViewSet(viewsets.ModelViewSet):
         return super().get_object()
 
     def list(self, request, *args, **kwargs):
+        # Summary filters and ordering read the summaries even when not embedded.
+        params = request.query_params
+        uses_summaries = any(params.get(param) for param in ('summary', 'overdue', 'due_before', 'ordering'))
+        scopes = ['cards', 'summaries'] if uses_summaries else ['cards']
+        return conditional.respond('cards', request, scopes, lambda: self.list_cards(request))
+
+    def list_cards(self, request):
+        # The plain JSON list is served from its precompressed snapshot.
+        plain = not request.query_params and request.accepted_renderer.format == 'json' and snapshots.serves(request)
+        if plain:
+            response, version = snapshots.cached_response(request)
+            if response is not None:
+                return response
         try:
-            return super().list(request, *args, **kwargs)
+            queryset = self.summary_filter(self.filter_queryset(self.get_queryset()))
+            response = self.values_response(queryset, summary=request.query_params.get('summary') == 'true')
+        except APIException:
+            raise
         except Exception as e:
             logger.error(f"Error in CardViewSet list: {e}", exc_info=True)
             raise APIException(f"Failed to load cards: {str(e)}")
+        if plain:
+            snapshots.save_on_render(request, response, version)
+        return response
+
+    def summary_filter(self, queryset):
+        """
+        Filter and order the listing on the maintained card summaries:
+        `overdue` (true/false), `due_before` (ISO date) and `ordering` (see
+        CARD_SUMMARY_ORDERINGS, empty values last). `ordering=next_due` lists
+        overdue cards first.
+        """
+        params = self.request.query_params
+        if params.get('overdue'):
+            if params['overdue'].lower() not in ('true', 'false'):
+                raise ValidationError({'overdue': 'Expected true or false.'})
+            today = timezone.localdate()
+            if params['overdue'].lower() == 'true':
+                queryset = queryset.filter(summary__next_due__lt=today)
+            else:
+                queryset = queryset.exclude(summary__next_due__lt=today)
+        due_before = date_param(params, 'due_before')
+        if due_before:
+            queryset = queryset.filter(summary__next_due__lte=due_before)
+        ordering = params.get('ordering')
+        if ordering:
+            field = ordering.removeprefix('-')
+            if field not in CARD_SUMMARY_ORDERINGS:
+                raise ValidationError({
+                    'ordering': f'Expected one of {", ".join(CARD_SUMMARY_ORDERINGS)}, optionally prefixed with -.',
+                })
+            if self.paginator.is_requested(self.request):
+                raise ValidationError({'ordering': 'Cursor pagination only supports the default id order.'})
+            expression = F(f'summary__{field}')
+            if ordering.startswith('-'):
+                queryset = queryset.order_by(expression.desc(nulls_last=True), 'id')
+            else:
+                queryset = queryset.order_by(expression.asc(nulls_last=True), 'id')
+        return queryset
+
+    def values_response(self, queryset, summary=False):
+        """
+        Serialize a card listing through the values() fast path, paginated if
+        requested. With `summary` each card embeds its CardSummary.
+        """
+        fields = CardSerializer.values_fields
+        if summary:
+            fields += tuple(f'summary__{field}' for field in CardSummarySerializer.values_fields)
+        rows = queryset.values(*fields)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.serialize_cards(page, summary))
+        return Response(self.serialize_cards(rows, summary))
+
+    def serialize_cards(self, rows, summary):
+        context = self.get_serializer_context()
+        if not summary:
+            return CardSerializer.serialize_values(rows, context)
+        context['today'] = timezone.localdate()
+        cards = []
+        for row in rows:
+            card = CardSerializer.row_to_representation(row, context)
+            card['summary'] = CardSummarySerializer.row_to_representation(
+                {field: row[f'summary__{field}'] for field in CardSummarySerializer.values_fields}, context,
+            )
+            cards.append(card)
+        return cards
 
     @action(detail=False, methods=['get'])
     def deleted(self, request):
         """List deleted cards"""
-        deleted_cards = Card.objects.filter(is_deleted=True)
-        serializer = self.get_serializer(deleted_cards, many=True)
-        return Response(serializer.data)
+        return self.values_response(Card.objects.filter(is_deleted=True))
+
+    @action(detail=False, methods=['get'], url_path='by-serial')
+    def by_serial(self, request):
+        """Live cards with the given serial number (`series`), matched like the importer does."""
+        series = request.query_params.get('series', '').strip()
+        if not series:
+            return Response({'series': 'This field is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        lower, upper = series_key_range(series)
+        cards = Card.objects.filter(identity_key__gte=lower, identity_key__lt=upper, is_deleted=False)
+        return self.values_response(cards.order_by('identity_key'))
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Cards created, updated, soft deleted or restored after the `since` cursor.
+        Live cards are returned in `cards`, deleted ones as ids in `deleted`.
+        Keep calling with the returned `cursor` while `has_more` is true.
+        A cursor older than CARD_CHANGES_RETENTION_DAYS may have missed
+        compacted deletions and gets 410 Gone: drop the local copy and sync
+        again from cursor 0 (see posts/changelog.py).
+        """
+        try:
+            since = int(request.query_params.get('since') or 0)
+        except ValueError:
+            return Response({'detail': 'Invalid cursor.'}, status=status.HTTP_400_BAD_REQUEST)
+        if changelog.cursor_expired(since):
+            return Response({'detail': 'Cursor expired, sync again from 0.'}, status=status.HTTP_410_GONE)
+        try:
+            limit = min(max(int(request.query_params.get('limit') or CARD_CHANGES_LIMIT), 1), CARD_CHANGES_LIMIT)
+        except ValueError:
+            raise ValidationError({'limit': 'Expected a number.'})
+
+        log = list(
+            CardChange.objects.filter(id__gt=since)
+            .order_by('id')
+            .values_list('id', 'card_id')[:limit + 1]
+        )
+        has_more = len(log) > limit
+        log = log[:limit]
+        cursor = log[-1][0] if log else since
+
+        changed_ids = {card_id for _, card_id in log}
+        live_cards = Card.objects.filter(id__in=changed_ids, is_deleted=False).order_by('id')
+        cards = CardSerializer.serialize_values(
+            CardSerializer.values_queryset(live_cards), self.get_serializer_context()
+        )
+        live_ids = {card['id'] for card in cards}
+        return Response({
+            'cursor': str(cursor),
+            'has_more': has_more,
+            'cards': cards,
+            'deleted': sorted(changed_ids - live_ids),
+        })
 
     @action(detail=True, methods=['post'])
     def soft_delete(self, request, pk=None):
@@ -70,6 +257,71 @@ class CardViewSet(viewsets.ModelViewSet):
         card.save()
         return Response({'status': 'card restored'})
 
+class MaintenancePlanViewSet(viewsets.ModelViewSet):
+    """Recurring maintenance plans, per card or per risk class (see posts.recurrence)."""
+    serializer_class = MaintenancePlanSerializer
+    queryset = MaintenancePlan.objects.order_by('id')
+
+    @action(detail=True, methods=['post'])
+    def occurrence(self, request, pk=None):
+        """
+        Act on one occurrence of the plan for a card (`card_id`,
+        `occurrence_date`). `action` is `complete` or `pending`, which store
+        the occurrence as a Cronograma row, `skip`, or `move` with `new_date`.
+        """
+        plan = self.get_object()
+        card = get_object_or_404(Card, id=request.data.get('card_id'))
+        occurrence_date = date_param(request.data, 'occurrence_date', required=True)
+        if (not recurrence.plan_applies_to(plan, card)
+                or recurrence.occurrence_dates(plan, occurrence_date, occurrence_date) != [occurrence_date]):
+            raise ValidationError({'occurrence_date': 'Not an occurrence of this plan for this card.'})
+        occurrence_action = request.data.get('action')
+        if occurrence_action not in ('complete', 'pending', 'skip', 'move'):
+            raise ValidationError({'action': 'Expected complete, pending, skip or move.'})
+
+        with transaction.atomic():
+            stored = Cronograma.objects.filter(plan=plan, card=card, occurrence_date=occurrence_date).first()
+            if occurrence_action in ('complete', 'pending'):
+                completed = occurrence_action == 'complete'
+                if stored is None:
+                    exception = MaintenancePlanException.objects.filter(
+                        plan=plan, card=card, occurrence_date=occurrence_date,
+                    ).first()
+                    stored = Cronograma(
+                        plan=plan, card=card, occurrence_date=occurrence_date, title=plan.title,
+                        date=exception.new_date if exception and exception.new_date else occurrence_date,
+                        completed=not completed,
+                    )
+                if stored.completed != completed:
+                    stored.completed = completed
+                    stored.save()
+                    status_str = 'completada' if completed else 'pendiente'
+                    record_event(
+                        card,
+                        'activity_completed' if completed else 'activity_pending',
+                        f'Actividad "{plan.title}" marcada como {status_str}.',
+                    )
+                return Response(CronogramaSerializer(stored).data)
+
+            new_date = date_param(request.data, 'new_date', required=True) if occurrence_action == 'move' else None
+            if stored is not None:
+                if stored.completed:
+                    raise ValidationError({'action': 'The occurrence is already completed.'})
+                if new_date is None:
+                    stored.delete()
+                else:
+                    stored.date = new_date
+                    stored.save()
+            MaintenancePlanException.objects.update_or_create(
+                plan=plan, card=card, occurrence_date=occurrence_date, defaults={'new_date': new_date},
+            )
+        return Response({
+            'plan_id': plan.id,
+            'card_id': card.id,
+            'occurrence_date': occurrence_date.isoformat(),
+            'new_date': new_date.isoformat() if new_date else None,
+        })
+
 @api_view(['GET'])
 @ensure_csrf_cookie
 def get_csrf_token(request):
@@ -79,12 +331,102 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from .serializers import DocumentSerializer, CronogramaSerializer, RegistroIntervencionSerializer
+from .serializers import BULK_CRONOGRAMA_LIMIT, CronogramaBulkCreateSerializer, CronogramaBulkUpdateSerializer
+
+def occurrence_scopes(request):
+    # Plan occurrences depend on the plans and on the cards' risk classes.
+    return ['plans', 'cards'] if request.query_params.get('occurrences', '').lower() == 'true' else []
 
 @api_view(['GET'])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
+@conditional_view('cronograma_all', lambda request: ['cronograma', 'cards', *occurrence_scopes(request)])
 def all_cronograma_activities_api(request):
-    cronogramas = Cronograma.objects.select_related('card').all()
-    serializer = CronogramaSerializer(cronogramas, many=True)
-    return Response(serializer.data)
+    """
+    Cronograma activities of live cards, ordered by date. Optional filters:
+    `start`/`end` (ISO dates, inclusive), `completed` (true/false) and
+    `location` of the card. Without a window every activity is returned.
+    With `occurrences=true` the pending occurrences of maintenance plans in
+    the window are merged in; they have `id` null and a `plan_id`.
+    """
+    params = request.query_params
+    start, end = date_param(params, 'start'), date_param(params, 'end')
+    cronogramas = Cronograma.objects.filter(card__is_deleted=False)
+    cards = Card.objects.all()
+    if start:
+        cronogramas = cronogramas.filter(date__gte=start)
+    if end:
+        cronogramas = cronogramas.filter(date__lte=end)
+    completed = None
+    if params.get('completed'):
+        if params['completed'].lower() not in ('true', 'false'):
+            raise ValidationError({'completed': 'Expected true or false.'})
+        completed = params['completed'].lower() == 'true'
+        cronogramas = cronogramas.filter(completed=completed)
+    if params.get('location'):
+        cronogramas = cronogramas.filter(card__location=params['location'])
+        cards = cards.filter(location=params['location'])
+    rows = CronogramaSerializer.values_queryset(cronogramas.order_by('date', 'id'))
+    activities = CronogramaSerializer.serialize_values(rows)
+    if wants_occurrences(params, start, end) and completed is not True:
+        activities = merge_occurrences(activities, recurrence.expand_occurrences(start, end, cards))
+    return Response(activities)
+
+def date_param(params, name, required=False):
+    """`params[name]` parsed as an ISO date, None when absent."""
+    value = params.get(name)
+    if not value:
+        if required:
+            raise ValidationError({name: 'Required, an ISO 8601 date (YYYY-MM-DD).'})
+        return None
+    try:
+        day = parse_date(str(value))
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValidationError({name: 'Expected an ISO 8601 date (YYYY-MM-DD).'})
+    return day
+
+def wants_occurrences(params, start, end):
+    """Whether maintenance plan occurrences were requested (`occurrences=true`, needs a window)."""
+    if params.get('occurrences', '').lower() != 'true':
+        return False
+    if start is None or end is None:
+        raise ValidationError({'occurrences': 'Plan occurrences need a start and end window.'})
+    return True
+
+def merge_occurrences(activities, occurrences):
+    """Stored activities and expanded plan occurrences in one list ordered by date."""
+    return sorted([*activities, *occurrences], key=lambda activity: activity['date'])
+
+@api_view(['GET'])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
+def cronograma_counts_api(request):
+    """
+    Pending, completed and overdue activity counts per `period` (day, week
+    or month) between `start` and `end` (ISO dates, required), optionally
+    split by `group_by` (location or risk) of the card. Pending plan
+    occurrences count as pending or overdue activities. Cached until the
+    next cronograma, card or plan write.
+    """
+    params = request.query_params
+    bounds = {param: date_param(params, param, required=True) for param in ('start', 'end')}
+    period = params.get('period', 'day')
+    if period not in aggregates.PERIODS:
+        raise ValidationError({'period': f'Expected one of: {", ".join(aggregates.PERIODS)}.'})
+    group_by = params.get('group_by') or None
+    if group_by is not None and group_by not in aggregates.GROUPS:
+        raise ValidationError({'group_by': f'Expected one of: {", ".join(aggregates.GROUPS)}.'})
+    return Response(aggregates.maintenance_counts(bounds['start'], bounds['end'], period, group_by))
+
+@api_view(['GET'])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
+def fleet_aggregates_api(request):
+    """
+    Live card counts by status, risk, location and brand, the total, and
+    the number of cards with overdue maintenance. Read from the fleet
+    rollups (posts/rollups.py), so the cost does not depend on fleet size.
+    """
+    return Response(rollups.fleet_aggregates(timezone.localdate()))
 
 @api_view(['POST'])
 def cronograma_create_api(request):
@@ -93,15 +435,12 @@ def cronograma_create_api(request):
         card_id = request.data.get('card_id')
         if not card_id:
             return Response({'card_id': 'This field is required.'}, status=status.HTTP_400_BAD_REQUEST)
-        serializer.save(card_id=card_id)
-        # Log event
-        card = Card.objects.get(id=card_id)
-        title = serializer.data.get('title', '')
-        EventHistory.objects.create(
-            card=card,
-            event_type='activity_pending',
-            description=f'Actividad "{title}" creada para el cronograma.',
-        )
+        with transaction.atomic():
+            serializer.save(card_id=card_id)
+            # Log event
+            card = Card.objects.get(id=card_id)
+            title = serializer.data.get('title', '')
+            record_event(card, 'activity_pending', f'Actividad "{title}" creada para el cronograma.')
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -116,19 +455,99 @@ def cronograma_update_api(request, cronograma_id):
 
     serializer = CronogramaSerializer(cronograma, data=request.data, partial=True)
     if serializer.is_valid():
-        serializer.save()
-        new_completed = serializer.data.get('completed', old_completed)
-        if new_completed != old_completed:
-            card = cronograma.card
-            status_str = 'completada' if new_completed else 'pendiente'
-            EventHistory.objects.create(
-                card=card,
-                event_type='activity_completed' if new_completed else 'activity_pending',
-                description=f'Actividad "{cronograma.title}" marcada como {status_str}.',
-            )
+        with transaction.atomic():
+            serializer.save()
+            new_completed = serializer.data.get('completed', old_completed)
+            if new_completed != old_completed:
+                card = cronograma.card
+                status_str = 'completada' if new_completed else 'pendiente'
+                record_event(
+                    card,
+                    'activity_completed' if new_completed else 'activity_pending',
+                    f'Actividad "{cronograma.title}" marcada como {status_str}.',
+                )
         return Response(serializer.data, status=status.HTTP_200_OK)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+def cronograma_bulk_create_api(request):
+    """
+    Schedule one activity (`title`, `date`) on many cards at once. The
+    live cards are selected with `card_ids`, `location` and/or `risk`.
+    Activities and their events are inserted in bulk in one transaction.
+    """
+    serializer = CronogramaBulkCreateSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    data = serializer.validated_data
+    cards = Card.objects.filter(is_deleted=False)
+    if 'card_ids' in data:
+        cards = cards.filter(id__in=data['card_ids'])
+    if 'location' in data:
+        cards = cards.filter(location=data['location'])
+    if 'risk' in data:
+        cards = cards.filter(risk=data['risk'])
+    cards = list(cards.order_by('id').only('id', 'name')[:BULK_CRONOGRAMA_LIMIT + 1])
+    if len(cards) > BULK_CRONOGRAMA_LIMIT:
+        raise ValidationError({'detail': f'The selection has more than {BULK_CRONOGRAMA_LIMIT} cards.'})
+
+    with transaction.atomic():
+        cronogramas = Cronograma.objects.bulk_create(
+            [Cronograma(card=card, date=data['date'], title=data['title']) for card in cards], batch_size=500,
+        )
+        record_events([
+            EventHistory(
+                card=card, event_type='activity_pending',
+                description=f'Actividad "{data["title"]}" creada para el cronograma.',
+            )
+            for card in cards
+        ])
+        # bulk_create() sends no signals; do what cronograma_changed does.
+        card_ids = [card.id for card in cards]
+        summaries.refresh(card_ids, 'cronograma')
+        versions.bump('cronograma', *(f'cronograma:{card_id}' for card_id in card_ids))
+    return Response({
+        'created_count': len(cronogramas),
+        'card_ids': card_ids,
+        'ids': [cronograma.id for cronograma in cronogramas],
+    }, status=status.HTTP_201_CREATED)
+
+@api_view(['POST'])
+def cronograma_bulk_update_api(request):
+    """
+    Mark the activities in `ids` as `completed` (true) or pending (false)
+    with one UPDATE. Activities already in that state are left alone and
+    unknown ids are reported in `not_found`.
+    """
+    serializer = CronogramaBulkUpdateSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids, completed = set(serializer.validated_data['ids']), serializer.validated_data['completed']
+    status_str = 'completada' if completed else 'pendiente'
+
+    with transaction.atomic():
+        rows = list(
+            Cronograma.objects.select_for_update().filter(id__in=ids)
+            .values_list('id', 'card_id', 'title', 'completed')
+        )
+        changed = [(pk, card_id, title) for pk, card_id, title, was_completed in rows if was_completed != completed]
+        Cronograma.objects.filter(id__in=[pk for pk, _, _ in changed]).update(completed=completed)
+        record_events([
+            EventHistory(
+                card_id=card_id, event_type='activity_completed' if completed else 'activity_pending',
+                description=f'Actividad "{title}" marcada como {status_str}.',
+            )
+            for _, card_id, title in changed
+        ])
+        if changed:
+            # update() sends no signals; do what cronograma_changed does.
+            card_ids = {card_id for _, card_id, _ in changed}
+            summaries.refresh(card_ids, 'cronograma')
+            versions.bump('cronograma', *(f'cronograma:{card_id}' for card_id in card_ids))
+    return Response({
+        'updated_count': len(changed),
+        'updated_ids': sorted(pk for pk, _, _ in changed),
+        'not_found': sorted(ids - {pk for pk, *_ in rows}),
+    })
+
 @api_view(['POST'])
 def intervencion_create_api(request):
     serializer = RegistroIntervencionSerializer(data=request.data)
@@ -136,18 +555,16 @@ def intervencion_create_api(request):
         card_id = request.data.get('card_id')
         if not card_id:
             return Response({'card_id': 'This field is required.'}, status=status.HTTP_400_BAD_REQUEST)
-        serializer.save(card_id=card_id)
-        # Log event
-        card = Card.objects.get(id=card_id)
-        EventHistory.objects.create(
-            card=card,
-            event_type='intervention_created',
-            description=f'Intervención creada: {serializer.data.get("description", "")}',
-        )
+        with transaction.atomic():
+            serializer.save(card_id=card_id)
+            # Log event
+            card = Card.objects.get(id=card_id)
+            record_event(card, 'intervention_created', f'Intervención creada: {serializer.data.get("description", "")}')
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 @api_view(['GET', 'POST'])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
 def home_api(request):
     if request.method == 'POST':
         serializer = CardSerializer(data=request.data)
@@ -155,9 +572,12 @@ def home_api(request):
             serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-    cards = Card.objects.all()
-    serializer = CardSerializer(cards, many=True)
-    return Response(serializer.data)
+    cards = CardSerializer.values_queryset(Card.objects.filter(is_deleted=False))
+    paginator = CardCursorPagination()
+    page = paginator.paginate_queryset(cards, request)
+    if page is not None:
+        return paginator.get_paginated_response(CardSerializer.serialize_values(page))
+    return Response(CardSerializer.serialize_values(cards))
 
 @api_view(['GET'])
 def card_detail_api(request, card_id):
@@ -174,6 +594,7 @@ def card_detail_api(request, card_id):
     return Response(serializer.data)
 
 @api_view(['GET', 'POST'])
+@conditional_view('card_documents', lambda request, card_id: [f'card:{card_id}', f'documents:{card_id}'])
 def card_documents_api(request, card_id):
     try:
         card = Card.objects.get(id=card_id)
@@ -183,13 +604,15 @@ def card_documents_api(request, card_id):
     if request.method == 'POST':
         serializer = DocumentSerializer(data=request.data)
         if serializer.is_valid():
-            document = serializer.save(card=card)
-            EventHistory.objects.create(
-                card=card,
-                event_type='document_added',
-                description=f'Documento agregado: {document.title}',
-                document_file=document.file.url if document.file else None,  # Guardar URL completa
-            )
+            with transaction.atomic():
+                document = serializer.save(card=card)
+                record_event(
+                    card,
+                    'document_added',
+                    f'Documento agregado: {document.title}',
+                    document_file=document.file.url if document.file else None,  # Guardar URL completa
+                    document=document,
+                )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -198,6 +621,10 @@ def card_documents_api(request, card_id):
     return Response(serializer.data)
 
 @api_view(['GET'])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
+@conditional_view('card_maintenance', lambda request, card_id: [
+    f'card:{card_id}', f'cronograma:{card_id}', f'interventions:{card_id}', *occurrence_scopes(request),
+])
 def card_maintenance_api(request, card_id):
     try:
         card = Card.objects.get(id=card_id)
@@ -207,14 +634,115 @@ def card_maintenance_api(request, card_id):
     cronogramas = card.cronograma.all()
     intervenciones = card.intervenciones.all()
 
-    cronograma_serializer = CronogramaSerializer(cronogramas, many=True)
     intervencion_serializer = RegistroIntervencionSerializer(intervenciones, many=True)
+    cronograma_data = CronogramaSerializer.serialize_values(CronogramaSerializer.values_queryset(cronogramas))
+    # Plan occurrences of a window on request, as in all_cronograma_activities_api.
+    start, end = date_param(request.query_params, 'start'), date_param(request.query_params, 'end')
+    if wants_occurrences(request.query_params, start, end):
+        occurrences = recurrence.expand_occurrences(start, end, Card.objects.filter(id=card.id))
+        cronograma_data = merge_occurrences(cronograma_data, occurrences)
 
     return Response({
-        'cronogramas': cronograma_serializer.data,
+        'cronogramas': cronograma_data,
         'intervenciones': intervencion_serializer.data,
     })
 
+@api_view(['GET'])
+def etag_stats_api(request):
+    """Conditional GET counters of this server process, per endpoint (see posts/conditional.py)."""
+    return Response({'pid': os.getpid(), 'endpoints': conditional.stats()})
+
+@api_view(['POST'])
+def batch_api(request):
+    """
+    Run several API requests in one round trip: {"requests": [{"id",
+    "method", "path", "body"}, ...], "atomic": false}. Answers
+    {"rolled_back", "responses": [{"id", "status", "body"}, ...]} in request
+    order (see posts/batch.py). Limited to BATCH_MAX_REQUESTS requests and
+    BATCH_TIME_LIMIT seconds; requests past the time limit are not run (504).
+    """
+    try:
+        subrequests, atomic = batch.parse_batch(request.data)
+    except batch.BatchError as e:
+        raise ValidationError({'detail': str(e)})
+    responses, rolled_back = batch.run_batch(request._request, subrequests, atomic=atomic)
+    return HttpResponse(batch.render_batch(responses, rolled_back), content_type='application/json')
+
+# A batch cannot contain another batch.
+batch_api.batch_exempt = True
+
+# Sections of the card bundle, all returned unless `include` narrows them.
+CARD_BUNDLE_SECTIONS = ('card', 'documents', 'cronogramas', 'intervenciones', 'history')
+CARD_BUNDLE_EVENTS = 20
+CARD_BUNDLE_MAX_EVENTS = 100
+
+@api_view(['GET'])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
+def card_bundle_api(request, card_id):
+    """
+    Everything the card screen loads, in one response: the card with its
+    summary, live documents, cronograma, interventions and the latest
+    `events` history events (default 20) with a `next` link into
+    card_history_api. `include` (comma separated sections) limits the
+    response. One query per section; the history reads the archive only
+    when the hot table has fewer than `events` rows.
+    """
+    params = request.query_params
+    include = CARD_BUNDLE_SECTIONS
+    if params.get('include'):
+        include = [section.strip() for section in params['include'].split(',') if section.strip()]
+        unknown = set(include) - set(CARD_BUNDLE_SECTIONS)
+        if unknown:
+            raise ValidationError({'include': f'Unknown sections: {", ".join(sorted(unknown))}'})
+    try:
+        limit = min(int(params.get('events') or CARD_BUNDLE_EVENTS), CARD_BUNDLE_MAX_EVENTS)
+    except ValueError:
+        raise ValidationError({'events': 'Expected a number.'})
+    if limit < 1:
+        raise ValidationError({'events': 'Must be at least 1.'})
+
+    # The card query doubles as the existence check, so it always runs.
+    fields = CardSerializer.values_fields
+    if 'card' in include:
+        fields += tuple(f'summary__{field}' for field in CardSummarySerializer.values_fields)
+    row = Card.objects.filter(id=card_id, is_deleted=False).values(*fields).first()
+    if row is None:
+        return Response(status=status.HTTP_404_NOT_FOUND)
+
+    bundle = {}
+    if 'card' in include:
+        context = {'request': request, 'today': timezone.localdate()}
+        bundle['card'] = CardSerializer.row_to_representation(row, context)
+        bundle['card']['summary'] = CardSummarySerializer.row_to_representation(
+            {field: row[f'summary__{field}'] for field in CardSummarySerializer.values_fields}, context,
+        )
+    if 'documents' in include:
+        documents = Document.objects.filter(card_id=card_id, is_deleted=False)
+        bundle['documents'] = DocumentSerializer(documents, many=True).data
+    if 'cronogramas' in include:
+        cronogramas = CronogramaSerializer.values_queryset(Cronograma.objects.filter(card_id=card_id))
+        bundle['cronogramas'] = CronogramaSerializer.serialize_values(cronogramas)
+    if 'intervenciones' in include:
+        intervenciones = RegistroIntervencion.objects.filter(card_id=card_id)
+        bundle['intervenciones'] = RegistroIntervencionSerializer(intervenciones, many=True).data
+    if 'history' in include:
+        events = EventHistory.objects.filter(card_id=card_id).order_by('-timestamp', '-id')
+        rows = list(EventHistorySerializer.values_queryset(events)[:limit + 1])
+        if len(rows) <= limit:
+            rows.extend(archive.archived_rows(card_id, limit=limit + 1 - len(rows)))
+        next_link = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            cursor = EventKeysetPagination().encode_cursor((rows[-1]['timestamp'], rows[-1]['id']))
+            next_link = request.build_absolute_uri(
+                f"{reverse('card_history_api', args=[card_id])}?{urlencode({'cursor': cursor, 'page_size': limit})}"
+            )
+        bundle['history'] = {
+            'next': next_link,
+            'results': EventHistorySerializer.serialize_values(rows, {'request': request}),
+        }
+    return Response(bundle)
+
 def card_detail(request, card_id):
     card = get_object_or_404(Card, id=card_id)
     return render(request, 'posts/card_detail.html', {
@@ -233,11 +761,94 @@ def card_history(request, card_id):
     return render(request, 'posts/card_history.html', {'card': card, 'page_title': 'Historia',})
 
 @api_view(['GET'])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
+@conditional_view('card_history', lambda request, card_id: [
+    f'card:{card_id}', f'events:{card_id}', f'documents:{card_id}',
+])
 def card_history_api(request, card_id):
+    """
+    Events of a card, newest first. Optional filters: `event_type` (comma
+    separated) and `start`/`end` (ISO date or datetime, inclusive). Sending
+    `cursor` or `page_size` switches to keyset pages of {'next', 'results'}.
+    Events moved to the archive tier are read after the hot ones.
+    """
     card = get_object_or_404(Card, id=card_id)
-    events = EventHistory.objects.filter(card=card).order_by('-timestamp')
-    serializer = EventHistorySerializer(events, many=True, context={'request': request})  # Agregar contexto
-    return Response(serializer.data)
+    filters = event_filters(request.query_params)
+    events = filter_events(EventHistory.objects.filter(card=card), filters)
+    rows = EventHistorySerializer.values_queryset(events.order_by('-timestamp', '-id'))
+    paginator = EventKeysetPagination()
+    page = paginator.paginate_queryset(
+        rows, request, older_rows=lambda before, limit: archive.archived_rows(card.id, before, limit, **filters),
+    )
+    if page is not None:
+        return paginator.get_paginated_response(EventHistorySerializer.serialize_values(page, {'request': request}))
+    rows = [*rows, *archive.archived_rows(card.id, **filters)]
+    return Response(EventHistorySerializer.serialize_values(rows, {'request': request}))  # Agregar contexto
+
+@api_view(['GET'])
+@renderer_classes([FastJSONRenderer, BrowsableAPIRenderer])
+def event_feed_api(request):
+    """
+    Events of every card, newest first, in keyset pages of {'next', 'results'}
+    (`cursor`, `page_size`). Takes the card_history_api filters plus
+    `location` and `risk` of the card. Each event embeds its card, read in
+    the same query.
+    """
+    events = filter_events(EventHistory.objects.all(), event_filters(request.query_params))
+    for param in ('location', 'risk'):
+        if request.query_params.get(param):
+            events = events.filter(**{f'card__{param}': request.query_params[param]})
+    rows = EventFeedSerializer.values_queryset(events)
+    paginator = EventFeedPagination()
+    page = paginator.paginate_queryset(rows, request)
+    return paginator.get_paginated_response(EventFeedSerializer.serialize_values(page, {'request': request}))
+
+async def live_updates(request, card_id=None):
+    """
+    Server-Sent Events stream of change notifications, fleet wide or for one
+    card (`card/<id>/live/`). Events: `card` (status or soft delete changed),
+    `card_deleted`, `history` (new history event, refetch the history),
+    `cards_imported` (fleet wide only) and `reset` (refetch everything).
+    Reconnecting clients send Last-Event-ID to get what they missed.
+    Only works under the ASGI server, see posts/live.py.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'error': 'Live updates need the ASGI server (mysecondproject.asgi).'}, status=501)
+    last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        return JsonResponse({'error': 'Last-Event-ID must be an integer.'}, status=400)
+    response = StreamingHttpResponse(live.event_stream(card_id, last_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Keep proxies from buffering the stream
+    return response
+
+def event_filters(params):
+    """Parse the `event_type`, `start` and `end` query parameters of the event endpoints."""
+    filters = {'event_types': None, 'start': None, 'end': None}
+    if params.get('event_type'):
+        event_types = [value.strip() for value in params['event_type'].split(',') if value.strip()]
+        unknown = set(event_types) - {choice for choice, _ in EventHistory.EVENT_TYPES}
+        if unknown:
+            raise ValidationError({'event_type': f'Unknown event types: {", ".join(sorted(unknown))}'})
+        filters['event_types'] = event_types
+    for param in ('start', 'end'):
+        if params.get(param):
+            filters[param] = parse_bound(params[param], end=(param == 'end'))
+            if filters[param] is None:
+                raise ValidationError({param: 'Expected an ISO 8601 date or datetime.'})
+    return filters
+
+def filter_events(events, filters):
+    """Apply parsed `event_filters` to an EventHistory queryset."""
+    if filters['event_types']:
+        events = events.filter(event_type__in=filters['event_types'])
+    if filters['start']:
+        events = events.filter(timestamp__gte=filters['start'])
+    if filters['end']:
+        events = events.filter(timestamp__lte=filters['end'])
+    return events
 
 def card_maintenance(request, card_id):
     card = get_object_or_404(Card, id=card_id)
@@ -301,14 +912,16 @@ def delete_document(request, document_id):
     document = get_object_or_404(Document, id=document_id)
     card_id = document.card.id
     if request.method == 'POST':
-        EventHistory.objects.create(
-            card=document.card,
-            event_type='document_removed',
-            description=f'Documento eliminado: {document.title}',
-            document_file=document.file.url if document.file else None,  
-        )
-        document.is_deleted = True
-        document.save()
+        with transaction.atomic():
+            document.is_deleted = True
+            document.save()
+            record_event(
+                document.card,
+                'document_removed',
+                f'Documento eliminado: {document.title}',
+                document_file=document.file.url if document.file else None,
+                document=document,
+            )
         return redirect('card_documents', card_id=card_id)
     return redirect('card_documents', card_id=card_id)
 
@@ -362,13 +975,10 @@ def toggle_status(request, card_id):
         card = get_object_or_404(Card, id=card_id)
         old_status = card.status
         card.status = "Activo" if card.status == "Fuera de servicio" else "Fuera de servicio"
-        card.save()
-        # Log event
-        EventHistory.objects.create(
-            card=card,
-            event_type='status_changed',
-            description=f'Estado cambiado de "{old_status}" a "{card.status}"',
-        )
+        with transaction.atomic():
+            card.save()
+            # Log event
+            record_event(card, 'status_changed', f'Estado cambiado de "{old_status}" a "{card.status}"')
         return Response({'status': card.status}, status=200)
     except Exception as e:
         logger.error(f"Error toggling card status: {e}", exc_info=True)
@@ -405,12 +1015,9 @@ def card_maintenance(request, card_id):
             date = request.POST.get("date")
             title = request.POST.get("title")
             if date and title:
-                Cronograma.objects.create(card=card, date=date, title=title)
-                EventHistory.objects.create(
-                    card=card,
-                    event_type='activity_pending',
-                    description=f'Actividad "{title}" creada para el cronograma.',
-                )
+                with transaction.atomic():
+                    Cronograma.objects.create(card=card, date=date, title=title)
+                    record_event(card, 'activity_pending', f'Actividad "{title}" creada para el cronograma.')
 
         elif form_type == "intervenciones":
             action_type = request.POST.get("action_type")
@@ -418,19 +1025,16 @@ def card_maintenance(request, card_id):
             description = request.POST.get("description")
             responsible = request.POST.get("responsible")
             if action_type and date and description and responsible:
-                RegistroIntervencion.objects.create(
-                    card=card, 
-                    action_type=action_type, 
-                    date=date, 
-                    description=description, 
-                    responsible=responsible
-                )
-                # Log event
-                EventHistory.objects.create(
-                    card=card,
-                    event_type='intervention_created',
-                    description=f'Intervención "{action_type}" creada: {description}',
-                )
+                with transaction.atomic():
+                    RegistroIntervencion.objects.create(
+                        card=card, 
+                        action_type=action_type, 
+                        date=date, 
+                        description=description, 
+                        responsible=responsible
+                    )
+                    # Log event
+                    record_event(card, 'intervention_created', f'Intervención "{action_type}" creada: {description}')
 
         return redirect("card_maintenance", card_id=card.id)
 
@@ -444,10 +1048,6 @@ def card_maintenance(request, card_id):
         "page_title": "Mantenimiento",
     })
 
-def normalize_column(col):
-    col = unicodedata.normalize('NFD', str(col)).encode('ascii', 'ignore').decode('ascii')
-    return col.lower().strip()
-
 @csrf_exempt
 @api_view(['POST'])
 def import_cards_from_excel(request):
@@ -457,11 +1057,8 @@ def import_cards_from_excel(request):
     'equipo biomedico', 'marca', 'modelo', 'serie', 'clasificacion por riesgo', 'ubicacion'
     Extra columns are ignored.
     If any required column is missing, returns an error.
+    The workbook is streamed once; see posts.importer.
     """
-    required_columns = ['Equipo biomedico', 'Marca', 'Modelo', 'Serie', 'Clasificacion por riesgo', 'Ubicacion']
-
-    logger.info(f"Request method: {request.method}")
-    logger.info(f"Request FILES: {request.FILES}")
     if 'file' not in request.FILES:
         logger.error("No file uploaded.")
         return Response({'error': 'No file uploaded.'}, status=status.HTTP_400_BAD_REQUEST)
@@ -470,147 +1067,78 @@ def import_cards_from_excel(request):
     logger.info(f"Excel file: {excel_file.name}, size: {excel_file.size}")
 
     try:
-        df_temp = pd.read_excel(excel_file, header=None)
-        logger.info(f"Raw DataFrame shape: {df_temp.shape}")
-        logger.info(f"Raw DataFrame preview:\n{df_temp.head(10)}")
-
-        header_row = None
-        required_lower = [normalize_column(col) for col in required_columns]
-
-        for idx in range(min(30, len(df_temp))):  # Check first 30 rows
-            row = df_temp.iloc[idx]
-            row_values = [normalize_column(str(val)) for val in row.values if pd.notna(val)]
-            logger.info(f"Row {idx} values normalized: {row_values}")
-            if all(req in row_values for req in required_lower):
-                header_row = idx
-                logger.info(f"Found header row at index: {header_row}")
-                break
-
-        if header_row is None:
-            logger.error("Could not find header row containing required columns")
-            return Response({'error': 'Could not find header row containing required columns in the Excel file. Please ensure the header row has the columns: ' + ', '.join(required_columns)}, status=status.HTTP_400_BAD_REQUEST)
-
-        df = pd.read_excel(excel_file, header=header_row)
-        logger.info(f"DataFrame shape after header detection: {df.shape}")
-        logger.info(f"DataFrame columns: {list(df.columns)}")
+        response_data = CardImporter(excel_file).run()
+    except ImportFormatError as e:
+        logger.error(str(e))
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Error reading Excel file: {str(e)}")
         return Response({'error': f'Error reading Excel file: {str(e)}'}, status=status.HTTP_400_BAD_REQUEST)
 
-    required_columns = ['Equipo biomedico', 'Marca', 'Modelo', 'Serie', 'Clasificacion por riesgo', 'Ubicacion']
-    df_columns_normalized = [str(col).lower().strip() for col in df.columns]
-
-    missing_columns = [col for col in required_columns if col.lower().strip() not in df_columns_normalized]
-
-    if missing_columns:
-        logger.error(f"Missing required columns detected: {missing_columns}")
-        logger.error(f"DataFrame columns: {list(df.columns)}")
-        return Response({'error': f'Missing required columns: {", ".join(missing_columns)}'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(response_data, status=status.HTTP_201_CREATED)
 
-    column_map = {normalize_column(col): col for col in df.columns}
+@csrf_exempt
+@api_view(['POST'])
+def import_job_create_api(request):
+    """
+    Queue an Excel import and return at once with the job id (202). The
+    file is processed by the `run_import_jobs` worker; poll
+    import_job_detail_api for progress and the final result, which has the
+    same shape as the import_cards_from_excel response.
+    """
+    if 'file' not in request.FILES:
+        logger.error("No file uploaded.")
+        return Response({'error': 'No file uploaded.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    created_cards = []
-    skipped_cards = []
-    errors = []
+    excel_file = request.FILES['file']
+    job = ImportJob.objects.create(file=excel_file, original_name=excel_file.name)
+    logger.info(f"Queued import job {job.id} for {excel_file.name}, size: {excel_file.size}")
+    return Response(ImportJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
-    for index, row in df.iterrows():
-        try:
-            name_val = str(row[column_map.get('equipo biomedico', '')]).strip()
-            model_val = str(row[column_map.get('modelo', '')]).strip()
-            series_val = str(row[column_map.get('serie', '')]).strip()
-
-            existing_card = Card.objects.filter(
-                name__iexact=name_val,
-                model__iexact=model_val,
-                series__iexact=series_val
-            ).first()
-
-            if existing_card:
-                skipped_cards.append({
-                    'row': index + 2,
-                    'name': name_val,
-                    'reason': 'Duplicate card (same name, model, and series already exists)'
-                })
-                continue
-
-            risk_col_key = None
-            for key in column_map.keys():
-                if key == 'clasificacion por riesgo':
-                    risk_col_key = key
-                    break
-
-            risk_value = row[column_map[risk_col_key]] if risk_col_key else None
-
-            card = Card(
-                name=row[column_map.get('equipo biomedico', '')],
-                brand=row[column_map.get('marca', '')],
-                model=row[column_map.get('modelo', '')],
-                series=row[column_map.get('serie', '')],
-                risk=risk_value,
-                location=row[column_map.get('ubicacion', '')],
-                status='Activo'  
-            )
-            card.save()
-            created_cards.append(card.id)
-            EventHistory.objects.create(
-                card=card,
-                event_type='card_created',
-                description=f'Tarjeta creada desde importación Excel: {card.name}',
-            )
-        except Exception as e:
-            errors.append({'row': index + 2, 'error': str(e)})  
-
-    response_data = {
-        'created_cards_count': len(created_cards),
-        'created_card_ids': created_cards,
-        'skipped_cards_count': len(skipped_cards),
-        'skipped_cards': skipped_cards,
-        'errors': errors,
-    }
+@api_view(['GET'])
+def import_job_detail_api(request, job_id):
+    job = get_object_or_404(ImportJob, id=job_id)
+    return Response(ImportJobSerializer(job).data)
 
-    return Response(response_data, status=status.HTTP_201_CREATED)
+@csrf_exempt
+@api_view(['POST'])
+def import_job_cancel_api(request, job_id):
+    """
+    Cancel an import job. A queued job is cancelled immediately; a running
+    one stops after the chunk in progress, keeping the cards already created.
+    """
+    job = get_object_or_404(ImportJob, id=job_id)
+    if job.status not in ('queued', 'running'):
+        return Response({'error': f'Import job is already {job.status}.'}, status=status.HTTP_409_CONFLICT)
+    cancel_job(job)
+    job.refresh_from_db()
+    return Response(ImportJobSerializer(job).data)
 
 @api_view(['GET'])
 def export_cards_to_excel(request):
     """
-    API endpoint to export all cards to an Excel file.
+    API endpoint to export all live cards to an Excel file.
     Returns an Excel file with columns: 'Equipo biomedico', 'Marca', 'Modelo', 'Serie', 'Clasificacion por riesgo', 'Ubicacion'
+    The workbook is built in an anonymous temporary file and streamed from
+    disk; see posts.exporter.
     """
+    export_file = tempfile.TemporaryFile()
     try:
-        cards = Card.objects.all()
-
-        data = []
-        for card in cards:
-            data.append({
-                'Equipo biomedico': card.name,
-                'Marca': card.brand,
-                'Modelo': card.model,
-                'Serie': card.series,
-                'Clasificacion por riesgo': card.risk,
-                'Ubicacion': card.location
-            })
-
-        df = pd.DataFrame(data)
-
-        from io import BytesIO
-        buffer = BytesIO()
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Cards', index=False)
-
-        buffer.seek(0)
-
-        response = HttpResponse(
-            buffer.getvalue(),
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-        )
-        response['Content-Disposition'] = 'attachment; filename=cards_export.xlsx'
-
-        return response
-
+        CardExporter().write(export_file)
+        export_file.seek(0)
     except Exception as e:
+        export_file.close()
         logger.error(f"Error exporting cards to Excel: {str(e)}", exc_info=True)
         return Response({'error': f'Error exporting cards: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    # FileResponse streams the file in blocks and closes it when done.
+    return FileResponse(
+        export_file,
+        as_attachment=True,
+        filename='cards_export.xlsx',
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
 def maintenance_info(request, item_id):
     cronograma = Cronograma.objects.filter(id=item_id).first()
     intervencion = RegistroIntervencion.objects.filter(id=item_id).first()